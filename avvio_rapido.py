@@ -0,0 +1,109 @@
+# avvio rapido della dashboard: il layout viene costruito da un piccolo file di metadati salvato accanto
+# alla sorgente (elenco delle miniere con le coordinate e prima e ultima data), mentre i dati, l'indice
+# e i rollup vengono caricati in un thread in background. Il server risponde subito con la pagina;
+# i callback che arrivano prima della fine del caricamento aspettano che i dati siano pronti
+import json
+import os
+import threading
+import traceback
+import pandas as pd
+
+
+# tempo massimo (in secondi) per cui un callback aspetta la fine del caricamento dei dati
+ATTESA_MASSIMA = float(os.environ.get('DASHBOARD_ATTESA_DATI', 120))
+
+
+# percorso del file di metadati di una sorgente (file o cartella partizionata)
+def percorso_metadati(sorgente):
+    return os.fspath(sorgente).rstrip(os.sep) + ".metadati.json"
+
+
+# salva i metadati usati dal layout (in modo atomico, come la cache dei dati)
+def salva_metadati(sorgente, dati):
+    coordinate = dati.coordinate()
+    data_minima, data_massima = dati.date_limite()
+    contenuto = {
+        "miniere": list(dati.miniere()),
+        "data_minima": data_minima.strftime("%Y-%m-%d"),
+        "data_massima": data_massima.strftime("%Y-%m-%d"),
+        "coordinate": {colonna: coordinate[colonna].tolist() for colonna in ("Miniera", "Latitudine", "Longitudine")}
+    }
+    percorso = percorso_metadati(sorgente)
+    temporaneo = f"{percorso}.{os.getpid()}.tmp"
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump(contenuto, f)
+    os.replace(temporaneo, percorso)
+
+
+# legge i metadati di una sorgente (None se il file manca o non è valido)
+def leggi_metadati(sorgente):
+    try:
+        with open(percorso_metadati(sorgente), encoding="utf-8") as f:
+            return Metadati(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class Metadati:
+
+    # contenuto: il dizionario salvato da salva_metadati
+    def __init__(self, contenuto):
+        self._miniere = contenuto["miniere"]
+        self._date_limite = pd.Timestamp(contenuto["data_minima"]), pd.Timestamp(contenuto["data_massima"])
+        self._coordinate = pd.DataFrame(contenuto["coordinate"])
+
+    def miniere(self):
+        return self._miniere
+
+    def date_limite(self):
+        return self._date_limite
+
+    def coordinate(self):
+        return self._coordinate
+
+
+class DatiInCaricamento:
+
+    # crea: funzione che carica e restituisce i dati (eseguita in un thread in background)
+    def __init__(self, crea):
+        self.errore_caricamento = None
+        self._dati = None
+        self._finito = threading.Event()                                                           # caricamento terminato, con successo o con un errore
+        self._lock = threading.Lock()
+        self._avvia_dopo = False
+        threading.Thread(target=self._carica, args=(crea,), name="caricamento-dati", daemon=True).start()
+
+    def _carica(self, crea):
+        try:
+            dati = crea()
+        except Exception:
+            self.errore_caricamento = traceback.format_exc()
+            self._finito.set()
+            return
+        with self._lock:
+            self._dati = dati
+            self._finito.set()
+            if self._avvia_dopo:
+                dati.avvia()
+
+    # True quando i dati sono stati caricati
+    def pronto(self):
+        return self._dati is not None
+
+    # avvia il controllo dei nuovi dati (subito, oppure appena finisce il caricamento)
+    def avvia(self):
+        with self._lock:
+            self._avvia_dopo = True
+            if self._dati is not None:
+                self._dati.avvia()
+
+    # restituisce i dati caricati, aspettando la fine del caricamento
+    def attendi(self):
+        self._finito.wait(ATTESA_MASSIMA)
+        if self._dati is None:
+            raise RuntimeError(f"dati non disponibili: {self.errore_caricamento or 'caricamento ancora in corso'}")
+        return self._dati
+
+    # tutto il resto (seleziona, somme, rollup, versione, ...) viene chiesto ai dati caricati
+    def __getattr__(self, nome):
+        return getattr(self.attendi(), nome)
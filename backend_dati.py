@@ -0,0 +1,148 @@
+# backend alternativo all'indice in memoria per dataset più grandi della RAM:
+# i dati restano nella cartella partizionata per mese e per blocco di miniere scritta da generate_data.py (--partiziona)
+# e ogni richiesta legge solo i file dei mesi selezionati e del blocco della miniera, solo le righe della miniera
+# e solo le colonne necessarie, grazie ai filtri e alla proiezione di pyarrow.dataset.
+# Espone gli stessi metodi di IndiceMiniere, così la dashboard funziona con entrambi
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as pa_dataset
+
+from caricamento_dati import SCHEMA, apri_cartella, file_cartella, prepara_dati
+from indice_dati import retta_minimi_quadrati
+
+
+# colonne lette dai file (le altre, come "%_Rame_Pulita", vengono calcolate dopo la lettura)
+COLONNE_FILE = ["Data"] + [c for c in SCHEMA if c != "%_Rame_Pulita"]
+
+# colonne da cui dipendono quelle calcolate
+DIPENDENZE = {"%_Rame_Pulita": ["%_Rame", "Tonnellate_giornaliere"]}
+
+# colonne lette per il riepilogo del dataset (miniere, coordinate e date estreme)
+COLONNE_RIEPILOGO = ["Miniera", "Latitudine", "Longitudine", "Data"]
+
+# chiave di partizione del blocco di miniere (cartelle blocco=NNNNN)
+BLOCCO = "blocco"
+
+
+class DatasetPartizionato:
+
+    # versione: numero che identifica il contenuto del dataset, usato per invalidare le cache;
+    # file: elenco dei file da usare (di default tutti quelli della cartella);
+    # sommario: nomi, coordinate, date estreme e blocchi delle miniere già noti (di default vengono letti dai file)
+    def __init__(self, cartella, versione=0, file=None, sommario=None):
+        if not os.path.isdir(cartella):
+            raise ValueError(f"il backend partizionato richiede una cartella (generate_data.py --partiziona): {cartella}")
+        self.cartella = cartella
+        self.versione = versione
+        self.file = file_cartella(cartella) if file is None else file
+        self.dataset = apri_cartella(cartella, self.file)
+        # se tutti i file sono divisi per blocco di miniere, ogni richiesta apre solo i file del blocco della miniera
+        # (le cartelle scritte senza blocchi vengono comunque lette, filtrando la miniera riga per riga)
+        self._per_blocco = per_blocco(self.file)
+        if sommario is None:
+            colonne = COLONNE_RIEPILOGO + [BLOCCO] if self._per_blocco else COLONNE_RIEPILOGO
+            sommario = riepilogo(self.blocchi(colonne))                                            # letto una sola volta, a blocchi
+        if sommario is None:
+            raise ValueError(f"nessun dato nella cartella {cartella}")
+        self._coordinate, self._date_limite, self._blocchi_miniere = sommario
+
+    # dataset con la versione successiva che comprende anche i file indicati (aggiunti alla cartella dopo l'apertura):
+    # vengono letti solo i nuovi file, di cui restituisco anche le righe con le colonne indicate
+    def con_nuovi_file(self, nuovi, colonne):
+        colonne = list(dict.fromkeys(COLONNE_RIEPILOGO + colonne))
+        righe = apri_cartella(self.cartella, nuovi).to_table(columns=colonne + [BLOCCO] if per_blocco(nuovi) else colonne).to_pandas()
+        sommario = riepilogo([righe], (self._coordinate, self._date_limite, self._blocchi_miniere))
+        return DatasetPartizionato(self.cartella, self.versione + 1, self.file + list(nuovi), sommario), righe[colonne]
+
+    # filtro sulle partizioni dei mesi e dei blocchi, sulla miniera e sull'intervallo di date (estremi inclusi)
+    def _filtro(self, miniera, start_date, end_date):
+        inizio = pd.Timestamp(start_date).normalize()
+        fine = pd.Timestamp(end_date).normalize()
+        filtro = ((pa_dataset.field("mese") >= inizio.strftime("%Y-%m"))
+                  & (pa_dataset.field("mese") <= fine.strftime("%Y-%m"))
+                  & (pa_dataset.field("Miniera") == miniera)
+                  & (pa_dataset.field("Data") >= inizio.to_pydatetime())
+                  & (pa_dataset.field("Data") <= fine.to_pydatetime()))
+        if self._per_blocco:
+            filtro &= pa_dataset.field(BLOCCO).isin(self._blocchi_miniere.get(miniera, []))
+        return filtro
+
+    # legge le colonne indicate per la miniera e l'intervallo di date selezionati
+    def _leggi(self, miniera, start_date, end_date, colonne):
+        return self.dataset.to_table(columns=colonne, filter=self._filtro(miniera, start_date, end_date))
+
+    # restituisce le righe della miniera e dell'intervallo di date selezionati, ordinate per data,
+    # eventualmente solo con alcune colonne (le colonne calcolate vengono ricavate da quelle lette)
+    def seleziona(self, miniera, start_date, end_date, colonne=None):
+        richieste = COLONNE_FILE + ["%_Rame_Pulita"] if colonne is None else colonne
+        da_leggere = ["Data"]
+        for colonna in richieste:
+            for necessaria in DIPENDENZE.get(colonna, [colonna]):
+                if necessaria not in da_leggere:
+                    da_leggere.append(necessaria)
+        righe = prepara_dati(self._leggi(miniera, start_date, end_date, da_leggere).to_pandas())
+        return righe[richieste]
+
+    # somme delle colonne indicate per la miniera e l'intervallo di date selezionati
+    def somme(self, miniera, start_date, end_date, colonne):
+        tabella = self._leggi(miniera, start_date, end_date, colonne)
+        return [float(pc.sum(tabella.column(nome)).as_py() or 0.0) for nome in colonne]
+
+    # media di una colonna per la miniera e l'intervallo di date selezionati (NaN se l'intervallo è vuoto)
+    def media(self, nome, miniera, start_date, end_date):
+        media = pc.mean(self._leggi(miniera, start_date, end_date, [nome]).column(nome)).as_py()
+        return float("nan") if media is None else float(media)
+
+    # retta dei minimi quadrati del consumo energetico in funzione della temperatura
+    def regressione(self, miniera, start_date, end_date):
+        tabella = self._leggi(miniera, start_date, end_date, ["Temperatura_C", "Consumo_Energia_kWh"])
+        x = tabella.column("Temperatura_C").to_numpy().astype(np.float64)
+        y = tabella.column("Consumo_Energia_kWh").to_numpy().astype(np.float64)
+        return retta_minimi_quadrati(len(x), x.sum(), y.sum(), x @ y, x @ x, y @ y)
+
+    # righe del dataset con le colonne indicate, lette un blocco alla volta
+    def blocchi(self, colonne):
+        for blocco in self.dataset.to_batches(columns=colonne):
+            if blocco.num_rows:
+                yield blocco.to_pandas()
+
+    # nomi delle miniere presenti nel dataset, in ordine
+    def miniere(self):
+        return self._coordinate["Miniera"].tolist()
+
+    # prima e ultima data del dataset
+    def date_limite(self):
+        return self._date_limite
+
+    # coordinate di ogni miniera
+    def coordinate(self):
+        return self._coordinate
+
+
+# True se tutti i file sono in una cartella blocco=NNNNN
+def per_blocco(file):
+    return bool(file) and all(os.path.basename(os.path.dirname(f)).startswith(f"{BLOCCO}=") for f in file)
+
+
+# riepilogo di righe lette a blocchi, eventualmente unito a uno precedente: coordinate di ogni miniera
+# (dalla prima riga trovata), prima e ultima data e blocchi in cui si trova ogni miniera (se le righe hanno
+# la colonna del blocco). None se non ci sono righe
+def riepilogo(blocchi, precedente=None):
+    prime_righe = [] if precedente is None else [precedente[0]]
+    date = [] if precedente is None else list(precedente[1])
+    blocchi_miniere = {} if precedente is None else {miniera: set(b) for miniera, b in precedente[2].items()}
+    for righe in blocchi:
+        if len(righe) == 0:
+            continue
+        prime_righe.append(righe[COLONNE_RIEPILOGO[:-1]].astype({"Miniera": str}).drop_duplicates("Miniera"))
+        date += [righe["Data"].min(), righe["Data"].max()]
+        if BLOCCO in righe:
+            for miniera, blocco in righe[["Miniera", BLOCCO]].drop_duplicates().itertuples(index=False):
+                blocchi_miniere.setdefault(str(miniera), set()).add(int(blocco))
+    if not prime_righe:
+        return None
+    coordinate = pd.concat(prime_righe).drop_duplicates("Miniera").sort_values("Miniera").reset_index(drop=True)
+    blocchi_miniere = {miniera: sorted(b) for miniera, b in blocchi_miniere.items()}
+    return coordinate, (pd.Timestamp(min(date)), pd.Timestamp(max(date))), blocchi_miniere
@@ -0,0 +1,228 @@
+# benchmark della generazione dei dati e della dashboard a diverse scale, dalle tre miniere di esempio
+# per un anno fino a 10000 miniere per dieci anni. Per ogni scala misuro:
+# - la generazione: righe al secondo e memoria massima
+# - l'avvio a freddo della dashboard (import del modulo, caricamento dei dati e dell'indice), senza e con la cache
+# - la latenza e i byte della risposta dei callback, chiamati come farebbe il browser, per diverse ampiezze
+#   della selezione (e per diversi livelli di zoom della mappa)
+# Ogni misura viene fatta in un processo separato, così tempi e memoria non dipendono dalle misure precedenti.
+# I risultati vengono salvati in un file JSON, per confrontare esecuzioni diverse:
+#     python benchmark.py --scale 3x366 100x366 --output benchmark.json
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+
+# scale disponibili: numero di miniere (0 = le tre miniere di esempio), data di inizio e di fine
+SCALE = {
+    "3x366": (0, "2024-01-01", "2024-12-31"),
+    "100x366": (100, "2024-01-01", "2024-12-31"),
+    "1000x1827": (1000, "2020-01-01", "2024-12-31"),
+    "10000x3653": (10000, "2015-01-01", "2024-12-31")
+}
+
+# ampiezze della selezione di date misurate (in giorni, None = l'intero dataset), sempre fino all'ultima data
+AMPIEZZE = {"settimana": 7, "mese": 30, "anno": 365, "tutto": None}
+
+# livelli di zoom della mappa misurati
+ZOOM_MAPPA = [1, 3, 5, 7, 9, 12]
+
+# numero di ripetizioni di ogni chiamata (la cache delle figure viene svuotata prima di ognuna)
+RIPETIZIONI = 5
+
+
+# memoria massima (in MB) usata dal processo corrente e dai processi figli già terminati
+def memoria_massima():
+    divisore = 1024 * 1024 if sys.platform == "darwin" else 1024                                   # su Linux ru_maxrss è in KB, su macOS in byte
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    figli = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"memoria_processo_mb": round(proprio / divisore, 1), "memoria_figli_mb": round(figli / divisore, 1)}
+
+
+# esegue una fase del benchmark in un nuovo processo e ne restituisce il risultato (stampato in JSON)
+def esegui_fase(fase, argomenti, ambiente=None):
+    comando = [sys.executable, os.path.abspath(__file__), "--fase", fase] + argomenti
+    uscita = subprocess.run(comando, check=True, capture_output=True, text=True, env={**os.environ, **(ambiente or {})},
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(uscita.stdout.strip().splitlines()[-1])
+
+
+# fase "generazione": genera il dataset di una scala e misura righe al secondo e memoria
+def fase_generazione(args):
+    from generate_data import crea_flotta, miniere, salva_dataset
+    flotta, inizio, fine = SCALE[args.scala]
+    elenco_miniere = crea_flotta(flotta, args.seed) if flotta else miniere
+    date = pd.date_range(inizio, fine, freq="D")
+    inizio_misura = time.perf_counter()
+    salva_dataset(elenco_miniere, date, args.sorgente, args.formato, args.partiziona, seed=args.seed, processi=args.processi)
+    secondi = time.perf_counter() - inizio_misura
+    righe = len(elenco_miniere) * len(date)
+    return {"righe": righe, "secondi": round(secondi, 3), "righe_al_secondo": round(righe / secondi), **memoria_massima()}
+
+
+# fase "avvio": importa la dashboard (che carica i dati, l'indice, i rollup e la mappa) e misura il tempo
+def fase_avvio(args):
+    inizio_misura = time.perf_counter()
+    importlib.import_module("dashboardpython")
+    return {"secondi": round(time.perf_counter() - inizio_misura, 3), **memoria_massima()}
+
+
+# invia al server la richiesta che il browser farebbe per un callback, con i valori indicati per input e state
+def richiesta_callback(client, app, chiave, valori):
+    callback = app.callback_map[chiave]
+    multiplo = chiave.startswith("..")
+    uscite = [dict(zip(("id", "property"), uscita.split(".", 1))) for uscita in (chiave.strip(".").split("...") if multiplo else [chiave])]
+    valore = lambda elemento: {**elemento, "value": valori.get(f"{elemento['id']}.{elemento['property']}")}
+    corpo = {
+        "output": chiave,
+        "outputs": uscite if multiplo else uscite[0],
+        "inputs": [valore(elemento) for elemento in callback["inputs"]],
+        "state": [valore(elemento) for elemento in callback["state"]],
+        "changedPropIds": [f"{elemento['id']}.{elemento['property']}" for elemento in callback["inputs"]]
+    }
+    inizio_misura = time.perf_counter()
+    risposta = client.post("/_dash-update-component", json=corpo)
+    return time.perf_counter() - inizio_misura, risposta
+
+
+# ripete una chiamata e riassume latenze (in millisecondi) e dimensione della risposta
+def misura(client, app, chiave, valori, svuota_cache):
+    tempi, byte = [], 0
+    for _ in range(RIPETIZIONI):
+        svuota_cache()
+        secondi, risposta = richiesta_callback(client, app, chiave, valori)
+        if risposta.status_code not in (200, 204):
+            raise RuntimeError(f"{chiave}: risposta {risposta.status_code}")
+        tempi.append(secondi * 1000)
+        byte = len(risposta.data)
+    return {"mediana_ms": round(statistics.median(tempi), 3), "min_ms": round(min(tempi), 3),
+            "max_ms": round(max(tempi), 3), "byte_risposta": byte}
+
+
+# fase "callback": misura i callback della dashboard per ogni ampiezza della selezione e ogni livello di zoom
+def fase_callback(args):
+    import dashboardpython as dash_app
+    from mappa import CENTRO_INIZIALE
+    app, dati = dash_app.app, dash_app.dati
+    client = app.server.test_client()
+    miniera = dati.miniere()[0]
+    data_minima, data_massima = dati.date_limite()
+
+    # i callback che dipendono dalla miniera e dalle date, con i valori fissi degli altri input
+    callback = {
+        "produzione": ("grafico-produzione.figure", {}),
+        "energia": ("grafico-energia-co2.figure", {}),
+        "costi": ("grafico-costi-torta.figure", {}),
+        "temperatura": ("grafico-temperatura-energia.figure", {}),
+        "tabella": ("..tabella-sicurezza.data...tabella-sicurezza.page_count...tabella-sicurezza.page_current..",
+                    {"tabella-sicurezza.page_current": 0, "tabella-sicurezza.page_size": 10,
+                     "tabella-sicurezza.sort_by": [], "tabella-sicurezza.filter_query": ""}),
+        "confronto": ("grafico-confronto.figure",
+                      {"confronto-miniere.value": dati.miniere()[:5], "confronto-flotta.value": ["flotta"],
+                       "confronto-periodo.value": "mese", "confronto-metrica.value": "Tonnellate_giornaliere"})
+    }
+    risultati = {}
+    for nome, (chiave, valori_fissi) in callback.items():
+        risultati[nome] = {}
+        for ampiezza, giorni in AMPIEZZE.items():
+            inizio = data_minima if giorni is None else max(data_minima, data_massima - pd.Timedelta(days=giorni - 1))
+            valori = {**valori_fissi, "miniera-dropdown.value": miniera,
+                      "date-picker.start_date": inizio.strftime("%Y-%m-%d"), "date-picker.end_date": data_massima.strftime("%Y-%m-%d")}
+            risultati[nome][ampiezza] = misura(client, app, chiave, valori, dash_app.cache_grafici.svuota)
+
+    # la mappa: un cambio di zoom attorno al centro iniziale da una vista diversa (altrimenti il callback non restituisce nulla)
+    chiave_mappa = next(chiave for chiave in app.callback_map if chiave.startswith("..mappa-miniere.figure@"))
+    risultati["mappa"] = {
+        f"zoom_{zoom}": misura(client, app, chiave_mappa, {"mappa-miniere.relayoutData": {"mapbox.zoom": zoom, "mapbox.center": CENTRO_INIZIALE},
+                                                           "livello-mappa.data": None}, dash_app.mappa.punti.cache_clear)
+        for zoom in ZOOM_MAPPA
+    }
+    return risultati
+
+
+FASI = {"generazione": fase_generazione, "avvio": fase_avvio, "callback": fase_callback}
+
+
+# esegue tutte le fasi per ogni scala richiesta e salva i risultati
+def esegui_benchmark(args):
+    risultati = {
+        "eseguito_il": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "processori": os.cpu_count(),
+        "formato": args.formato,
+        "partiziona": args.partiziona,
+        "backend": args.backend,
+        "scale": {}
+    }
+    from avvio_rapido import percorso_metadati
+    from caricamento_dati import percorso_accessorio, percorso_cache
+    cartella = args.cartella or tempfile.mkdtemp(prefix="benchmark_miniere_")
+    ambiente = {"DASHBOARD_BACKEND": args.backend, "DASHBOARD_AGGIORNAMENTO": "0", "DASHBOARD_PRERISCALDA_CACHE": "0"}
+    try:
+        for scala in args.scale:
+            sorgente = os.path.join(cartella, f"miniere_{scala}" + ("" if args.partiziona else f".{args.formato}"))
+            comuni = ["--scala", scala, "--sorgente", sorgente, "--formato", args.formato, "--processi", str(args.processi)]
+            comuni += ["--partiziona"] if args.partiziona else []
+            comuni += [] if args.seed is None else ["--seed", str(args.seed)]
+            ambiente_scala = {**ambiente, "DASHBOARD_SORGENTE": sorgente}
+
+            print(f"[{scala}] generazione...", file=sys.stderr)
+            risultato = {"generazione": esegui_fase("generazione", comuni)}
+            print(f"[{scala}] avvio della dashboard...", file=sys.stderr)
+            risultato["avvio_senza_cache"] = esegui_fase("avvio", comuni, ambiente_scala)                 # il primo avvio scrive la cache
+            risultato["avvio_con_cache"] = esegui_fase("avvio", comuni, ambiente_scala)
+            print(f"[{scala}] callback...", file=sys.stderr)
+            risultato["callback"] = esegui_fase("callback", comuni, ambiente_scala)
+            risultati["scale"][scala] = risultato
+
+            # salvo dopo ogni scala, così un'interruzione non perde le misure già fatte
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(risultati, f, indent=2)
+            if not args.conserva:
+                if os.path.isdir(sorgente):
+                    shutil.rmtree(sorgente)
+                else:
+                    os.remove(sorgente)
+                # anche i file che la dashboard scrive accanto alla sorgente (cache dei dati, somme cumulative
+                # dell'indice, rollup e metadati dell'avvio rapido)
+                for accessorio in (percorso_cache(sorgente), percorso_accessorio(sorgente, "indice"),
+                                   percorso_accessorio(sorgente, "rollup"), percorso_metadati(sorgente)):
+                    if os.path.exists(accessorio):
+                        os.remove(accessorio)
+    finally:
+        if not args.cartella and not args.conserva:
+            shutil.rmtree(cartella, ignore_errors=True)
+    print(f"Risultati salvati in {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark della generazione dei dati e della dashboard")
+    parser.add_argument("--scale", nargs="+", choices=SCALE, default=list(SCALE), help="scale da misurare (miniere x giorni)")
+    parser.add_argument("--formato", choices=("csv", "parquet", "feather"), default="parquet", help="formato del dataset generato")
+    parser.add_argument("--partiziona", action="store_true", help="genera una cartella partizionata per mese")
+    parser.add_argument("--backend", choices=("memoria", "dataset"), default="memoria", help="backend dei dati della dashboard")
+    parser.add_argument("--processi", type=int, default=1, help="processi usati dalla generazione")
+    parser.add_argument("--seed", type=int, default=42, help="seed della simulazione")
+    parser.add_argument("--cartella", default=None, help="cartella in cui generare i dataset (di default una cartella temporanea)")
+    parser.add_argument("--conserva", action="store_true", help="non cancella i dataset generati")
+    parser.add_argument("--output", default="benchmark.json", help="file JSON dei risultati")
+    # argomenti usati internamente per eseguire una singola fase in un processo separato
+    parser.add_argument("--fase", choices=FASI, help=argparse.SUPPRESS)
+    parser.add_argument("--scala", choices=SCALE, help=argparse.SUPPRESS)
+    parser.add_argument("--sorgente", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fase:
+        print(json.dumps(FASI[args.fase](args)))
+    else:
+        esegui_benchmark(args)
@@ -0,0 +1,66 @@
+# cache LRU dei risultati dei callback della dashboard: per ogni combinazione di input
+# (miniera, data di inizio, data di fine) salvo le figure già serializzate in dizionari,
+# con un numero massimo di elementi, una durata massima e l'invalidazione al cambio di versione dei dati
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheFigure:
+
+    def __init__(self, dimensione_massima=256, durata_secondi=900, versione_dati=lambda: 0):
+        self.dimensione_massima = dimensione_massima
+        self.durata_secondi = durata_secondi
+        self.versione_dati = versione_dati                                                         # funzione che restituisce la versione corrente del dataset
+        self._versione = None
+        self._elementi = OrderedDict()                                                             # chiave -> (istante di inserimento, valore), dal meno al più recente
+        self._lock = threading.Lock()
+        self.successi = 0
+        self.mancati = 0
+
+    # restituisce il valore salvato per la chiave, oppure lo calcola con la funzione indicata e lo salva
+    # (il calcolo avviene fuori dal lock, così richieste diverse non si bloccano a vicenda)
+    def ottieni(self, chiave, calcola):
+        versione = self.versione_dati()
+        with self._lock:
+            if versione != self._versione:                                                         # i dati sono cambiati: tutto ciò che è salvato non è più valido
+                self._elementi.clear()
+                self._versione = versione
+            elemento = self._elementi.get(chiave)
+            if elemento is not None and time.monotonic() - elemento[0] <= self.durata_secondi:
+                self._elementi.move_to_end(chiave)
+                self.successi += 1
+                return elemento[1]
+            self.mancati += 1
+
+        valore = calcola()
+        with self._lock:
+            if versione == self._versione:                                                         # non salvo risultati calcolati su dati nel frattempo sostituiti
+                self._elementi[chiave] = (time.monotonic(), valore)
+                self._elementi.move_to_end(chiave)
+                while len(self._elementi) > self.dimensione_massima:
+                    self._elementi.popitem(last=False)                                             # elimino l'elemento usato meno di recente
+        return valore
+
+    # calcola in anticipo i valori per le chiavi indicate (ad esempio le viste più aperte)
+    def preriscalda(self, chiavi, calcola):
+        for chiave in list(chiavi)[:self.dimensione_massima]:
+            self.ottieni(chiave, lambda: calcola(*chiave))
+
+    # svuota la cache
+    def svuota(self):
+        with self._lock:
+            self._elementi.clear()
+
+    # contatori di utilizzo della cache
+    def statistiche(self):
+        with self._lock:
+            richieste = self.successi + self.mancati
+            return {
+                "successi": self.successi,
+                "mancati": self.mancati,
+                "percentuale_successi": round(100 * self.successi / richieste, 2) if richieste else 0.0,
+                "elementi": len(self._elementi),
+                "dimensione_massima": self.dimensione_massima,
+                "versione_dati": self._versione
+            }
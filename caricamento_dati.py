@@ -0,0 +1,214 @@
+# funzioni per caricare il dataset delle miniere nella dashboard:
+# la prima volta il file sorgente viene letto e convertito in una cache binaria a colonne (Feather),
+# dalle volte successive la cache viene mappata in memoria e la lettura del CSV viene saltata
+import hashlib
+import json
+import os
+import pandas as pd
+
+try:                                                                                               # pyarrow serve per la cache: senza, il CSV viene letto ogni volta
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+# file dei dati usato di default dalla dashboard
+SORGENTE_PREDEFINITA = "dati_miniere123.csv"
+
+# versione del formato della cache: va incrementata quando cambiano lo schema o le colonne derivate
+VERSIONE_CACHE = 4
+
+# chiave dei metadati della cache in cui salvo le informazioni sul file sorgente
+CHIAVE_METADATI = b"caricamento_dati"
+
+
+# schema tipizzato del dataset: la miniera come categoria e gli interi ridotti.
+# I float restano a 64 bit: i grafici serializzano i valori in doppia precisione, e un float a 32 bit
+# verrebbe mostrato come 8.470000267028809 invece di 8.47 (valori diversi dal CSV e JSON più pesante)
+SCHEMA = {
+    "Miniera": "category",
+    "Tonnellate_giornaliere": "float64",
+    "Latitudine": "float64",
+    "Longitudine": "float64",
+    "Consumo_Energia_kWh": "float64",
+    "Emissioni_CO2_kg": "float64",
+    "%_Rame": "float64",
+    "Costo_Lavoro": "float64",
+    "Costo_Macchinari": "float64",
+    "Costo_Energia": "float64",
+    "Incidenti": "int8",
+    "Ore_Senza_Incidenti": "int32",
+    "Temperatura_C": "float64",
+    "Giorni_senza_incidenti_consecutivi": "int32",
+    "%_Rame_Pulita": "float64"
+}
+
+
+# percorso del file di cache, salvato accanto al file sorgente
+def percorso_cache(sorgente):
+    return f"{os.fspath(sorgente).rstrip(os.sep)}.cache.feather"
+
+
+# firma veloce della sorgente (dimensione e data di modifica); per le cartelle partizionate
+# considero tutti i file contenuti (oppure solo quelli indicati)
+def firma_sorgente(sorgente, file=None):
+    if os.path.isdir(sorgente):
+        file = file_cartella(sorgente) if file is None else file
+        stati = [os.stat(f) for f in file]
+        return {"dimensione": sum(s.st_size for s in stati), "mtime": max((s.st_mtime_ns for s in stati), default=0),
+                "file": len(file)}
+    stato = os.stat(sorgente)
+    return {"dimensione": stato.st_size, "mtime": stato.st_mtime_ns}
+
+
+# hash del contenuto, calcolato solo quando la data di modifica cambia (per le cartelle basta la firma)
+def _hash(sorgente):
+    if os.path.isdir(sorgente):
+        return None
+    impronta = hashlib.sha256()
+    with open(sorgente, "rb") as f:
+        while pezzo := f.read(1 << 20):
+            impronta.update(pezzo)
+    return impronta.hexdigest()
+
+
+# aggiungo le colonne derivate in modo vettoriale, applico lo schema tipizzato
+# e ordino le righe per miniera e data (l'ordine usato dall'indice della dashboard)
+# (anche su una selezione di colonne: converte e ordina solo quelle presenti)
+def prepara_dati(df):
+    # la colonna "%_Rame_Pulita" prende il valore di "%_Rame" solo se le tonnellate giornaliere sono almeno 0.19
+    if "%_Rame" in df and "Tonnellate_giornaliere" in df:
+        df["%_Rame_Pulita"] = df["%_Rame"].where(df["Tonnellate_giornaliere"] >= 0.19)
+    if "Data" in df:
+        df["Data"] = df["Data"].astype("datetime64[ns]")
+    df = df.astype({colonna: tipo for colonna, tipo in SCHEMA.items() if colonna in df})
+    ordine = [colonna for colonna in ("Miniera", "Data") if colonna in df]
+    return df.sort_values(ordine, kind="stable").reset_index(drop=True) if ordine else df
+
+
+# elenco dei file di dati di una cartella partizionata, esclusi quelli nascosti (ad esempio i file temporanei
+# ancora in scrittura), che anche pyarrow ignora
+def file_cartella(sorgente):
+    return sorted(os.path.join(radice, nome) for radice, _, nomi in os.walk(sorgente)
+                  for nome in nomi if "." in nome and not nome.startswith((".", "_")))
+
+
+# formato dei file (parquet o feather) di una cartella partizionata, ricavato dall'estensione del primo file
+def formato_cartella(sorgente):
+    formato = file_cartella(sorgente)[0].rsplit(".", 1)[-1]
+    return "ipc" if formato == "feather" else formato
+
+
+# apre una cartella partizionata per mese (mese=AAAA-MM) e per blocco di miniere (blocco=NNNNN) come dataset di pyarrow,
+# oppure solo alcuni file della cartella (ad esempio quelli aggiunti dopo l'avvio)
+def apri_cartella(sorgente, file=None):
+    if file is None:
+        return pa_dataset.dataset(sorgente, format=formato_cartella(sorgente), partitioning="hive")
+    return pa_dataset.dataset(file, format=formato_cartella(sorgente), partitioning="hive", partition_base_dir=sorgente)
+
+
+# legge il file sorgente: CSV (con le date giorno/mese/anno), Parquet, Feather o una cartella partizionata
+def leggi_sorgente(sorgente):
+    sorgente = os.fspath(sorgente)
+    if pa is None:
+        df = pd.read_csv(sorgente)
+        df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y")
+        return prepara_dati(df)
+
+    if os.path.isdir(sorgente):
+        tabella = apri_cartella(sorgente).to_table(
+            columns=["Data"] + [c for c in SCHEMA if c != "%_Rame_Pulita"])
+        df = tabella.to_pandas()
+    elif sorgente.endswith(".parquet"):
+        df = pd.read_parquet(sorgente)
+    elif sorgente.endswith(".feather"):
+        df = pd.read_feather(sorgente)
+    else:
+        # il parser CSV di pyarrow è multi-thread e converte le date direttamente durante la lettura
+        opzioni = pa_csv.ConvertOptions(column_types={"Data": pa.timestamp("s")}, timestamp_parsers=["%d/%m/%Y"])
+        df = pa_csv.read_csv(sorgente, convert_options=opzioni).to_pandas()
+    return prepara_dati(df)
+
+
+# salvo la cache in modo atomico (prima un file temporaneo, poi la rinomina),
+# così un altro processo non legge mai un file scritto a metà.
+# Il file è scritto in modo che pandas possa usare direttamente la memoria mappata, senza copie:
+# non compresso, in un unico blocco di righe e con i NaN dei float salvati come NaN (non come valori nulli)
+def _scrivi_cache(df, cache, metadati):
+    tabella = pa.Table.from_pandas(df, preserve_index=False)
+    for posizione, nome in enumerate(tabella.column_names):
+        if pa.types.is_floating(tabella.schema.field(nome).type) and tabella.column(nome).null_count:
+            tabella = tabella.set_column(posizione, nome, pa.array(df[nome].to_numpy(), from_pandas=False))
+    tabella = tabella.replace_schema_metadata({**tabella.schema.metadata, CHIAVE_METADATI: json.dumps(metadati).encode()})
+    temporaneo = f"{cache}.{os.getpid()}.tmp"
+    feather.write_feather(tabella, temporaneo, compression="uncompressed", chunksize=max(len(df), 1))
+    os.replace(temporaneo, cache)
+
+
+# legge i metadati salvati nella cache (None se la cache non esiste o non è leggibile)
+def _metadati_cache(cache):
+    try:
+        metadati = pa.ipc.open_file(pa.memory_map(cache)).schema.metadata or {}
+        return json.loads(metadati[CHIAVE_METADATI])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+# legge la cache mappandola in memoria: le colonne numeriche del DataFrame puntano direttamente alle pagine del file,
+# quindi più processi che aprono la stessa cache condividono la stessa memoria (la cache del sistema operativo)
+def _leggi_cache(cache):
+    return feather.read_table(cache, memory_map=True).to_pandas(split_blocks=True)
+
+
+# questa funzione carica il dataset per la dashboard usando la cache quando è ancora valida:
+# - stessa dimensione e data di modifica della sorgente: la cache viene letta direttamente
+# - data di modifica diversa ma stesso contenuto (hash): aggiorno solo i metadati
+# - altrimenti rileggo la sorgente e ricostruisco la cache
+def carica_dati(sorgente=SORGENTE_PREDEFINITA, usa_cache=True):
+    return carica_dati_con_firma(sorgente, usa_cache)[0]
+
+
+# come carica_dati, restituisce anche la firma della sorgente con cui è salvata la cache letta
+# (None senza cache): i file accessori calcolati da questi dati vengono salvati con la stessa firma
+def carica_dati_con_firma(sorgente=SORGENTE_PREDEFINITA, usa_cache=True):
+    if pa is None or not usa_cache:
+        return leggi_sorgente(sorgente), None
+
+    cache = percorso_cache(sorgente)
+    firma = firma_sorgente(sorgente)
+    metadati = _metadati_cache(cache)
+    if metadati is not None and metadati.get("versione") == VERSIONE_CACHE:
+        if metadati["firma"] == firma:
+            return _leggi_cache(cache), firma
+        impronta = _hash(sorgente)
+        if impronta is not None and impronta == metadati.get("hash"):
+            df = _leggi_cache(cache)
+            _scrivi_cache(df, cache, {**metadati, "firma": firma})
+            return df, firma
+
+    _scrivi_cache(leggi_sorgente(sorgente), cache, {"versione": VERSIONE_CACHE, "firma": firma, "hash": _hash(sorgente)})
+    return _leggi_cache(cache), firma                                                              # rileggo la cache appena scritta per usare anche qui la memoria mappata
+
+
+# percorso di un file accessorio della cache, salvato accanto alla sorgente
+def percorso_accessorio(sorgente, nome):
+    return f"{os.fspath(sorgente).rstrip(os.sep)}.{nome}.cache.feather"
+
+
+# carica un file accessorio: una tabella calcolata a partire dal dataset (ad esempio le somme cumulative
+# dell'indice o i rollup), salvata nello stesso formato della cache e letta mappandola in memoria.
+# Così i processi avviati dopo il primo (ad esempio i processi di gunicorn con l'avvio rapido) condividono
+# le stesse pagine invece di ricalcolare ognuno la propria copia. Se il file manca o è stato calcolato
+# da un'altra versione della sorgente (firma diversa) lo calcolo con la funzione indicata, lo salvo e lo rileggo
+def carica_accessorio(sorgente, nome, firma, calcola):
+    if pa is None or firma is None:
+        return calcola()
+    percorso = percorso_accessorio(sorgente, nome)
+    metadati = _metadati_cache(percorso)
+    if metadati is not None and metadati.get("versione") == VERSIONE_CACHE and metadati.get("firma") == firma:
+        return _leggi_cache(percorso)
+    _scrivi_cache(calcola(), percorso, {"versione": VERSIONE_CACHE, "firma": firma})
+    return _leggi_cache(percorso)
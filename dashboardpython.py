@@ -1,316 +1,796 @@
-import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-
-# definisco le coordinate geografiche delle miniere per visualizzarle su una mappa
-coordinate_miniere = {
-    "Miniera1": {"lat": 67.9061, "lon": 20.9575},
-    "Miniera2": {"lat": 60.2761, "lon": 16.1706},
-    "Miniera3": {"lat": 67.7066, "lon": 25.9403}
-}
-
-
-# carico i dati delle miniere da un file CSV e converte la colonna "Data" nel formato datetime
-df = pd.read_csv("dati_miniere123.csv", parse_dates=["Data"], dayfirst=True)
-
-
-# assicuro che la colonna "Data" sia nel formato datetime corretto
-df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y')
-
-
-# aggiungo una nuova colonna "%_Rame_Pulita", che prende il valore di "%_Rame" solo se le tonnellate giornaliere sono superiori a 0.19
-df['%_Rame_Pulita'] = df.apply(lambda row: row['%_Rame'] if row['Tonnellate_giornaliere'] >= 0.19 else None, axis=1)  
-
-
-
-# inizzializzo l'applicazione Dash
-app = dash.Dash(__name__)
-app.title = "Dashboard Miniere"
-
-
-# layout dell'app: struttura e design della pagina web
-app.layout = html.Div(style={'backgroundColor': '#121212', 'padding': '20px', 'color': '#E0E0E0'}, children=[        
-    html.H1("MINIERE DI RAME IN SCANDINAVIA", style={'textAlign': 'center', 'color': '#00BFFF'}),                    # titolo principale della pagina, con stile per il colore e l'allineamento
-    html.Div([                                                                                                       # sezione per visualizzare la mappa delle miniere
-        dcc.Graph(id='mappa-miniere')                                                                                # definisco il componente grafico della mappa
-    ], style={'marginBottom': '50px'}),                                                                              # aggiungo uno spazio sotto la mappa
-    
-
-    # sezione per la selezione della miniera tramite un menu a tendina
-    html.Div([
-        html.Label("Seleziona la Miniera", style={'marginRight': '10px'}),                                           # etichetta per il menu a tendina
-        dcc.Dropdown(                                                                                                # componente dropdown per selezionare la miniera 
-            id='miniera-dropdown',                                                                                   # ID univoco del componente
-            options=[{'label': m, 'value': m} for m in df['Miniera'].unique()],                                      # opzioni basate sulle miniere nel dataframe
-            value='Miniera1',                                                                                        # imposta il valore di default
-            style={'width': '300px', 'color': '#000000'}                                                             # stile: larghezza e colore del testo
-        ),
-
-        html.Br(),                                                                                                   # linea di separazione tra i componenti
-
-        html.Label("Seleziona intervallo di date"),                                                                  # etichetta per il selettore dell'intervallo di date  
-        
-        # componente per selezionare un intervallo di date
-        dcc.DatePickerRange(                                                                                        
-            id='date-picker',                                                                                        # ID componente
-            min_date_allowed=df['Data'].min(),                                                                       # imposto la data minima selezionabile
-            max_date_allowed=df['Data'].max(),                                                                       # imposto la data massima selezionabile
-            start_date=df['Data'].min(),                                                                             # data di inzio dataset
-            end_date=df['Data'].max(),                                                                               # data di fine dataset
-            display_format='DD/MM/YYYY',                                                                             # mostro le date nel formato che preferisco
-            style={'color': '#000000'}                                                                               # imposto il colore del selettore
-        )
-    ], style={'marginBottom': '40px'}),                                                                              # aggiungo uno spazio sotto la sezione della data
-
-
-    # grafico per la correlazione tra Temperatura e Consumo Energetico
-    html.Div([
-        html.H2("Correlazione Temperatura vs Consumo Energetico", style={'color': '#00BFFF'}),                       # titolo della sezione
-        dcc.Graph(id='grafico-temperatura-energia')                                                                  # definisco il grafico per la correlazione tra temperatura e consumo energetico
-    ], style={'marginBottom': '50px'}),                                                                              # aggiungo uno spazio sotto il grafico
-
-
-    # sezione per monitorare la sicurezza sul lavoro con una tabella
-    html.Div([
-        html.H2("Monitoraggio Sicurezza Lavoratori", style={'color': '#00BFFF'}),                                    # titolo della sezione di sicurezza
-        dcc.Loading(                                                                                                 # componente di caricamento 
-            id="loading-tabella",                                                
-            type="circle",                                                                                           # tipo di caricamento cerchio rotante
-            children=[
-                dash.dash_table.DataTable(                                                                                                          # tabella per monitorare la sicurezza
-                    id='tabella-sicurezza',                                                      
-                    columns=[                                                                                                                       # definizione delle colonne
-                        {'name': 'Giorno', 'id': 'Data', 'type': 'text'},                                                                           # colonna data
-                        {'name': 'Miniera', 'id': 'Miniera'},                                                                                       # colonna nome miniera
-                        {'name': 'Incidenti', 'id': 'Incidenti'},                                                                                   # colonna per il numero incidenti
-                        {'name': 'Ore Senza Incidenti', 'id': 'Ore_Senza_Incidenti'},                                                               # colonna per le ore senza incidenti
-                        {'name': 'Giorni Senza Incidenti', 'id': 'Giorni_senza_incidenti_consecutivi'},                                             # colonna per i giorni senza incidenti
-                        {'name': 'Media Giorni Senza Incidenti', 'id': 'Media_Giorni', 'type': 'numeric', 'format': {'specifier': '.2f'}}           # colonna per la media dei giorni senza incidenti
-                    ],
-                    style_table={'overflowX': 'auto'},                                                               # abilita lo scorrimento orizzontale della tabella se necessario
-                    style_cell={                                                                                     # definizione dello stile per le celle della tabella
-                        'backgroundColor': '#1e1e1e',
-                        'color': '#E0E0E0',
-                        'padding': '10px',
-                        'textAling': 'center'                                                                        # allinea il testo al centro delle celle
-                    },
-                    style_header={                                                                                   # stile per l'intestazione della tabella
-                        'backgroundColor': '#00BFFF',
-                        'color': 'black',
-                        'fontWeight': 'bold'                                                                         # rende il testo per l'intestazione in grassetto
-                    },
-                    page_size=10                                                                                     # limita a 10 il numero di righe  visualizzate per pagina
-                )
-            ]
-        )
-    ], style={'marginBottom': '50px'}),                                                                              # aggiunge uno spazio sotto la sezione della tabella
-
-
-    # gruppo di grafici (produzione, energia, CO2, costi) da visualizzare
-    html.Div([
-        dcc.Graph(id='grafico-produzione'),                                                                          # grafico produzione giornaliera
-        dcc.Graph(id='grafico-energia-co2'),                                                                         # grafico energia ed emissioni CO2
-        dcc.Graph(id='grafico-costi-torta')                                                                          # grafico per visualizzare i costi
-    ])
-])
-
-
-# callback per aggiornare i grafici e la tabella in base ai parametri di input selezionati
-@app.callback(
-    [Output('grafico-produzione', 'figure'),
-     Output('grafico-energia-co2', 'figure'),
-     Output('grafico-costi-torta', 'figure'),
-     Output('tabella-sicurezza', 'data'),
-     Output('grafico-temperatura-energia', 'figure')],
-     [Input('miniera-dropdown', 'value'),
-      Input('date-picker', 'start_date'),
-      Input('date-picker', 'end_date')]
-)
-def aggiorna_grafici(miniera, start_date, end_date):
-    # filtro il DataFrame in base alla miniera e l'intervallo di date selezionato
-    dff = df[(df['Miniera'] == miniera) &
-             (df['Data'] >= pd.to_datetime(start_date)) &
-             (df['Data'] <= pd.to_datetime(end_date))].copy()
-    
-    
-    # calcolo la media dei giorni senza incidenti, per la miniera selezionata e il filtro delle date
-    media_giorni = dff['Giorni_senza_incidenti_consecutivi'].mean()
-    dff['Media_Giorni'] = round(media_giorni, 2)                                                                    # arrotondo il risultato a 2 decimali
-    dff['Data'] = dff['Data'].dt.strftime('%d/%m/%Y')                                                               # converte la data in formato giorno/mese/anno                                                             
-                                  
-    # prepara i dati da visualizzare nella tabella
-    dati_tabella = dff[['Data', 'Miniera', 'Incidenti', 'Ore_Senza_Incidenti', 'Giorni_senza_incidenti_consecutivi', 'Media_Giorni']]
-    
-    
-    # grafico combinato a barre per visualizzare la produzione giornaliera e la percentuale di Rame
-    fig1 = go.Figure()
-    fig1.add_trace(go.Bar(
-        x=dff['Data'],                                                                            # asse x: data
-        y=dff['Tonnellate_giornaliere'],                                                          # asse y: tonnellate giornaliere
-        name='Tonnellate giornaliere',                                                            # etichetta per la barra delle tonnellate
-        marker_color='#00BFFF',
-        yaxis='y1',                                                                               # asse y primario per le tonnellate
-        hovertemplate='%{y} tonnellate<br>%{x|%d/%m/%Y}'                                          # template per il tooltip
-    ))
-    # aggiungo un grafico a linee per la percentuale di rame pulita
-    fig1.add_trace(go.Scatter(
-        x=dff['Data'],                                                                            # asse x: data
-        y=dff['%_Rame_Pulita'],                                                                   # asse y: % rame
-        name='% di Rame',                                                                         # etichetta per la linea della percentuale di rame
-        mode='lines+markers',                                                                     # mosta sia la linea che i punti
-        line=dict(color='#FFA500'),
-        yaxis='y2',                                                                               # asse y secondario per la percentuale di rame
-        hovertemplate='%{y:.2f}% rame<br>%{x|%d/%m/%Y}'                                           # template per il tooltip
-    ))
-    # configuro il layout del grafico combinato
-    fig1.update_layout(
-        template='plotly_dark',                                                                   # tema del grafico
-        title='Produzione Giornaliera e % di Rame',                                               # titolo
-        xaxis=dict(title='Data'),                                                                 # etichetta asse x
-        yaxis=dict(title='Tonnellate', side='left'),                                              # etichetta asse y primario
-        yaxis2=dict(title='% di Rame', overlaying='y', side='right'),                             # etichetta asse y secondario
-        legend=dict(x=0.4, y=1.1, orientation="h"),                                               # posizionamento della legenda
-        margin=dict(l=40, r=40, t=50, b=40)                                                       # margini per evitare sovrapposizioni
-    )
-
-
-    # GRAFICO A LINEE: Consumo di Energia & Emissioni di CO2
-    fig2 = go.Figure()
-    # linea per il consumo energetico (in kWh)
-    fig2.add_trace(go.Scatter(
-        x=dff['Data'],                                                                            # asse x: data
-        y=dff['Consumo_Energia_kWh'],                                                             # asse y: consumo energia kWh
-        name='Consumo Enegia (kWh)',                                                              # etichetta della legenda
-        mode='lines+markers',                                                                     # linea con punti visibili
-        line=dict(color='limegreen'),                                               
-        hovertemplate='%{y:.2f} kWh<br>%{x|%d/%m/%Y}'                                             # tooltip dettagliato
-    ))
-    # linea per le emissioni di CO₂ (in kg)
-    fig2.add_trace(go.Scatter(
-        x=dff['Data'],
-        y=dff['Emissioni_CO2_kg'],
-        name='Emissioni CO₂ (kg)',
-        mode='lines+markers',
-        line=dict(color='crimson'),
-        hovertemplate='%{y:.2f} kg CO₂<br>%{x|%d/%m/%Y}'                                          # tooltip
-    ))
-    # layout del grafico a linee
-    fig2.update_layout(
-        title='Consumo di Energia e Emissioni di CO₂',
-        template='plotly_dark',
-        xaxis=dict(title='Data'),
-        yaxis=dict(title='Valore'),
-        legend=dict(x=0.4, y=1.1, orientation="h"),                                               # posizione e orientamento della legenda
-        margin=dict(l=40, r=40, t=50, b=40)
-)
-    
-    # grafico a ciambella: distribuzione dei costi (lavoro, macchinari, energia)
-    # calcolo dei costi totali per ciascuna categoria
-    costi = [
-        round(dff['Costo_Lavoro'].sum(), 2),
-        round(dff['Costo_Macchinari'].sum(), 2),
-        round(dff['Costo_Energia'].sum(), 2)
-    ]
-    
-    labels = ['Costo_lavoro', 'Costo_Macchinari', 'Costo_Energia']                                # etichette per la legenda
-    # creazione del grafico a ciambella
-    fig3 = go.Figure(data=[go.Pie(
-        labels=labels,
-        values=costi,
-        hole=0.4,                                                                                 # impostazione del buco al centro per rendere il grafico a ciambella
-        marker=dict(colors=['#1f77b4', '#ff7f0e', '#2ca02c']),
-        hovertemplate='%{label}: %{value} €'                                                      # tooltip personalizzato
-    )])
-    # layout del grafico a ciambella
-    fig3.update_layout(
-        title='Distribuzione dei Costi (Lavoro, Macchinari, Energia)',
-        template='plotly_dark',
-        margin=dict(l=40, r=40, t=50, b=40)
-    )
-
-
-    # grafico scatter: temperatura vs consumo energia
-    fig4 = px.scatter(
-        dff,
-        x='Temperatura_C',                                                                        # asse x: temperatura
-        y='Consumo_Energia_kWh',                                                                  # asse y: consumo energia kWh
-        trendline='ols',                                                                          # aggiungo una linea di regressione
-        title='Temperatura vs Consumo Energetico',
-        labels={'Temperatura_C': 'Temperatura (°C)',
-                'Consumo_Energia_kWh': 'Consumo Energetico (kWh)'},
-        color='Temperatura_C',                                                                    # colore dei punti basato sulla temperatura
-        color_continuous_scale='Viridis',                                                         # scala di colore continua
-        template='plotly_dark'
-    )
-
-    fig4.update_layout(
-        margin=dict(l=40, r=40, t=50, b=40),
-        xaxis=dict(title='Temperatura (°C)'),
-        yaxis=dict(title='Consumo Energetico (kWh)'),
-        showlegend=False
-    )
-
-    # RESTITUZIONE DEI GRAFICI
-    # dati_tabella viene convertito in formato dizionario per essere compatibile con il DataTable
-    return fig1, fig2, fig3, dati_tabella.to_dict('records'), fig4
-
-
-# callback per aggiornare la mappa interattiva delle miniere
-@app.callback(
-    Output('mappa-miniere', 'figure'),
-    Input('miniera-dropdown', 'value')
-)
-def aggiorna_mappa(miniera_selezionata):
-     # creo un DataFrame con nomi e coordinate di tutte le miniere (serve per disegnare i punti sulla mappa)
-    df_map = pd.DataFrame([
-        {'Miniera': nome, 'lat': val['lat'], 'lon': val['lon']}
-        for nome, val in coordinate_miniere.items()
-    ])
-    # creo la mappa interattiva con Plotly Express usando Mapbox
-    fig = px.scatter_mapbox(
-        df_map,
-        lat='lat',
-        lon='lon',
-        hover_name='Miniera',                                                                      # mostra il nome al passaggio del mouse
-        zoom=3,                                                                                    # livello di zzom iniziale
-        height=400,                                                                                # altezza in pixel della mappa
-        color_discrete_sequence=["#00BFFF"]                                                        # colore blu per i marker iniziali
-    )
-    # personalizzo i marker: dimensione + aggiungo il nome miniera ai dati personalizzati
-    fig.update_traces(
-        marker=dict(size=15),
-        customdata=df_map[['Miniera']].values
-    )
-    # imposto lo stile della mappa, centro geografico sulla Scandinavia, e layout scuro coerente col resto
-    fig.update_layout(
-        mapbox_style='carto-darkmatter',
-        mapbox_center={"lat": 64.0, "lon": 20.0},                                                  # centro sulla Scandinavia
-        margin=dict(l=0, r=0, t=0, b=0),
-        template='plotly_dark'
-    )
-    # evidenzio la miniera selezionata con un marker
-    selected = df_map[df_map['Miniera'] == miniera_selezionata]
-    if not selected.empty:
-        fig.add_trace(go.Scattermapbox(
-            lat=selected['lat'],
-            lon=selected['lon'],
-            mode='markers',
-            marker=dict(size=25, color='orange'),
-            hoverinfo='none',
-            showlegend=False
-        ))
-    
-    return fig                                                                                    # restituisco la figura finale completa
-
-
-# avvio il server di Dash
-if __name__== '__main__':
-    app.run_server(debug=True)
-
-
-
-
-
+import cProfile
+import math
+import os
+import threading
+import time
+import dash
+from dash import Patch, dcc, html
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import pandas as pd
+import plotly.graph_objects as go
+from flask import Response, g, jsonify, request
+from cache_figure import CacheFigure
+from tabella_sicurezza import pagina_tabella
+from serie_temporali import SOGLIA_WEBGL, aggrega, intervallo_zoom, riduci_lttb
+from avvio_rapido import DatiInCaricamento, leggi_metadati, salva_metadati
+from mappa import MappaMiniere
+from rollup import METRICHE, PERIODI
+from metriche import INTERVALLI_BYTE, metriche
+
+# carico i dati delle miniere dal file CSV: la colonna "Data" arriva già in formato datetime
+# e la colonna derivata "%_Rame_Pulita" è già calcolata (vedi caricamento_dati.py);
+# dopo il primo avvio i dati vengono letti dalla cache binaria accanto al CSV
+# l'indice tiene le righe ordinate per miniera e data, così ogni selezione è una fetta contigua.
+# Con DASHBOARD_BACKEND=dataset i dati restano invece su disco, in una cartella partizionata per mese e blocco di miniere
+# (generate_data.py --partiziona), e ogni richiesta legge solo i file dei mesi e del blocco della miniera e le colonne che servono.
+# Insieme ai dati vengono calcolati i rollup (aggregati per miniera e per settimana, mese e anno)
+# usati dal confronto tra miniere. Ogni DASHBOARD_AGGIORNAMENTO secondi un thread cerca nuove righe
+# nella sorgente e le aggiunge senza riavviare il server (0 = controllo disattivato)
+SORGENTE = os.environ.get('DASHBOARD_SORGENTE', 'dati_miniere123.csv')
+SECONDI_AGGIORNAMENTO = float(os.environ.get('DASHBOARD_AGGIORNAMENTO', 10))
+
+
+# carica i dati (con le librerie per leggerli, importate solo qui) e aggiorna i metadati per il prossimo avvio rapido
+def carica():
+    from dati_in_diretta import DatiInDiretta
+    inizio_caricamento = time.perf_counter()
+    caricati = DatiInDiretta(SORGENTE, os.environ.get('DASHBOARD_BACKEND', 'memoria'), SECONDI_AGGIORNAMENTO)
+    metriche.imposta('dashboard_caricamento_dati_secondi', time.perf_counter() - inizio_caricamento,
+                     'Durata del caricamento iniziale dei dati, dell\'indice e dei rollup')
+    try:
+        salva_metadati(SORGENTE, caricati)
+    except OSError:
+        pass                                                                                       # cartella in sola lettura: l'avvio rapido non sarà disponibile
+    return caricati
+
+
+# con DASHBOARD_AVVIO_RAPIDO=1 (e i metadati salvati da un avvio precedente) il layout viene costruito
+# dai metadati e i dati vengono caricati in background: il server risponde subito e /pronto indica
+# quando i dati sono disponibili. Altrimenti i dati vengono caricati prima di costruire il layout
+AVVIO_RAPIDO = os.environ.get('DASHBOARD_AVVIO_RAPIDO') == '1'
+riepilogo = leggi_metadati(SORGENTE) if AVVIO_RAPIDO else None
+if riepilogo is not None:
+    dati = DatiInCaricamento(carica)
+else:
+    dati = riepilogo = carica()
+
+# colonne lette da ciascun grafico (con il backend su disco vengono lette solo queste)
+COLONNE_PRODUZIONE = ['Data', 'Tonnellate_giornaliere', '%_Rame_Pulita']
+COLONNE_ENERGIA = ['Data', 'Consumo_Energia_kWh', 'Emissioni_CO2_kg']
+COLONNE_SICUREZZA = ['Data', 'Miniera', 'Incidenti', 'Ore_Senza_Incidenti', 'Giorni_senza_incidenti_consecutivi']
+
+# posizioni delle miniere lette dal dataset (colonne Latitudine e Longitudine), per la mappa
+mappa = MappaMiniere(riepilogo)
+DATA_MINIMA, DATA_MASSIMA = riepilogo.date_limite()
+
+
+
+# grafico a ciambella: distribuzione dei costi (lavoro, macchinari, energia)
+# viene creato una sola volta nel layout, i valori arrivano dal callback aggiorna_costi
+def figura_costi():
+    labels = ['Costo_lavoro', 'Costo_Macchinari', 'Costo_Energia']                                # etichette per la legenda
+    # creazione del grafico a ciambella
+    fig3 = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=[0, 0, 0],
+        hole=0.4,                                                                                 # impostazione del buco al centro per rendere il grafico a ciambella
+        marker=dict(colors=['#1f77b4', '#ff7f0e', '#2ca02c']),
+        hovertemplate='%{label}: %{value} €'                                                      # tooltip personalizzato
+    )])
+    # layout del grafico a ciambella
+    fig3.update_layout(
+        title='Distribuzione dei Costi (Lavoro, Macchinari, Energia)',
+        template='plotly_dark',
+        margin=dict(l=40, r=40, t=50, b=40)
+    )
+    return fig3
+
+
+# grafico scatter: temperatura vs consumo energia, creato una sola volta nel layout
+# (prima traccia: i punti colorati in base alla temperatura, seconda traccia: la retta di regressione)
+def figura_temperatura():
+    fig4 = go.Figure()
+    fig4.add_trace(go.Scattergl(
+        x=[], y=[],
+        mode='markers',
+        marker=dict(color=[], coloraxis='coloraxis'),                                             # colore dei punti basato sulla temperatura
+        hovertemplate='Temperatura (°C)=%{x}<br>Consumo Energetico (kWh)=%{y}<extra></extra>'
+    ))
+    fig4.add_trace(go.Scatter(x=[], y=[], mode='lines', showlegend=False))                        # linea di regressione
+    fig4.update_layout(
+        title='Temperatura vs Consumo Energetico',
+        template='plotly_dark',
+        coloraxis=dict(colorscale='Viridis', colorbar=dict(title='Temperatura (°C)')),           # scala di colore continua
+        margin=dict(l=40, r=40, t=50, b=40),
+        xaxis=dict(title='Temperatura (°C)'),
+        yaxis=dict(title='Consumo Energetico (kWh)'),
+        showlegend=False
+    )
+    return fig4
+
+
+# inizzializzo l'applicazione Dash
+app = dash.Dash(__name__)
+app.title = "Dashboard Miniere"
+
+
+# layout dell'app: struttura e design della pagina web
+app.layout = html.Div(style={'backgroundColor': '#121212', 'padding': '20px', 'color': '#E0E0E0'}, children=[        
+    html.H1("MINIERE DI RAME IN SCANDINAVIA", style={'textAlign': 'center', 'color': '#00BFFF'}),                    # titolo principale della pagina, con stile per il colore e l'allineamento
+    dcc.Interval(id='intervallo-aggiornamento', interval=max(SECONDI_AGGIORNAMENTO, 1) * 1000,                       # controllo periodico dei nuovi dati
+                 disabled=SECONDI_AGGIORNAMENTO <= 0),
+    html.Div([                                                                                                       # sezione per visualizzare la mappa delle miniere
+        dcc.Graph(id='mappa-miniere', figure=mappa.figura()),                                                        # definisco il componente grafico della mappa
+        dcc.Store(id='posizioni-miniere', data=mappa.posizioni()),                                                   # posizioni delle miniere, per evidenziare quella selezionata nel browser
+        dcc.Store(id='livello-mappa', data=mappa.vista_iniziale())                                                   # livello di raggruppamento e riquadro attualmente mostrati
+    ], style={'marginBottom': '50px'}),                                                                              # aggiungo uno spazio sotto la mappa
+    
+
+    # sezione per la selezione della miniera tramite un menu a tendina
+    html.Div([
+        html.Label("Seleziona la Miniera", style={'marginRight': '10px'}),                                           # etichetta per il menu a tendina
+        dcc.Dropdown(                                                                                                # componente dropdown per selezionare la miniera 
+            id='miniera-dropdown',                                                                                   # ID univoco del componente
+            options=[{'label': m, 'value': m} for m in riepilogo.miniere()],                                         # opzioni basate sulle miniere del dataset
+            value=riepilogo.miniere()[0],                                                                            # imposta il valore di default (la prima miniera del dataset)
+            style={'width': '300px', 'color': '#000000'}                                                             # stile: larghezza e colore del testo
+        ),
+
+        html.Br(),                                                                                                   # linea di separazione tra i componenti
+
+        html.Label("Seleziona intervallo di date"),                                                                  # etichetta per il selettore dell'intervallo di date  
+        
+        # componente per selezionare un intervallo di date
+        dcc.DatePickerRange(                                                                                        
+            id='date-picker',                                                                                        # ID componente
+            min_date_allowed=DATA_MINIMA,                                                                            # imposto la data minima selezionabile
+            max_date_allowed=DATA_MASSIMA,                                                                           # imposto la data massima selezionabile
+            start_date=DATA_MINIMA,                                                                                  # data di inzio dataset
+            end_date=DATA_MASSIMA,                                                                                   # data di fine dataset
+            display_format='DD/MM/YYYY',                                                                             # mostro le date nel formato che preferisco
+            style={'color': '#000000'}                                                                               # imposto il colore del selettore
+        )
+    ], style={'marginBottom': '40px'}),                                                                              # aggiungo uno spazio sotto la sezione della data
+
+
+    # grafico per la correlazione tra Temperatura e Consumo Energetico
+    html.Div([
+        html.H2("Correlazione Temperatura vs Consumo Energetico", style={'color': '#00BFFF'}),                       # titolo della sezione
+        dcc.Graph(id='grafico-temperatura-energia', figure=figura_temperatura())                                     # definisco il grafico per la correlazione tra temperatura e consumo energetico
+    ], style={'marginBottom': '50px'}),                                                                              # aggiungo uno spazio sotto il grafico
+
+
+    # sezione per monitorare la sicurezza sul lavoro con una tabella
+    html.Div([
+        html.H2("Monitoraggio Sicurezza Lavoratori", style={'color': '#00BFFF'}),                                    # titolo della sezione di sicurezza
+        dcc.Loading(                                                                                                 # componente di caricamento 
+            id="loading-tabella",                                                
+            type="circle",                                                                                           # tipo di caricamento cerchio rotante
+            children=[
+                dash.dash_table.DataTable(                                                                                                          # tabella per monitorare la sicurezza
+                    id='tabella-sicurezza',                                                      
+                    columns=[                                                                                                                       # definizione delle colonne
+                        {'name': 'Giorno', 'id': 'Data', 'type': 'text'},                                                                           # colonna data
+                        {'name': 'Miniera', 'id': 'Miniera'},                                                                                       # colonna nome miniera
+                        {'name': 'Incidenti', 'id': 'Incidenti'},                                                                                   # colonna per il numero incidenti
+                        {'name': 'Ore Senza Incidenti', 'id': 'Ore_Senza_Incidenti'},                                                               # colonna per le ore senza incidenti
+                        {'name': 'Giorni Senza Incidenti', 'id': 'Giorni_senza_incidenti_consecutivi'},                                             # colonna per i giorni senza incidenti
+                        {'name': 'Media Giorni Senza Incidenti', 'id': 'Media_Giorni', 'type': 'numeric', 'format': {'specifier': '.2f'}}           # colonna per la media dei giorni senza incidenti
+                    ],
+                    style_table={'overflowX': 'auto'},                                                               # abilita lo scorrimento orizzontale della tabella se necessario
+                    style_cell={                                                                                     # definizione dello stile per le celle della tabella
+                        'backgroundColor': '#1e1e1e',
+                        'color': '#E0E0E0',
+                        'padding': '10px',
+                        'textAling': 'center'                                                                        # allinea il testo al centro delle celle
+                    },
+                    style_header={                                                                                   # stile per l'intestazione della tabella
+                        'backgroundColor': '#00BFFF',
+                        'color': 'black',
+                        'fontWeight': 'bold'                                                                         # rende il testo per l'intestazione in grassetto
+                    },
+                    page_size=10,                                                                                    # limita a 10 il numero di righe  visualizzate per pagina
+                    page_current=0,
+                    page_action='custom',                                                                            # paginazione, ordinamento e filtro vengono fatti dal server:
+                    sort_action='custom',                                                                            # il browser riceve solo le righe della pagina visibile
+                    sort_mode='single',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query=''
+                )
+            ]
+        )
+    ], style={'marginBottom': '50px'}),                                                                              # aggiunge uno spazio sotto la sezione della tabella
+
+
+    # gruppo di grafici (produzione, energia, CO2, costi) da visualizzare
+    html.Div([
+        dcc.Graph(id='grafico-produzione'),                                                                          # grafico produzione giornaliera
+        dcc.Graph(id='grafico-energia-co2'),                                                                         # grafico energia ed emissioni CO2
+        dcc.Graph(id='grafico-costi-torta', figure=figura_costi())                                                   # grafico per visualizzare i costi
+    ], style={'marginBottom': '50px'}),
+
+
+    # sezione per confrontare più miniere (o l'intera flotta) nell'intervallo di date selezionato
+    html.Div([
+        html.H2("Confronto tra Miniere", style={'color': '#00BFFF'}),                                                # titolo della sezione di confronto
+        dcc.Dropdown(                                                                                                # scelta multipla delle miniere da confrontare
+            id='confronto-miniere',
+            options=[{'label': m, 'value': m} for m in riepilogo.miniere()],
+            value=riepilogo.miniere()[:3],                                                                           # di default le prime tre miniere
+            multi=True,
+            style={'color': '#000000'}
+        ),
+        dcc.Checklist(                                                                                               # aggiunge la serie dell'intera flotta
+            id='confronto-flotta',
+            options=[{'label': ' Intera flotta', 'value': 'flotta'}],
+            value=[],
+            style={'marginTop': '10px'}
+        ),
+        dcc.RadioItems(                                                                                              # periodo di aggregazione
+            id='confronto-periodo',
+            options=[{'label': f' {etichetta}', 'value': periodo} for periodo, etichetta in PERIODI.items()],
+            value='mese',
+            inline=True,
+            style={'marginTop': '10px'}
+        ),
+        dcc.Dropdown(                                                                                                # grandezza da confrontare
+            id='confronto-metrica',
+            options=[{'label': etichetta, 'value': metrica} for metrica, etichetta in METRICHE.items()],
+            value='Tonnellate_giornaliere',
+            clearable=False,
+            style={'width': '300px', 'color': '#000000', 'marginTop': '10px'}
+        ),
+        dcc.Graph(id='grafico-confronto')                                                                            # grafico del confronto
+    ])
+])
+
+
+# ogni grafico ha il proprio callback: Dash li esegue come richieste separate (anche in parallelo,
+# su più thread o processi) e una modifica paga solo il lavoro del grafico che la riguarda
+
+# restituisce il risultato del calcolo dalla cache, calcolandolo solo se manca
+# (le date del selettore possono arrivare con o senza orario: le normalizzo così la stessa vista ha sempre la stessa chiave)
+def grafico_memorizzato(nome, miniera, start_date, end_date):
+    chiave = (nome, miniera, chiave_data(start_date), chiave_data(end_date))
+    return cache_grafici.ottieni(chiave, lambda: GRAFICI_MEMORIZZATI[nome](*chiave[1:]))
+
+
+# callback per il grafico della produzione e della percentuale di rame
+@app.callback(
+    Output('grafico-produzione', 'figure'),
+    [Input('miniera-dropdown', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def aggiorna_produzione(miniera, start_date, end_date):
+    return grafico_memorizzato('produzione', miniera, start_date, end_date)
+
+
+# callback per il grafico del consumo di energia e delle emissioni di CO2
+@app.callback(
+    Output('grafico-energia-co2', 'figure'),
+    [Input('miniera-dropdown', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def aggiorna_energia(miniera, start_date, end_date):
+    return grafico_memorizzato('energia', miniera, start_date, end_date)
+
+
+# callback per il grafico a ciambella dei costi: la figura è già nel layout,
+# quindi invio solo i tre nuovi valori (aggiornamento parziale con Patch)
+@app.callback(
+    Output('grafico-costi-torta', 'figure'),
+    [Input('miniera-dropdown', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def aggiorna_costi(miniera, start_date, end_date):
+    # calcolo dei costi totali per ciascuna categoria (dalle somme cumulative, senza scorrere le righe)
+    with metriche.fase('costi', 'somme'):
+        costi = [
+            round(totale, 2)
+            for totale in dati.istantanea().somme(miniera, start_date, end_date, ['Costo_Lavoro', 'Costo_Macchinari', 'Costo_Energia'])
+        ]
+    figura = Patch()
+    figura['data'][0]['values'] = costi
+    return figura
+
+
+# callback per il grafico scatter temperatura vs consumo: aggiorno solo i punti e la retta di regressione
+@app.callback(
+    Output('grafico-temperatura-energia', 'figure'),
+    [Input('miniera-dropdown', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def aggiorna_temperatura(miniera, start_date, end_date):
+    figura = Patch()
+    for percorso, valore in grafico_memorizzato('temperatura', miniera, start_date, end_date):
+        nodo = figura['data']
+        for chiave in percorso[:-1]:
+            nodo = nodo[chiave]
+        nodo[percorso[-1]] = valore
+    return figura
+
+
+# calcola il grafico della produzione per la miniera e l'intervallo di date selezionati
+# (la figura viene restituita già convertita in dizionario, pronta per essere salvata nella cache)
+def calcola_produzione(miniera, start_date, end_date):
+    # seleziono solo le righe della miniera nell'intervallo di date (ricerca binaria sull'indice, senza copie)
+    with metriche.fase('produzione', 'selezione'):
+        dff = dati.istantanea().seleziona(miniera, start_date, end_date, COLONNE_PRODUZIONE)
+    metriche.righe('produzione', len(dff))
+    with metriche.fase('produzione', 'figura'):
+        fig = figura_produzione(dff, [miniera, start_date, end_date])
+    with metriche.fase('produzione', 'serializzazione'):
+        return fig.to_dict()
+
+
+# calcola il grafico dell'energia e delle emissioni per la miniera e l'intervallo di date selezionati
+def calcola_energia(miniera, start_date, end_date):
+    with metriche.fase('energia', 'selezione'):
+        dff = dati.istantanea().seleziona(miniera, start_date, end_date, COLONNE_ENERGIA)
+    metriche.righe('energia', len(dff))
+    with metriche.fase('energia', 'figura'):
+        fig = figura_energia(dff, [miniera, start_date, end_date])
+    with metriche.fase('energia', 'serializzazione'):
+        return fig.to_dict()
+
+
+# calcola i nuovi valori delle due tracce del grafico temperatura vs consumo (i punti e la retta di regressione),
+# come elenco di coppie (percorso nella lista delle tracce, valore) da applicare con Patch
+# (punti e retta vengono dalla stessa istantanea dei dati, anche se nel frattempo arriva un aggiornamento)
+def calcola_temperatura(miniera, start_date, end_date):
+    attuali = dati.istantanea()
+    with metriche.fase('temperatura', 'selezione'):
+        dff = attuali.seleziona(miniera, start_date, end_date, ['Temperatura_C', 'Consumo_Energia_kWh'])
+    metriche.righe('temperatura', len(dff))
+    with metriche.fase('temperatura', 'serializzazione'):
+        temperature = dff['Temperatura_C'].tolist()
+        modifiche = [
+            ((0, 'x'), temperature),
+            ((0, 'y'), dff['Consumo_Energia_kWh'].tolist()),
+            ((0, 'marker', 'color'), temperature)
+        ]
+
+    # linea di regressione (minimi quadrati) calcolata dalle somme cumulative dell'indice,
+    # senza adattare ogni volta un modello con statsmodels
+    with metriche.fase('temperatura', 'regressione'):
+        pendenza, intercetta, r2 = attuali.regressione(miniera, start_date, end_date)
+    if math.isnan(pendenza):                                                                      # la retta esiste solo con almeno due temperature diverse
+        return modifiche + [((1, 'x'), []), ((1, 'y'), [])]
+    estremi_x = [min(temperature), max(temperature)]
+    return modifiche + [
+        ((1, 'x'), estremi_x),
+        ((1, 'y'), [pendenza * x + intercetta for x in estremi_x]),
+        ((1, 'hovertemplate'), f'<b>OLS trendline</b><br>Consumo_Energia_kWh = {pendenza:g} * Temperatura_C + {intercetta:g}'
+                               f'<br>R<sup>2</sup>={r2:g}<br><br>Temperatura (°C)=%{{x}}<br>Consumo Energetico (kWh)=%{{y}} <b>(trend)</b><extra></extra>')
+    ]
+
+
+# grafici i cui risultati vengono salvati nella cache, con la funzione che li calcola
+GRAFICI_MEMORIZZATI = {
+    'produzione': calcola_produzione,
+    'energia': calcola_energia,
+    'temperatura': calcola_temperatura
+}
+
+
+# proprietà che cambiano le righe della tabella della sicurezza (e non solo la pagina o l'ordine mostrati)
+NUOVA_SELEZIONE_TABELLA = {'miniera-dropdown.value', 'date-picker.start_date', 'date-picker.end_date',
+                           'tabella-sicurezza.filter_query'}
+
+
+# callback per la tabella della sicurezza: restituisce solo la pagina visibile,
+# dopo aver applicato lato server il filtro e l'ordinamento scelti nella tabella.
+# Restituisce anche il numero della pagina, così l'indicatore "pagina / pagine" resta corretto:
+# quando cambiano la miniera, le date o il filtro la tabella torna alla prima pagina
+@app.callback(
+    [Output('tabella-sicurezza', 'data'),
+     Output('tabella-sicurezza', 'page_count'),
+     Output('tabella-sicurezza', 'page_current')],
+    [Input('miniera-dropdown', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date'),
+     Input('tabella-sicurezza', 'page_current'),
+     Input('tabella-sicurezza', 'page_size'),
+     Input('tabella-sicurezza', 'sort_by'),
+     Input('tabella-sicurezza', 'filter_query')]
+)
+def aggiorna_tabella(miniera, start_date, end_date, page_current, page_size, sort_by, filter_query):
+    if NUOVA_SELEZIONE_TABELLA & set(dash.ctx.triggered_prop_ids):                               # nuova selezione: riparto dalla prima pagina
+        page_current = 0
+    attuali = dati.istantanea()                                                                   # media e righe della stessa versione dei dati
+    # la media dei giorni senza incidenti riguarda tutto l'intervallo selezionato (dalle somme cumulative)
+    with metriche.fase('tabella', 'media'):
+        media_giorni = attuali.media('Giorni_senza_incidenti_consecutivi', miniera, start_date, end_date)
+    with metriche.fase('tabella', 'selezione'):
+        dff = attuali.seleziona(miniera, start_date, end_date, COLONNE_SICUREZZA)
+    metriche.righe('tabella', len(dff))
+    with metriche.fase('tabella', 'pagina'):                                                     # filtro, ordinamento e conversione in record della pagina
+        return pagina_tabella(dff, media_giorni, page_current, page_size, sort_by, filter_query)
+
+
+# grafico combinato a barre per visualizzare la produzione giornaliera e la percentuale di Rame:
+# se l'intervallo supera la soglia di punti, i valori giornalieri vengono mediati per settimana o per mese
+# (revisione: identifica la selezione, così plotly mantiene lo zoom dell'utente quando la figura viene aggiornata)
+def figura_produzione(dff, revisione=None):
+    serie, risoluzione = aggrega(dff, ['Tonnellate_giornaliere', '%_Rame_Pulita'])
+    Linea = go.Scattergl if len(serie) > SOGLIA_WEBGL else go.Scatter                             # con molti punti uso WebGL invece dell'SVG
+    fig1 = go.Figure()
+    fig1.add_trace(go.Bar(
+        x=serie['Data'],                                                                          # asse x: data
+        y=serie['Tonnellate_giornaliere'],                                                        # asse y: tonnellate giornaliere
+        name='Tonnellate giornaliere',                                                            # etichetta per la barra delle tonnellate
+        marker_color='#00BFFF',
+        yaxis='y1',                                                                               # asse y primario per le tonnellate
+        hovertemplate='%{y:.2f} tonnellate<br>%{x|%d/%m/%Y}'                                      # template per il tooltip
+    ))
+    # aggiungo un grafico a linee per la percentuale di rame pulita
+    fig1.add_trace(Linea(
+        x=serie['Data'],                                                                          # asse x: data
+        y=serie['%_Rame_Pulita'],                                                                   # asse y: % rame
+        name='% di Rame',                                                                         # etichetta per la linea della percentuale di rame
+        mode='lines+markers',                                                                     # mosta sia la linea che i punti
+        line=dict(color='#FFA500'),
+        yaxis='y2',                                                                               # asse y secondario per la percentuale di rame
+        hovertemplate='%{y:.2f}% rame<br>%{x|%d/%m/%Y}'                                           # template per il tooltip
+    ))
+    # configuro il layout del grafico combinato
+    fig1.update_layout(
+        template='plotly_dark',                                                                   # tema del grafico
+        title=titolo_con_risoluzione('Produzione Giornaliera e % di Rame', risoluzione),          # titolo
+        xaxis=dict(title='Data'),                                                                 # etichetta asse x
+        yaxis=dict(title='Tonnellate', side='left'),                                              # etichetta asse y primario
+        yaxis2=dict(title='% di Rame', overlaying='y', side='right'),                             # etichetta asse y secondario
+        legend=dict(x=0.4, y=1.1, orientation="h"),                                               # posizionamento della legenda
+        margin=dict(l=40, r=40, t=50, b=40),                                                      # margini per evitare sovrapposizioni
+        uirevision=revisione
+    )
+    return fig1
+
+
+# GRAFICO A LINEE: Consumo di Energia & Emissioni di CO2
+# se l'intervallo supera la soglia di punti, la serie viene ridotta con LTTB (conserva picchi e andamento)
+def figura_energia(dff, revisione=None):
+    serie, risoluzione = riduci_lttb(dff, ['Consumo_Energia_kWh', 'Emissioni_CO2_kg'])
+    Linea = go.Scattergl if len(serie) > SOGLIA_WEBGL else go.Scatter
+    fig2 = go.Figure()
+    # linea per il consumo energetico (in kWh)
+    fig2.add_trace(Linea(
+        x=serie['Data'],                                                                          # asse x: data
+        y=serie['Consumo_Energia_kWh'],                                                             # asse y: consumo energia kWh
+        name='Consumo Enegia (kWh)',                                                              # etichetta della legenda
+        mode='lines+markers',                                                                     # linea con punti visibili
+        line=dict(color='limegreen'),                                               
+        hovertemplate='%{y:.2f} kWh<br>%{x|%d/%m/%Y}'                                             # tooltip dettagliato
+    ))
+    # linea per le emissioni di CO₂ (in kg)
+    fig2.add_trace(Linea(
+        x=serie['Data'],
+        y=serie['Emissioni_CO2_kg'],
+        name='Emissioni CO₂ (kg)',
+        mode='lines+markers',
+        line=dict(color='crimson'),
+        hovertemplate='%{y:.2f} kg CO₂<br>%{x|%d/%m/%Y}'                                          # tooltip
+    ))
+    # layout del grafico a linee
+    fig2.update_layout(
+        title=titolo_con_risoluzione('Consumo di Energia e Emissioni di CO₂', risoluzione),
+        template='plotly_dark',
+        xaxis=dict(title='Data'),
+        yaxis=dict(title='Valore'),
+        legend=dict(x=0.4, y=1.1, orientation="h"),                                               # posizione e orientamento della legenda
+        margin=dict(l=40, r=40, t=50, b=40),
+        uirevision=revisione
+)
+    return fig2
+
+
+# aggiunge al titolo la risoluzione usata, se i dati non sono quelli giornalieri
+def titolo_con_risoluzione(titolo, risoluzione):
+    return titolo if risoluzione == 'giornaliera' else f'{titolo} ({risoluzione})'
+
+
+# ricostruisce un grafico per l'intervallo ingrandito dall'utente, con il dettaglio più fine possibile;
+# quando l'utente torna alla vista completa (doppio clic) viene ricostruito per tutta la selezione
+def figura_zoom(costruisci, colonne, relayout, miniera, start_date, end_date):
+    zoom = intervallo_zoom(relayout)
+    if zoom is None and not (relayout or {}).get('xaxis.autorange'):
+        raise PreventUpdate                                                                       # evento che non riguarda l'asse x (ridimensionamento, legenda...)
+    inizio, fine = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if zoom is not None:
+        inizio, fine = max(inizio, zoom[0].floor('D')), min(fine, zoom[1].ceil('D'))
+    with metriche.fase('zoom', 'selezione'):
+        dff = dati.istantanea().seleziona(miniera, inizio, fine, colonne)
+    metriche.righe('zoom', len(dff))
+    with metriche.fase('zoom', 'figura'):
+        fig = costruisci(dff, [miniera, start_date, end_date])
+    with metriche.fase('zoom', 'serializzazione'):
+        return fig.to_dict()
+
+
+# callback per il dettaglio su richiesta: lo zoom sul grafico della produzione carica i dati più fini
+@app.callback(
+    Output('grafico-produzione', 'figure', allow_duplicate=True),
+    Input('grafico-produzione', 'relayoutData'),
+    [State('miniera-dropdown', 'value'),
+     State('date-picker', 'start_date'),
+     State('date-picker', 'end_date')],
+    prevent_initial_call=True
+)
+def dettaglio_produzione(relayout, miniera, start_date, end_date):
+    return figura_zoom(figura_produzione, COLONNE_PRODUZIONE, relayout, miniera, start_date, end_date)
+
+
+# callback per il dettaglio su richiesta del grafico dell'energia e delle emissioni
+@app.callback(
+    Output('grafico-energia-co2', 'figure', allow_duplicate=True),
+    Input('grafico-energia-co2', 'relayoutData'),
+    [State('miniera-dropdown', 'value'),
+     State('date-picker', 'start_date'),
+     State('date-picker', 'end_date')],
+    prevent_initial_call=True
+)
+def dettaglio_energia(relayout, miniera, start_date, end_date):
+    return figura_zoom(figura_energia, COLONNE_ENERGIA, relayout, miniera, start_date, end_date)
+
+
+
+# callback per il confronto tra miniere: legge i valori dai rollup (una riga per miniera e periodo),
+# quindi il costo dipende dal numero di periodi mostrati e non dal numero di giorni; solo il primo e l'ultimo
+# periodo, se tagliati dalle date scelte, vengono ricalcolati sui giorni selezionati come negli altri grafici.
+# Il confronto giornaliero legge invece le righe delle miniere scelte dall'indice o dal dataset
+@app.callback(
+    Output('grafico-confronto', 'figure'),
+    [Input('confronto-miniere', 'value'),
+     Input('confronto-flotta', 'value'),
+     Input('confronto-periodo', 'value'),
+     Input('confronto-metrica', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
+)
+def aggiorna_confronto(miniere, flotta, periodo, metrica, start_date, end_date):
+    attuali = dati.istantanea()                                                                   # rollup e righe giornaliere della stessa versione
+    with metriche.fase('confronto', 'rollup'):
+        serie = attuali.rollup.confronto(miniere or [], periodo, metrica, start_date, end_date,
+                                         flotta='flotta' in (flotta or []), dati=attuali)
+    metriche.righe('confronto', serie.size)
+    with metriche.fase('confronto', 'figura'):
+        Linea = go.Scattergl if len(serie) > SOGLIA_WEBGL else go.Scatter                         # con molti punti uso WebGL invece dell'SVG
+        fig = go.Figure([Linea(x=serie.index, y=serie[nome], mode='lines', name=nome) for nome in serie.columns])
+        fig.update_layout(
+            title=f'{METRICHE[metrica]} - confronto {PERIODI[periodo].lower()}',
+            template='plotly_dark',
+            margin=dict(l=40, r=40, t=50, b=40),
+            xaxis=dict(title='Periodo'),
+            yaxis=dict(title=METRICHE[metrica]),
+            legend=dict(x=0, y=1.1, orientation='h')
+        )
+    return fig
+
+
+# callback per l'aggiornamento in diretta: quando arrivano nuovi giorni estendo il selettore delle date
+# e aggiorno l'elenco delle miniere; se l'intervallo scelto arrivava fino all'ultima data disponibile
+# sposto anche la sua fine, così tutti i grafici si ricalcolano con i nuovi giorni
+# (confronto le date e non la versione, che con più processi può essere diversa da un processo all'altro)
+@app.callback(
+    [Output('date-picker', 'max_date_allowed'),
+     Output('date-picker', 'end_date'),
+     Output('miniera-dropdown', 'options'),
+     Output('confronto-miniere', 'options')],
+    Input('intervallo-aggiornamento', 'n_intervals'),
+    [State('date-picker', 'end_date'),
+     State('date-picker', 'max_date_allowed')],
+    prevent_initial_call=True
+)
+def aggiorna_date(_, end_date, max_date_allowed):
+    attuali = dati.istantanea()
+    data_massima = chiave_data(attuali.date_limite()[1])
+    if data_massima <= chiave_data(max_date_allowed):
+        raise PreventUpdate
+    segue_fine = end_date is not None and chiave_data(end_date) >= chiave_data(max_date_allowed)
+    opzioni = [{'label': m, 'value': m} for m in attuali.miniere()]
+    return data_massima, data_massima if segue_fine else dash.no_update, opzioni, opzioni
+
+
+# il controllo dei nuovi dati parte con la prima richiesta ricevuta da ogni processo
+# (con gunicorn e preload_app il modulo viene importato prima della fork, e i thread non la sopravvivono)
+@app.server.before_request
+def avvia_aggiornamento():
+    dati.avvia()
+
+
+# trasforma una data del selettore nel formato AAAA-MM-GG
+def chiave_data(data):
+    return None if data is None else pd.Timestamp(data).strftime('%Y-%m-%d')
+
+
+# viste aperte più spesso: per ogni miniera l'intero periodo e l'ultimo mese disponibile
+def viste_comuni():
+    data_minima, data_massima = dati.date_limite()
+    inizio, fine = chiave_data(data_minima), chiave_data(data_massima)
+    inizio_mese = chiave_data(data_massima.replace(day=1))
+    for miniera in dati.miniere():
+        for nome in GRAFICI_MEMORIZZATI:
+            yield (nome, miniera, inizio, fine)
+            yield (nome, miniera, inizio_mese, fine)
+
+
+# cache delle figure: dimensione e durata configurabili con le variabili d'ambiente,
+# svuotata automaticamente quando cambia la versione del dataset
+cache_grafici = CacheFigure(
+    dimensione_massima=int(os.environ.get('DASHBOARD_CACHE_DIMENSIONE', 256)),
+    durata_secondi=float(os.environ.get('DASHBOARD_CACHE_DURATA', 900)),
+    versione_dati=lambda: dati.versione
+)
+
+# se richiesto, calcolo subito le viste più comuni così le prime richieste trovano già le figure pronte
+# (con l'avvio rapido in un thread separato, che aspetta la fine del caricamento dei dati)
+def preriscalda_cache():
+    cache_grafici.preriscalda(viste_comuni(), lambda nome, *vista: GRAFICI_MEMORIZZATI[nome](*vista))
+
+
+if os.environ.get('DASHBOARD_PRERISCALDA_CACHE') == '1':
+    if dati.pronto():
+        preriscalda_cache()
+    else:
+        threading.Thread(target=preriscalda_cache, name='preriscaldamento-cache', daemon=True).start()
+
+
+# i contatori della cache (successi, mancati, elementi) sono consultabili su /cache-grafici
+@app.server.route('/cache-grafici')
+def statistiche_cache_grafici():
+    return jsonify(cache_grafici.statistiche())
+
+
+# misura di ogni richiesta di un callback (durata complessiva, compresa la serializzazione in JSON, e byte della risposta);
+# con DASHBOARD_PROFILO=1 ogni richiesta viene anche profilata con cProfile e il risultato salvato
+# nella cartella DASHBOARD_PROFILO_CARTELLA (un file .prof per richiesta, da aprire con pstats o snakeviz)
+PROFILO = os.environ.get('DASHBOARD_PROFILO') == '1'
+CARTELLA_PROFILI = os.environ.get('DASHBOARD_PROFILO_CARTELLA', 'profili')
+profilo_in_uso = threading.Lock()                                                                 # cProfile può profilare una sola richiesta alla volta
+
+
+# nome della funzione del callback a cui è diretta la richiesta corrente
+def nome_callback():
+    corpo = request.get_json(silent=True) or {}
+    callback = app.callback_map.get(corpo.get('output'), {}).get('callback')
+    return getattr(callback, '__name__', 'sconosciuto')
+
+
+@app.server.before_request
+def inizia_misura():
+    if request.path != '/_dash-update-component':
+        return
+    g.inizio_richiesta = time.perf_counter()
+    if PROFILO and profilo_in_uso.acquire(blocking=False):
+        g.profilo = cProfile.Profile()
+        g.profilo.enable()
+
+
+@app.server.after_request
+def termina_misura(risposta):
+    if 'inizio_richiesta' not in g:
+        return risposta
+    durata = time.perf_counter() - g.inizio_richiesta
+    callback = nome_callback()
+    if 'profilo' in g:
+        g.profilo.disable()
+        profilo_in_uso.release()
+        os.makedirs(CARTELLA_PROFILI, exist_ok=True)
+        g.profilo.dump_stats(os.path.join(CARTELLA_PROFILI, f'{callback}-{time.time_ns()}.prof'))
+    metriche.osserva('dashboard_richiesta_durata_secondi', durata, 'Durata delle richieste dei callback', callback=callback)
+    metriche.osserva('dashboard_risposta_byte', risposta.calculate_content_length() or 0,
+                     'Byte delle risposte dei callback', INTERVALLI_BYTE, callback=callback)
+    # con più processi le metriche di questo processo vengono salvate da un thread in background (una volta al secondo),
+    # così la pagina /metrics servita da un altro processo le trova senza scrivere file durante le richieste
+    metriche.salva_periodicamente(aggiorna_metriche_processo)
+    return risposta
+
+
+# metriche sullo stato del processo: i contatori della cache delle figure e lo stato del dataset
+def aggiorna_metriche_processo():
+    statistiche = cache_grafici.statistiche()
+    metriche.imposta('dashboard_cache_richieste_totale', statistiche['successi'], 'Richieste alla cache delle figure',
+                     'counter', esito='successo')
+    metriche.imposta('dashboard_cache_richieste_totale', statistiche['mancati'], 'Richieste alla cache delle figure',
+                     'counter', esito='mancato')
+    metriche.imposta('dashboard_cache_percentuale_successi', statistiche['percentuale_successi'],
+                     'Percentuale delle richieste servite dalla cache delle figure')
+    metriche.imposta('dashboard_cache_elementi', statistiche['elementi'], 'Figure salvate nella cache')
+    metriche.imposta('dashboard_pronto', int(dati.pronto()), 'Dati caricati e pronti (1) o ancora in caricamento (0)')
+    if not dati.pronto():
+        return
+    metriche.imposta('dashboard_dati_versione', dati.versione, 'Versione del dataset caricato')
+    metriche.imposta('dashboard_dati_aggiornamenti_totale', dati.aggiornamenti,
+                     'Aggiornamenti del dataset letti dalla sorgente dopo l\'avvio', 'counter')
+    if dati.durata_ultimo_aggiornamento is not None:
+        metriche.imposta('dashboard_dati_ultimo_aggiornamento_secondi', dati.durata_ultimo_aggiornamento,
+                         'Durata dell\'ultimo aggiornamento del dataset')
+
+
+# metriche nel formato testuale di Prometheus: oltre a quelle raccolte durante le richieste,
+# lo stato della cache e del dataset. Con gunicorn e DASHBOARD_METRICHE_CARTELLA (impostata da gunicorn.conf.py)
+# la pagina riporta le metriche di tutti i processi, qualunque sia quello che risponde (quelle degli altri processi
+# come le hanno salvate al più tardi un secondo prima, vedi metriche.salva_periodicamente); senza la cartella
+# riporta solo quelle del processo che risponde, e ogni processo andrebbe interrogato a parte
+@app.server.route('/metrics')
+def pagina_metriche():
+    aggiorna_metriche_processo()
+    return Response(metriche.testo(), mimetype='text/plain; version=0.0.4')
+
+
+# stato di prontezza del processo, per il bilanciatore di carico o per la sonda di readiness:
+# 200 quando i dati sono caricati, 503 durante il caricamento (o se il caricamento è fallito)
+@app.server.route('/pronto')
+def pronto():
+    if dati.pronto():
+        return jsonify({'pronto': True, 'versione': dati.versione})
+    return jsonify({'pronto': False, 'errore': dati.errore_caricamento}), 503
+
+
+# callback per la mappa: quando lo zoom cambia livello o lo spostamento esce dal riquadro già inviato,
+# sostituisco solo i punti della prima traccia con le miniere (o i gruppi di miniere) visibili,
+# già calcolati e salvati per ogni livello e riquadro
+@app.callback(
+    [Output('mappa-miniere', 'figure', allow_duplicate=True),
+     Output('livello-mappa', 'data')],
+    Input('mappa-miniere', 'relayoutData'),
+    State('livello-mappa', 'data'),
+    prevent_initial_call=True
+)
+def aggiorna_mappa(relayout, vista_attuale):
+    vista = mappa.vista(relayout) if relayout else None
+    if vista is None:
+        raise PreventUpdate                                                                       # nessuna informazione sullo zoom (ad esempio un clic)
+    livello, riquadro = vista
+    if [livello, list(riquadro) if riquadro else None] == vista_attuale:
+        raise PreventUpdate
+    with metriche.fase('mappa', 'punti'):
+        punti = mappa.punti(livello, riquadro)
+    figura = Patch()
+    for proprieta, valore in punti.items():
+        figura['data'][0][proprieta] = valore
+    return figura, vista
+
+
+# callback lato client per evidenziare la miniera selezionata: viene eseguito nel browser,
+# sposta solo il marker arancione e lascia invariata la mappa di base (nessuna richiesta al server)
+app.clientside_callback(
+    """
+    function(miniera, posizioni, figura) {
+        if (!figura) {
+            return window.dash_clientside.no_update;
+        }
+        const posizione = posizioni[miniera];
+        const evidenziata = Object.assign({}, figura.data[1], {
+            lat: posizione ? [posizione[0]] : [],
+            lon: posizione ? [posizione[1]] : []
+        });
+        return Object.assign({}, figura, {data: [figura.data[0], evidenziata].concat(figura.data.slice(2))});
+    }
+    """,
+    Output('mappa-miniere', 'figure'),
+    Input('miniera-dropdown', 'value'),
+    State('posizioni-miniere', 'data'),
+    State('mappa-miniere', 'figure')
+)
+
+
+# server WSGI (Flask) usato in produzione, ad esempio con gunicorn:
+#     gunicorn -c gunicorn.conf.py dashboardpython:server
+server = app.server
+
+
+# avvio il server di sviluppo di Dash (debug attivo solo se richiesto con DASHBOARD_DEBUG=1)
+if __name__== '__main__':
+    app.run_server(debug=os.environ.get('DASHBOARD_DEBUG') == '1')
+
+
+
+
+
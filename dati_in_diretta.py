@@ -0,0 +1,230 @@
+# aggiornamento in diretta del dataset, senza riavviare la dashboard: un thread in background controlla
+# periodicamente la sorgente e, quando vi trova nuove righe, legge solo quelle (la coda del CSV
+# o i nuovi file della cartella partizionata), costruisce a parte i dati e i rollup della versione successiva
+# e li sostituisce a quelli attuali con un solo assegnamento. Ogni callback chiede all'inizio l'istantanea
+# corrente (dati e rollup della stessa versione) e la usa per tutte le sue letture, così non mescola
+# mai due versioni; le cache vedono la nuova versione e si svuotano
+import io
+import os
+import threading
+import time
+import traceback
+import pandas as pd
+
+from backend_dati import COLONNE_FILE, DatasetPartizionato
+from caricamento_dati import (apri_cartella, carica_accessorio, carica_dati_con_firma, file_cartella,
+                              firma_sorgente, prepara_dati)
+from indice_dati import IndiceMiniere, somme_cumulate
+from rollup import COLONNE_ROLLUP, RollupMiniere, rollup_da_tabella
+
+
+# formato delle date nel file CSV
+FORMATO_DATA = "%d/%m/%Y"
+
+
+class Istantanea:
+
+    # dati: indice in memoria o dataset partizionato; rollup: i suoi aggregati, della stessa versione.
+    # Non viene mai modificata: un aggiornamento crea una nuova istantanea
+    def __init__(self, dati, rollup):
+        self.dati = dati
+        self.rollup = rollup
+
+    # le letture (seleziona, somme, media, versione, ...) vengono chieste ai dati
+    def __getattr__(self, nome):
+        return getattr(self.dati, nome)
+
+
+class DatiInDiretta:
+
+    # sorgente: file CSV, Parquet o Feather oppure cartella partizionata;
+    # backend: 'memoria' (indice in memoria) o 'dataset' (cartella letta da disco a ogni richiesta);
+    # intervallo_secondi: ogni quanto controllare la sorgente (0 = mai)
+    def __init__(self, sorgente, backend="memoria", intervallo_secondi=10):
+        self.sorgente = os.fspath(sorgente)
+        self.backend = backend
+        self.intervallo_secondi = intervallo_secondi
+        self.ultimo_errore = None
+        self.aggiornamenti = 0                                                                     # aggiornamenti letti dalla sorgente dopo l'avvio
+        self.durata_ultimo_aggiornamento = None
+        self._pid = None
+        self._lock_avvio = threading.Lock()
+        self._lock_aggiornamento = threading.Lock()
+        self._ferma = threading.Event()
+
+        # annoto cosa è già stato letto prima di caricare i dati, così le righe accodate durante
+        # il caricamento vengono trovate al primo controllo (quelle già presenti vengono scartate)
+        self._file = None                                                                          # file già letti della cartella partizionata
+        if os.path.isdir(self.sorgente):
+            self._file = file_cartella(self.sorgente)
+        elif self.sorgente.endswith(".csv"):
+            self._colonne, self._posizione = _intestazione_csv(self.sorgente)
+        else:
+            self._firma = firma_sorgente(self.sorgente)
+
+        self._istantanea = self._carica()
+
+    # dati e rollup della versione corrente, da usare per tutte le letture di uno stesso callback
+    def istantanea(self):
+        return self._istantanea
+
+    # dati attuali (l'indice in memoria o il dataset partizionato) e i loro rollup
+    @property
+    def attuali(self):
+        return self._istantanea.dati
+
+    @property
+    def rollup(self):
+        return self._istantanea.rollup
+
+    # le singole letture vengono chieste ai dati attuali, così la dashboard usa questo oggetto
+    # come uno qualsiasi dei due backend (più letture collegate vanno fatte su istantanea())
+    @property
+    def versione(self):
+        return self.attuali.versione
+
+    def seleziona(self, miniera, start_date, end_date, colonne=None):
+        return self.attuali.seleziona(miniera, start_date, end_date, colonne)
+
+    def somme(self, miniera, start_date, end_date, colonne):
+        return self.attuali.somme(miniera, start_date, end_date, colonne)
+
+    def media(self, nome, miniera, start_date, end_date):
+        return self.attuali.media(nome, miniera, start_date, end_date)
+
+    def regressione(self, miniera, start_date, end_date):
+        return self.attuali.regressione(miniera, start_date, end_date)
+
+    def blocchi(self, colonne):
+        return self.attuali.blocchi(colonne)
+
+    def miniere(self):
+        return self.attuali.miniere()
+
+    def date_limite(self):
+        return self.attuali.date_limite()
+
+    def coordinate(self):
+        return self.attuali.coordinate()
+
+    # i dati vengono caricati nel costruttore, quindi sono sempre pronti
+    def pronto(self):
+        return True
+
+    # avvia il thread di controllo nel processo corrente, se non è già attivo
+    # (con gunicorn va avviato in ogni processo figlio: i thread non sopravvivono alla fork)
+    def avvia(self):
+        with self._lock_avvio:
+            if self.intervallo_secondi <= 0 or self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._controlla, name="dati-in-diretta", daemon=True).start()
+
+    # ferma il thread di controllo
+    def ferma(self):
+        self._ferma.set()
+
+    def _controlla(self):
+        while not self._ferma.wait(self.intervallo_secondi):
+            try:
+                inizio = time.perf_counter()
+                if self.aggiorna():
+                    self.aggiornamenti += 1
+                    self.durata_ultimo_aggiornamento = time.perf_counter() - inizio
+                self.ultimo_errore = None
+            except Exception:                                                                      # un errore di lettura non deve fermare il controllo
+                self.ultimo_errore = traceback.format_exc()
+
+    # cerca nuove righe nella sorgente e, se ce ne sono, sostituisce i dati attuali;
+    # restituisce True se i dati sono cambiati
+    def aggiorna(self):
+        with self._lock_aggiornamento:
+            return self._aggiorna()
+
+    def _aggiorna(self):
+        if os.path.isdir(self.sorgente):
+            return self._aggiorna_cartella()
+        if self.sorgente.endswith(".csv"):
+            return self._aggiorna_csv()
+        # un file Parquet o Feather unico non può essere esteso: se cambia lo ricarico per intero
+        firma = firma_sorgente(self.sorgente)
+        if firma == self._firma:
+            return False
+        self._firma = firma
+        self._ricarica()
+        return True
+
+    # legge solo i nuovi file della cartella partizionata
+    def _aggiorna_cartella(self):
+        noti = set(self._file)
+        nuovi = [f for f in file_cartella(self.sorgente) if f not in noti]
+        if not nuovi:
+            return False
+        if self.backend != "dataset":
+            cambiati = self._accoda(prepara_dati(apri_cartella(self.sorgente, nuovi).to_table(columns=COLONNE_FILE).to_pandas()))
+        else:
+            aggiornati, righe = self.attuali.con_nuovi_file(nuovi, COLONNE_ROLLUP)
+            self._istantanea = Istantanea(aggiornati, self.rollup.con_righe(righe))
+            cambiati = True
+        self._file = self._file + nuovi                                                            # segno i file come letti solo dopo averli aggiunti
+        return cambiati
+
+    # legge solo la coda del file CSV, fino all'ultima riga completa
+    def _aggiorna_csv(self):
+        dimensione = os.path.getsize(self.sorgente)
+        if dimensione < self._posizione:                                                           # il file è stato riscritto: lo ricarico per intero
+            self._colonne, self._posizione = _intestazione_csv(self.sorgente)
+            self._ricarica()
+            return True
+        if dimensione == self._posizione:
+            return False
+        with open(self.sorgente, "rb") as f:
+            f.seek(self._posizione)
+            coda = f.read(dimensione - self._posizione)
+        fine = coda.rfind(b"\n") + 1                                                               # l'ultima riga potrebbe essere ancora in scrittura
+        if fine == 0:
+            return False
+        self._posizione += fine
+        righe = pd.read_csv(io.BytesIO(coda[:fine]), header=None, names=self._colonne)
+        righe["Data"] = pd.to_datetime(righe["Data"], format=FORMATO_DATA)
+        return self._accoda(prepara_dati(righe))
+
+    # aggiunge all'indice in memoria le righe nuove (i giorni successivi all'ultimo già presente per ogni miniera):
+    # l'indice dei dati caricati all'avvio resta quello di prima (con il DataFrame mappato dalla cache, condiviso
+    # tra i processi) e viene ricostruito solo il piccolo indice delle righe aggiunte dopo l'avvio
+    def _accoda(self, righe):
+        attuali = self.attuali
+        ultime_date = attuali.ultime_date()
+        righe = righe[righe["Data"] > righe["Miniera"].astype(str).map(ultime_date).fillna(pd.Timestamp.min)]
+        if righe.empty:
+            return False
+        righe = righe.reset_index(drop=True)
+        self._istantanea = Istantanea(attuali.con_righe(righe), self.rollup.con_righe(righe[COLONNE_ROLLUP]))
+        return True
+
+    # carica i dati e i loro rollup. Le somme cumulative dell'indice e i rollup vengono salvati accanto
+    # alla sorgente come file accessori della cache: i processi avviati dopo il primo (anche senza preload_app
+    # di gunicorn) li mappano in memoria, condividendo le stesse pagine, invece di ricalcolarli
+    def _carica(self, versione=0):
+        if self.backend == "dataset":
+            dati = DatasetPartizionato(self.sorgente, versione, file=self._file)
+            firma = firma_sorgente(self.sorgente, dati.file)
+        else:
+            df, firma = carica_dati_con_firma(self.sorgente)
+            dati = IndiceMiniere(df, versione, carica_accessorio(self.sorgente, "indice", firma, lambda: somme_cumulate(df)))
+        calcola_rollup = lambda: RollupMiniere(dati.blocchi(COLONNE_ROLLUP)).tabella()
+        return Istantanea(dati, rollup_da_tabella(carica_accessorio(self.sorgente, "rollup", firma, calcola_rollup)))
+
+    # ricarica l'intero dataset (quando non è possibile leggere solo le righe nuove)
+    def _ricarica(self):
+        self._istantanea = self._carica(self.attuali.versione + 1)
+
+
+# nomi delle colonne (dalla prima riga) e posizione della fine dell'ultima riga completa di un file CSV
+def _intestazione_csv(percorso):
+    with open(percorso, "rb") as f:
+        colonne = f.readline().decode("utf-8").strip().split(",")
+        dimensione = f.seek(0, os.SEEK_END)
+        f.seek(max(0, dimensione - 65536))
+        finale = f.read()
+    return colonne, dimensione - len(finale) + finale.rfind(b"\n") + 1
@@ -1,168 +1,489 @@
-# librerie per la gestione numerica, tabelle e dati
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
-
-
-# questa funzione serve per distribuire casualmente le tonnellate prodotte durante l'anno
-def distribuisci_tonnellate(totale_annuo, giorni):                                                          
-    pesi = np.random.rand(giorni)                                                                                      # genera un peso casuale per ogni giorno
-    pesi_normalizzati = pesi / pesi.sum()                                                                              # normalizza i pesi per ottenere una distribuzione proporzionale
-    valori = (pesi_normalizzati * totale_annuo)                                                                        # fornisce il totale annuo proporzionalmente
-    return np.round(valori, 2)                                                                                         # arrotonda a due decimali per migliorare la leggibilità
-
-
-# creo le date per un anno intero
-start_date = datetime(2024, 1, 1)                                                                                      # impostazione data di inizio anno (1 gennaio 2024)
-end_date = datetime(2024, 12, 31)                                                                                      # impostazione data di fine anno   (31 dicembre 2024)
-date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]                         # genera una lista con tutte le date dal 1 gennaio al 31 dicembre 2024 (anno bisestile, quindi 366 giorni) 
-
-
-# definizione delle miniere simulate con produzione annua e coordinate GPS indicative
-miniere = {
-    "Miniera 1": {                                                                                 # localizzata al nord della Svezia
-        "Tonnellate_annue": 40840,                                                                 # produzione totale annua
-        "Coordinate": (67.9061, 20.9575)                                                           # coordinate GPS indicative  
-    },
-    "Miniera 2": {                                                                                 # localizzata al Sud della Svezia
-        "Tonnellate_annue": 3455,                                                                  # produzione totale annua
-        "Coordinate": (60.2761, 16.1706)                                                           # coordinate GPS indicative
-    },
-    "Miniera 3": {                                                                                 # localizzata al Nord della Finlandia
-        "Tonnellate_annue": 9850,                                                                  # produzione totale annua
-        "Coordinate": (67.7066, 25.9403)                                                           # coordinate GPS indicative
-    }
-}
-
-# creo un dizionario dove per ogni miniera genero una lista di tonnellate giornaliere
-# la quantità annuale viene distribuita su tutti i giorni dell'anno (usando la funzione distribuisci_tonnellate)
-tonnellate_giornaliere_per_miniera = {
-    nome: distribuisci_tonnellate(info["Tonnellate_annue"], len(date_range))
-    for nome, info in miniere.items()
-}
-
-
-# creo una lista vuota per raccogliere tutti i dati simulati giornalieri delle miniere
-data = []
-
-# inizializzo il contatore per tenere traccia dei giorni consecutivi senza incidenti per ciascuna miniera
-contatore_sicurezza = {nome: 0 for nome in miniere.keys()}
-
-# ciclo su ogni miniera e su ogni giorno dell'anno
-for miniera, info in miniere.items():
-    for i, day in enumerate(date_range):
-        tonnellate = tonnellate_giornaliere_per_miniera[miniera][i]                                 # tonnellate prodotte nel giorno corrente
-
-
-        # calcolo della temperatura media giornaliera simulata, basata sul mese dell'anno
-        month = day.month                                                                           # mese corrente
-        if month in [6, 7, 8]:                                                                      # mesi estivi, giugno, luglio ed agosto
-            Temperatura = np.random.uniform(15, 25)                                                 # temperature più alte, tra 15°C e 25°C
-        elif month in [12, 1, 2]:                                                                   # mesi invernali, dicembre, gennaio, febbraio
-            Temperatura = np.random.uniform(-25, 0)                                                 # temperature sotto lo zero, tra -25°C e 0°C
-        else:                                                                                       # marzo-maggio, settembre-novembre (primavera-autunno)
-            Temperatura = np.random.uniform(-10, 15)                                                # temperatura tra -10°C e 15°C
-
-        
-        # calcolo del consumo energetico in kWh, influenzato dalla temperatura
-        if Temperatura < 0:                                                                                         # maggior freddo, maggiore consumo
-            Consumo_energia = round(np.random.uniform(2000000, 4000000) * (1 + abs(Temperatura) / 25), 2)           
-        elif Temperatura > 15:                                                                                      # caldo, consumo medio
-            Consumo_energia = round(np.random.uniform(2000000, 3000000), 2)                
-        else:                                                                                                       # temperature più moderate, consumo leggermente aumentato
-            Consumo_energia = round(np.random.uniform(2000000, 3000000) * (1 +(Temperatura - 5) / 10), 2)           
-
-
-        # aggiungo un fattore correttivo al consumo energetico in base alle tonnellate estratte
-        # ogni 100 tonnellate giornaliere aumentano il consumo del +1%
-        Fattore_tonnellate = 1 + (tonnellate / 100)                                        
-        Consumo_energia = round(Consumo_energia * Fattore_tonnellate, 2)
-
-
-        # Calcolo delle emissioni di CO2: ipotizzo che siano pari al 3% del consumo energetico
-        Emissioni_co2 = round(Consumo_energia * 0.03, 2)                                   
-
-        # assegno una percentuale di rame variabile in base alla miniera
-        if miniera == "Miniera 1":
-            Percentuale_rame = round(np.random.uniform(5, 10), 2)                                              # contenuto di rame più alto
-        elif miniera == "Miniera 2":
-            Percentuale_rame = round(np.random.uniform(3, 6), 2)                                               # contenuto di rame più basso
-        elif miniera == "Miniera 3":
-            Percentuale_rame = round(np.random.uniform(5, 8), 2)                                               # contenuto di rame medio
-        
-
-        #  stima del salario medio annuo (in euro) per lavoratore nelle miniere del Nord Europa
-        salario_medio_euro = 50000
-
-        # numero medio dei dipendenti impiegati per ciascuna miniera
-        dipendenti_per_miniera = {"Miniera 1": 800, "Miniera 2": 450, "Miniera 3": 500}
-
-
-        # calcolo dei costi operativi giornalieri
-        Costo_lavoro = round((salario_medio_euro * dipendenti_per_miniera[miniera]) /366, 2)  # dividendo per 366 perchè il 2024 è bisestile
-        Costo_macchinari = round(np.random.uniform(15000, 30000), 2)                          # costo giornaliero stimato dei macchinari
-        
-
-        # calcolo del costo dell’energia in euro (usando un prezzo medio per kWh)
-        prezzo_energia_kwh = 0.12                                                             # ipotesi di 12 centesimi per kWh
-        Costo_energia = round(Consumo_energia * prezzo_energia_kwh, 2)                        
-
-        # simulazione del rischio di incidenti sul lavoro
-        # più alta è la produzione o più bassa la temperatura, minore è il rischio stimato
-        if tonnellate > 150 or Temperatura < -10:                                             # rischio basso
-            probabilità_incidente = 0.03
-        elif tonnellate > 100:                                                                # rischio medio
-            probabilità_incidente = 0.05
-        else:                                                                                 # rischio alto
-            probabilità_incidente = 0.07
-        
-        # genero l'incidente usando la probabilità calcolata sopra
-        Incidenti = np.random.choice([0, 1], p=[1 - probabilità_incidente, probabilità_incidente])                                  
-
-        # aggiorno il contatore dei giorni consecutivi senza incidenti
-        if Incidenti == 0:
-            contatore_sicurezza[miniera] += 1                                                 # incremento il contatore se non ci sono incidenti
-        else:
-            contatore_sicurezza[miniera] = 0                                                  # resetto il contatore se c'è stato un incidente
-        
-        # salvo i giorni consecutivi senza incidenti per il giorno corrente
-        Giorni_senza_incidenti_consecutivi = contatore_sicurezza[miniera]
-
-        # calcolo le ore senza incidenti (24 ore per ogni giorno)
-        Ore_senza_incidenti = Giorni_senza_incidenti_consecutivi * 24
-        
-
-        # aggiungo i dati del giorno corrente alla lista
-        data.append([
-            day.strftime("%d/%m/%Y"), miniera,
-            tonnellate, info["Coordinate"][0], info["Coordinate"][1],
-            Consumo_energia, Emissioni_co2, Percentuale_rame, Costo_lavoro, Costo_macchinari, Costo_energia,
-            Incidenti, Ore_senza_incidenti, Temperatura, Giorni_senza_incidenti_consecutivi
-        ])
-
-
-# creo il DataFrame con i dati raccolti e assegno nomi alle colonne
-df = pd.DataFrame(data, columns=[
-    "Data", "Miniera", "Tonnellate_giornaliere",
-    "Latitudine", "Longitudine",
-    "Consumo_Energia_kWh", "Emissioni_CO2_kg", "%_Rame",
-    "Costo_Lavoro", "Costo_Macchinari", "Costo_Energia",
-    "Incidenti", "Ore_Senza_Incidenti", "Temperatura_C",
-    "Giorni_senza_incidenti_consecutivi"   
-])
-
-
-
-# salvo il dataframe in un file .csv
-df.to_csv("dati_miniere123.csv", index=False)
-
-# messaggio di conferma
-print("Dati simulati salvati in dati_miniere123.csv")                           
-
-
-
-         
-
-
-
-                                        
+# librerie per la gestione numerica, tabelle e dati
+import argparse
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+import pandas as pd
+
+
+# nomi delle colonne del dataset simulato, nell'ordine in cui vengono salvate
+COLONNE = [
+    "Data", "Miniera", "Tonnellate_giornaliere",
+    "Latitudine", "Longitudine",
+    "Consumo_Energia_kWh", "Emissioni_CO2_kg", "%_Rame",
+    "Costo_Lavoro", "Costo_Macchinari", "Costo_Energia",
+    "Incidenti", "Ore_Senza_Incidenti", "Temperatura_C",
+    "Giorni_senza_incidenti_consecutivi"
+]
+
+
+# definizione delle miniere simulate con produzione annua, coordinate GPS indicative,
+# intervallo della percentuale di rame e numero medio di dipendenti
+miniere = {
+    "Miniera 1": {                                                                                 # localizzata al nord della Svezia
+        "Tonnellate_annue": 40840,                                                                 # produzione totale annua
+        "Coordinate": (67.9061, 20.9575),                                                          # coordinate GPS indicative
+        "Percentuale_rame": (5, 10),                                                               # contenuto di rame più alto
+        "Dipendenti": 800                                                                          # numero medio di dipendenti
+    },
+    "Miniera 2": {                                                                                 # localizzata al Sud della Svezia
+        "Tonnellate_annue": 3455,                                                                  # produzione totale annua
+        "Coordinate": (60.2761, 16.1706),                                                          # coordinate GPS indicative
+        "Percentuale_rame": (3, 6),                                                                # contenuto di rame più basso
+        "Dipendenti": 450                                                                          # numero medio di dipendenti
+    },
+    "Miniera 3": {                                                                                 # localizzata al Nord della Finlandia
+        "Tonnellate_annue": 9850,                                                                  # produzione totale annua
+        "Coordinate": (67.7066, 25.9403),                                                          # coordinate GPS indicative
+        "Percentuale_rame": (5, 8),                                                                # contenuto di rame medio
+        "Dipendenti": 500                                                                          # numero medio di dipendenti
+    }
+}
+
+
+#  stima del salario medio annuo (in euro) per lavoratore nelle miniere del Nord Europa
+SALARIO_MEDIO_EURO = 50000
+
+# ipotesi di 12 centesimi per kWh per il costo dell'energia
+PREZZO_ENERGIA_KWH = 0.12
+
+
+# formato delle date nei file CSV (giorno/mese/anno, come nel dataset originale)
+FORMATO_DATA = "%d/%m/%Y"
+
+# formati di output supportati: il CSV per compatibilità, Parquet e Feather come formati binari a colonne
+FORMATI = ("csv", "parquet", "feather")
+
+
+# numero di miniere simulate in ogni blocco: è fisso e non dipende dal numero di processi,
+# così il risultato è identico byte per byte con 1 o con N processi
+MINIERE_PER_BLOCCO = 64
+
+
+# intervallo delle temperature medie giornaliere per ogni mese (indice 1-12, lo 0 non viene usato)
+TEMPERATURA_MIN = np.full(13, -10.0)                                                               # marzo-maggio, settembre-novembre: tra -10°C e 15°C
+TEMPERATURA_MAX = np.full(13, 15.0)
+TEMPERATURA_MIN[[6, 7, 8]], TEMPERATURA_MAX[[6, 7, 8]] = 15.0, 25.0                                # mesi estivi: tra 15°C e 25°C
+TEMPERATURA_MIN[[12, 1, 2]], TEMPERATURA_MAX[[12, 1, 2]] = -25.0, 0.0                              # mesi invernali: tra -25°C e 0°C
+
+
+# questa funzione crea una flotta sintetica di miniere con parametri casuali ma plausibili,
+# utile per simulare migliaia di miniere con le stesse regole delle tre miniere di esempio
+def crea_flotta(numero_miniere, seed=None):
+    rng = np.random.default_rng(seed)
+    return {
+        f"Miniera {i + 1}": {
+            "Tonnellate_annue": int(tonnellate),
+            "Coordinate": (round(float(lat), 4), round(float(lon), 4)),                            # coordinate sparse tra Svezia, Norvegia e Finlandia
+            "Percentuale_rame": (float(rame_min), round(float(rame_min + ampiezza), 2)),
+            "Dipendenti": int(dipendenti)
+        }
+        for i, (tonnellate, lat, lon, rame_min, ampiezza, dipendenti) in enumerate(zip(
+            rng.integers(3000, 45000, numero_miniere),
+            rng.uniform(58.0, 69.5, numero_miniere),
+            rng.uniform(12.0, 29.0, numero_miniere),
+            np.round(rng.uniform(3, 5, numero_miniere), 2),
+            np.round(rng.uniform(2, 5, numero_miniere), 2),
+            rng.integers(300, 900, numero_miniere)
+        ))
+    }
+
+
+# questa funzione serve per distribuire casualmente le tonnellate prodotte durante l'anno,
+# per tutte le miniere insieme (una riga per miniera, una colonna per giorno)
+def distribuisci_tonnellate(totali_annui, date, rng):
+    pesi = rng.random((len(totali_annui), len(date)))                                              # genera un peso casuale per ogni miniera e ogni giorno
+    valori = np.empty_like(pesi)
+    anni = date.year.to_numpy()
+    for anno in np.unique(anni):                                                                   # la distribuzione avviene separatamente per ogni anno
+        colonne = anni == anno
+        giorni_anno = 366 if pd.Timestamp(year=int(anno), month=1, day=1).is_leap_year else 365
+        if colonne.sum() == giorni_anno:
+            somma = pesi[:, colonne].sum(axis=1, keepdims=True)                                    # anno completo: normalizzo i pesi sul totale annuo esatto
+        else:
+            somma = giorni_anno / 2                                                                # anno parziale: normalizzo sul valore atteso della somma
+        valori[:, colonne] = pesi[:, colonne] / somma * totali_annui[:, None]
+    return np.round(valori, 2)                                                                     # arrotonda a due decimali per migliorare la leggibilità
+
+
+# questa funzione calcola i giorni consecutivi senza incidenti senza cicli Python:
+# per ogni giorno trova l'ultimo incidente precedente e conta i giorni trascorsi
+def contatore_giorni_senza_incidenti(incidenti, contatori_iniziali=None):
+    indici = np.arange(incidenti.shape[1])
+    ultimo_incidente = np.maximum.accumulate(np.where(incidenti.astype(bool), indici, -1), axis=1)
+    contatore = indici - ultimo_incidente                                                          # 0 nel giorno dell'incidente, poi 1, 2, 3...
+    if contatori_iniziali is not None:                                                             # se la serie riprende da uno stato precedente
+        contatore = np.where(ultimo_incidente < 0, contatore + np.asarray(contatori_iniziali)[:, None], contatore)
+    return contatore
+
+
+# questa funzione simula i dati giornalieri di un gruppo di miniere su un intervallo di date,
+# generando ogni colonna in un'unica operazione vettoriale invece che riga per riga
+def simula_miniere(miniere, date, rng, contatori_iniziali=None):
+    nomi = list(miniere.keys())
+    numero_miniere, numero_giorni = len(nomi), len(date)
+    forma = (numero_miniere, numero_giorni)
+
+    tonnellate = distribuisci_tonnellate(
+        np.array([info["Tonnellate_annue"] for info in miniere.values()], dtype=float), date, rng
+    )
+
+    # calcolo della temperatura media giornaliera simulata, basata sul mese dell'anno
+    mesi = date.month.to_numpy()
+    temp_min, temp_max = TEMPERATURA_MIN[mesi], TEMPERATURA_MAX[mesi]
+    temperatura = temp_min + (temp_max - temp_min) * rng.random(forma)
+
+    # calcolo del consumo energetico in kWh, influenzato dalla temperatura
+    base_max = np.where(temperatura < 0, 4000000, 3000000)                                         # con il freddo il consumo base arriva fino a 4 milioni di kWh
+    consumo_base = 2000000 + (base_max - 2000000) * rng.random(forma)
+    fattore_temperatura = np.where(
+        temperatura < 0, 1 + np.abs(temperatura) / 25,                                             # maggior freddo, maggiore consumo
+        np.where(temperatura > 15, 1.0,                                                            # caldo, consumo medio
+                 1 + (temperatura - 5) / 10)                                                       # temperature più moderate, consumo leggermente aumentato
+    )
+    consumo_energia = np.round(consumo_base * fattore_temperatura, 2)
+
+    # ogni 100 tonnellate giornaliere aumentano il consumo del +1%
+    consumo_energia = np.round(consumo_energia * (1 + tonnellate / 100), 2)
+
+    # calcolo delle emissioni di CO2: ipotizzo che siano pari al 3% del consumo energetico
+    emissioni_co2 = np.round(consumo_energia * 0.03, 2)
+
+    # assegno una percentuale di rame variabile in base alla miniera
+    rame = np.array([info["Percentuale_rame"] for info in miniere.values()], dtype=float)
+    percentuale_rame = np.round(rame[:, :1] + (rame[:, 1:] - rame[:, :1]) * rng.random(forma), 2)
+
+    # calcolo dei costi operativi giornalieri (il salario annuo viene diviso per i giorni dell'anno)
+    dipendenti = np.array([info["Dipendenti"] for info in miniere.values()], dtype=float)
+    giorni_anno = np.where(date.is_leap_year, 366, 365)
+    costo_lavoro = np.round(SALARIO_MEDIO_EURO * dipendenti[:, None] / giorni_anno, 2)
+    costo_macchinari = np.round(15000 + 15000 * rng.random(forma), 2)                              # costo giornaliero stimato dei macchinari
+    costo_energia = np.round(consumo_energia * PREZZO_ENERGIA_KWH, 2)
+
+    # simulazione del rischio di incidenti sul lavoro
+    # più alta è la produzione o più bassa la temperatura, minore è il rischio stimato
+    probabilita_incidente = np.where(
+        (tonnellate > 150) | (temperatura < -10), 0.03,                                            # rischio basso
+        np.where(tonnellate > 100, 0.05, 0.07)                                                     # rischio medio / alto
+    )
+    incidenti = (rng.random(forma) < probabilita_incidente).astype(np.int64)                       # estrazione di Bernoulli per ogni giorno
+
+    giorni_senza_incidenti = contatore_giorni_senza_incidenti(incidenti, contatori_iniziali)
+
+    coordinate = np.array([info["Coordinate"] for info in miniere.values()], dtype=float)
+    return pd.DataFrame({
+        "Data": np.tile(date.values, numero_miniere),
+        "Miniera": np.repeat(nomi, numero_giorni),
+        "Tonnellate_giornaliere": tonnellate.ravel(),
+        "Latitudine": np.repeat(coordinate[:, 0], numero_giorni),
+        "Longitudine": np.repeat(coordinate[:, 1], numero_giorni),
+        "Consumo_Energia_kWh": consumo_energia.ravel(),
+        "Emissioni_CO2_kg": emissioni_co2.ravel(),
+        "%_Rame": percentuale_rame.ravel(),
+        "Costo_Lavoro": np.broadcast_to(costo_lavoro, forma).ravel(),
+        "Costo_Macchinari": costo_macchinari.ravel(),
+        "Costo_Energia": costo_energia.ravel(),
+        "Incidenti": incidenti.ravel(),
+        "Ore_Senza_Incidenti": (giorni_senza_incidenti * 24).ravel(),                              # 24 ore per ogni giorno senza incidenti
+        "Temperatura_C": temperatura.ravel(),
+        "Giorni_senza_incidenti_consecutivi": giorni_senza_incidenti.ravel()
+    }, columns=COLONNE)
+
+
+# questa funzione divide il dizionario delle miniere in blocchi di dimensione fissa
+def dividi_in_blocchi(miniere, dimensione=MINIERE_PER_BLOCCO):
+    elementi = iter(miniere.items())
+    while blocco := dict(islice(elementi, dimensione)):
+        yield blocco
+
+
+# questa funzione divide l'intervallo di date per anno solare, così ogni parte simulata copre al massimo un anno
+# e la memoria usata non cresce con il numero di anni (il contatore degli incidenti prosegue da un anno all'altro)
+def dividi_per_anno(date):
+    anni = date.year.to_numpy()
+    return [date[anni == anno] for anno in np.unique(anni)]
+
+
+# simula un blocco di miniere in un anno con il proprio generatore casuale indipendente (eseguita nei processi figli);
+# elabora: funzione (parte, numero del blocco, *argomenti) eseguita sulla parte nello stesso processo,
+# ad esempio per scriverla o codificarla senza rimandarla al processo principale.
+# Restituisce anche i giorni senza incidenti dell'ultimo giorno, da cui riparte l'anno successivo dello stesso blocco
+def _simula_parte(blocco, date, seme, contatori, numero, elabora, argomenti):
+    parte = simula_miniere(blocco, date, np.random.default_rng(seme), contatori)
+    finali = parte["Giorni_senza_incidenti_consecutivi"].to_numpy().reshape(len(blocco), -1)[:, -1]
+    return (parte if elabora is None else elabora(parte, numero, *argomenti)), finali
+
+
+# questa funzione genera il dataset una parte alla volta (un blocco di miniere per un anno), in ordine di anno e di miniera:
+# ogni parte riceve un seme figlio derivato dal seme principale (SeedSequence.spawn) per blocco e per anno,
+# così il risultato non dipende dal numero di processi, e al massimo 2 parti per processo sono in memoria contemporaneamente.
+# Con elabora restituisce, invece dei DataFrame, il risultato della funzione eseguita su ogni parte nel processo figlio
+def genera_blocchi(miniere, date, seed=None, processi=1, contatori_iniziali=None, elabora=None, argomenti=()):
+    blocchi = list(dividi_in_blocchi(miniere))
+    anni = dividi_per_anno(date)
+    semi = [seme.spawn(len(anni)) for seme in np.random.SeedSequence(seed).spawn(len(blocchi))]
+    contatori = [None if contatori_iniziali is None else np.array([contatori_iniziali.get(nome, 0) for nome in blocco])
+                 for blocco in blocchi]
+    parti = [(anno, numero) for anno in range(len(anni)) for numero in range(len(blocchi))]
+    if processi <= 1:                                                                              # esecuzione sequenziale, senza pool di processi
+        for anno, numero in parti:
+            parte, contatori[numero] = _simula_parte(blocchi[numero], anni[anno], semi[numero][anno], contatori[numero],
+                                                     numero, elabora, argomenti)
+            yield parte
+        return
+
+    with ProcessPoolExecutor(max_workers=processi) as pool:
+        in_corso, ultime = deque(), {}                                                             # ultime: parte ancora in corso dell'anno precedente di ogni blocco
+        for anno, numero in parti:
+            if numero in ultime:                                                                   # serve il suo contatore finale: aspetto che termini
+                contatori[numero] = ultime[numero].result()[1]
+            ultime[numero] = pool.submit(_simula_parte, blocchi[numero], anni[anno], semi[numero][anno], contatori[numero],
+                                         numero, elabora, argomenti)
+            in_corso.append((numero, ultime[numero]))
+            if len(in_corso) >= 2 * processi:
+                yield _completa(in_corso, ultime, contatori)
+        while in_corso:
+            yield _completa(in_corso, ultime, contatori)
+
+
+# restituisce la prima parte in corso, ricordando il suo contatore finale
+# (senza tenere in memoria la parte, che è già stata restituita)
+def _completa(in_corso, ultime, contatori):
+    numero, futuro = in_corso.popleft()
+    parte, contatori[numero] = futuro.result()
+    if ultime.get(numero) is futuro:
+        del ultime[numero]
+    return parte
+
+
+# genera l'intero dataset in memoria unendo i blocchi
+def genera_dataset(miniere, date, seed=None, processi=1, contatori_iniziali=None):
+    return pd.concat(list(genera_blocchi(miniere, date, seed, processi, contatori_iniziali)), ignore_index=True)
+
+
+# schema tipizzato per i formati binari: la miniera come categoria (dizionario),
+# gli interi ridotti dove possibile e i valori monetari in doppia precisione per non perdere i centesimi
+# (il file Feather unico accetta un solo dizionario per colonna, quindi lì la miniera resta una stringa)
+def schema_arrow(miniera_categoria=True):
+    import pyarrow as pa
+    return pa.schema([
+        ("Data", pa.timestamp("s")),
+        ("Miniera", pa.dictionary(pa.int32(), pa.string()) if miniera_categoria else pa.string()),
+        ("Tonnellate_giornaliere", pa.float64()),
+        ("Latitudine", pa.float64()),
+        ("Longitudine", pa.float64()),
+        ("Consumo_Energia_kWh", pa.float64()),
+        ("Emissioni_CO2_kg", pa.float64()),
+        ("%_Rame", pa.float64()),
+        ("Costo_Lavoro", pa.float64()),
+        ("Costo_Macchinari", pa.float64()),
+        ("Costo_Energia", pa.float64()),
+        ("Incidenti", pa.int8()),
+        ("Ore_Senza_Incidenti", pa.int32()),
+        ("Temperatura_C", pa.float64()),
+        ("Giorni_senza_incidenti_consecutivi", pa.int32())
+    ])
+
+
+# scrive un DataFrame in un singolo file nel formato richiesto
+def _scrivi_file(df, percorso, formato):
+    if formato == "csv":
+        df.to_csv(percorso, index=False, date_format=FORMATO_DATA)
+        return
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    tabella = pa.Table.from_pandas(df, schema=schema_arrow(), preserve_index=False)
+    if formato == "parquet":
+        pq.write_table(tabella, percorso)
+    else:
+        feather.write_feather(tabella, percorso, compression="uncompressed")                       # non compresso, così il file può essere mappato in memoria
+
+
+# divide un blocco per mese e scrive un file per ogni mese nella cartella mese=AAAA-MM/blocco=NNNNN:
+# la chiave del blocco permette a chi legge (backend_dati.py) di aprire solo i file del blocco della miniera cercata
+# (il nome del file contiene il primo giorno, così le aggiunte successive non sovrascrivono nulla)
+def _scrivi_partizioni(blocco, numero_blocco, cartella, formato):
+    mesi = blocco["Data"].to_numpy().astype("datetime64[M]")
+    for mese in np.unique(mesi):
+        parte = blocco[mesi == mese]
+        cartella_blocco = os.path.join(cartella, f"mese={mese}", f"blocco={numero_blocco:05d}")
+        os.makedirs(cartella_blocco, exist_ok=True)
+        nome = f"parte-{parte['Data'].iloc[0]:%Y%m%d}.{formato}"
+        # scrivo prima un file nascosto e poi lo rinomino: chi legge la cartella (anche mentre la dashboard
+        # è in funzione) vede il file solo quando è completo
+        temporaneo = os.path.join(cartella_blocco, f".{nome}.tmp")
+        _scrivi_file(parte, temporaneo, formato)
+        os.replace(temporaneo, os.path.join(cartella_blocco, nome))
+
+
+# codifica una parte in CSV, senza intestazione (eseguita nei processi figli)
+def _codifica_csv(parte, numero):
+    return parte.to_csv(index=False, header=False, date_format=FORMATO_DATA).encode()
+
+
+# converte una parte in una tabella Arrow con lo schema del file (eseguita nei processi figli)
+def _tabella_arrow(parte, numero, schema):
+    import pyarrow as pa
+    return pa.Table.from_pandas(parte, schema=schema, preserve_index=False)
+
+
+# questa funzione genera e salva il dataset man mano che le parti vengono prodotte, senza mai costruirlo in memoria.
+# La scrittura avviene il più possibile nei processi figli, così scala con il numero di processi:
+# - partiziona=True: un file per ogni mese e blocco di miniere (mese=AAAA-MM/blocco=NNNNN), scritto dai processi figli
+# - CSV unico: i processi figli codificano le righe, il processo principale accoda i byte nell'ordine delle parti
+# - Parquet/Feather unico: i processi figli convertono le parti in tabelle Arrow, il processo principale le aggiunge
+#   come gruppi di righe (la codifica Parquet di un file unico resta nel processo principale: per scalare usare --partiziona)
+# con accoda=True i nuovi dati vengono aggiunti a un dataset esistente invece di sostituirlo
+def salva_dataset(miniere, date, destinazione, formato="csv", partiziona=False, accoda=False, seed=None, processi=1,
+                  contatori_iniziali=None):
+    if formato not in FORMATI:
+        raise ValueError(f"Formato non supportato: {formato} (formati disponibili: {', '.join(FORMATI)})")
+    if accoda and formato != "csv" and not partiziona:
+        raise ValueError(f"Un file {formato} unico non può essere esteso: usare il formato partizionato (--partiziona)")
+
+    def genera(elabora, *argomenti):
+        return genera_blocchi(miniere, date, seed, processi, contatori_iniziali, elabora, argomenti)
+
+    if partiziona:
+        for _ in genera(_scrivi_partizioni, destinazione, formato):
+            pass
+    elif formato == "csv":
+        with open(destinazione, "ab" if accoda else "wb") as f:
+            if not accoda:
+                f.write(pd.DataFrame(columns=COLONNE).to_csv(index=False).encode())                # solo l'intestazione
+            for righe in genera(_codifica_csv):
+                f.write(righe)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = schema_arrow(miniera_categoria=formato == "parquet")
+        writer = pq.ParquetWriter(destinazione, schema) if formato == "parquet" else pa.ipc.new_file(destinazione, schema)
+        with writer:
+            for tabella in genera(_tabella_arrow, schema):
+                writer.write_table(tabella)
+
+
+# colonne necessarie per riprendere la simulazione da un dataset esistente
+COLONNE_STATO = ["Data", "Miniera", "Giorni_senza_incidenti_consecutivi"]
+
+
+# legge un file CSV dalla fine verso l'inizio, un pezzo di righe complete alla volta, con le sole colonne dello stato
+def _pezzi_dalla_fine(percorso, dimensione=1 << 22):
+    with open(percorso, "rb") as f:
+        colonne = f.readline().decode("utf-8").strip().split(",")
+        inizio_dati = f.tell()
+        fine = f.seek(0, os.SEEK_END)
+        resto = b""                                                                                # parte finale della riga tagliata dal pezzo precedente
+        while fine > inizio_dati:
+            inizio = max(inizio_dati, fine - dimensione)
+            f.seek(inizio)
+            pezzo = f.read(fine - inizio) + resto
+            fine = inizio
+            taglio = pezzo.find(b"\n") + 1 if inizio > inizio_dati else 0                          # la prima riga del pezzo può essere incompleta
+            if inizio > inizio_dati and taglio == 0:
+                resto = pezzo
+                continue
+            resto, pezzo = pezzo[:taglio], pezzo[taglio:]
+            if pezzo.strip():
+                yield pd.read_csv(io.BytesIO(pezzo), header=None, names=colonne, usecols=COLONNE_STATO)
+
+
+# legge solo le colonne dello stato da un file, a pezzi, tenendo l'ultima riga di ogni miniera.
+# Un CSV viene letto dalla fine e, se sono indicate le miniere, solo fino a trovare l'ultima riga di ognuna:
+# le righe di una miniera sono in ordine di data e le riprese vengono accodate in fondo,
+# quindi non serve leggere tutto lo storico
+def _ultime_righe(percorso, formato, miniere=None):
+    if formato == "csv":
+        pezzi = _pezzi_dalla_fine(percorso)
+    elif formato == "parquet":
+        pezzi = [pd.read_parquet(percorso, columns=COLONNE_STATO)]
+    else:
+        pezzi = [pd.read_feather(percorso, columns=COLONNE_STATO)]
+    ultime, mancanti = [], None if miniere is None else set(miniere)
+    for pezzo in pezzi:
+        if formato == "csv":
+            pezzo["Data"] = pd.to_datetime(pezzo["Data"], format=FORMATO_DATA)
+        pezzo["Miniera"] = pezzo["Miniera"].astype(str)
+        ultime.append(pezzo.sort_values("Data", kind="stable").drop_duplicates("Miniera", keep="last"))
+        if mancanti is not None:
+            mancanti.difference_update(pezzo["Miniera"])
+            if not mancanti:
+                break
+    if not ultime:
+        raise ValueError(f"nessuna riga in {percorso}")
+    return pd.concat(ultime)
+
+
+# questa funzione legge lo stato finale di ogni miniera da un dataset esistente:
+# l'ultima data simulata e i giorni consecutivi senza incidenti a quella data.
+# Nel formato partizionato basta leggere la cartella dell'ultimo mese; miniere: nomi delle miniere simulate
+def leggi_stato_finale(destinazione, formato="csv", partiziona=False, miniere=None):
+    if partiziona:
+        mesi = [d for d in os.listdir(destinazione) if d.startswith("mese=")]
+        if not mesi:
+            raise ValueError(f"nessuna cartella mese=AAAA-MM in {destinazione}")
+        ultimo_mese = os.path.join(destinazione, max(mesi))
+        file_mese = sorted(os.path.join(radice, nome) for radice, _, nomi in os.walk(ultimo_mese)
+                           for nome in nomi if nome.endswith(f".{formato}") and not nome.startswith("."))
+        if not file_mese:
+            raise ValueError(f"nessun file {formato} in {ultimo_mese}")
+        ultime = pd.concat([_ultime_righe(percorso, formato) for percorso in file_mese])
+    else:
+        ultime = _ultime_righe(destinazione, formato, miniere)
+    ultime = ultime.sort_values("Data", kind="stable").drop_duplicates("Miniera", keep="last")
+    contatori = dict(zip(ultime["Miniera"], ultime["Giorni_senza_incidenti_consecutivi"].astype(int)))
+    return ultime["Data"].max(), contatori
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera i dati simulati delle miniere di rame")
+    parser.add_argument("--seed", type=int, default=None, help="seed per rendere riproducibile la simulazione")
+    parser.add_argument("--flotta", type=int, default=0, help="numero di miniere sintetiche (0 = le tre miniere di esempio)")
+    parser.add_argument("--inizio", default="2024-01-01", help="data di inizio (AAAA-MM-GG)")
+    parser.add_argument("--fine", default=None, help="data di fine (AAAA-MM-GG, di default il 31/12/2024, oppure oggi con --continua)")
+    parser.add_argument("--processi", type=int, default=1, help=f"numero di processi in parallelo (0 = tutti i core, {os.cpu_count()})")
+    parser.add_argument("--output", default="dati_miniere123.csv", help="file (o cartella, con --partiziona) di destinazione")
+    parser.add_argument("--formato", choices=FORMATI, default="csv", help="formato di output")
+    parser.add_argument("--partiziona", action="store_true", help="scrive una cartella partizionata per mese e blocco di miniere invece di un unico file")
+    parser.add_argument("--continua", action="store_true",
+                        help="riprende dal dataset esistente: genera solo i giorni successivi all'ultimo e li accoda")
+    args = parser.parse_args()
+    if args.continua and args.formato != "csv" and not args.partiziona:
+        parser.error(f"un file {args.formato} unico non può essere esteso: usare --partiziona oppure il formato csv")
+    if args.continua and args.flotta and args.seed is None:
+        # senza seed la flotta verrebbe ricreata con coordinate e produzioni diverse da quelle già salvate
+        parser.error("--continua con --flotta richiede lo stesso --seed usato per generare il dataset")
+    if args.continua and not (os.path.isdir(args.output) if args.partiziona else os.path.isfile(args.output)):
+        parser.error(f"--continua: {args.output} non esiste (generare prima il dataset senza --continua)")
+
+    elenco_miniere = crea_flotta(args.flotta, args.seed) if args.flotta else miniere                # la flotta sintetica dipende solo da --flotta e --seed
+    seed, contatori = args.seed, None
+
+    if args.continua:
+        # riprendo dal giorno successivo all'ultimo presente, con il contatore di sicurezza di ogni miniera
+        try:
+            ultima_data, contatori = leggi_stato_finale(args.output, args.formato, args.partiziona, elenco_miniere)
+        except ValueError as errore:
+            parser.error(f"--continua: {errore}")
+        inizio = ultima_data + pd.Timedelta(days=1)
+        fine = pd.Timestamp(args.fine) if args.fine else pd.Timestamp.today().normalize()
+        if args.seed is not None:
+            seed = [args.seed, inizio.toordinal()]                                                  # seme diverso per ogni ripresa, ma sempre riproducibile
+    else:
+        inizio, fine = pd.Timestamp(args.inizio), pd.Timestamp(args.fine or "2024-12-31")
+
+    # creo le date dall'inizio alla fine (di default l'intero 2024, anno bisestile, quindi 366 giorni)
+    date_range = pd.date_range(inizio, fine, freq="D")
+    if date_range.empty:
+        print("Nessun nuovo giorno da simulare")
+    else:
+        # genero e salvo i dati un blocco alla volta, così la memoria resta costante
+        salva_dataset(elenco_miniere, date_range, args.output, args.formato, args.partiziona, args.continua,
+                      seed, args.processi or os.cpu_count(), contatori)
+
+        # messaggio di conferma
+        print(f"Dati simulati salvati in {args.output} ({date_range[0]:%d/%m/%Y} - {date_range[-1]:%d/%m/%Y})")
@@ -0,0 +1,68 @@
+# configurazione di gunicorn per servire la dashboard in produzione:
+#     gunicorn -c gunicorn.conf.py dashboardpython:server
+# i valori possono essere modificati con le variabili d'ambiente indicate
+import glob
+import multiprocessing
+import os
+import tempfile
+
+
+# indirizzo e porta su cui il server resta in ascolto
+bind = os.environ.get("DASHBOARD_BIND", "0.0.0.0:8050")
+
+# numero di processi: di default due per core più uno
+workers = int(os.environ.get("DASHBOARD_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# ogni processo usa alcuni thread, così i callback della stessa pagina possono essere eseguiti in parallelo
+worker_class = "gthread"
+threads = int(os.environ.get("DASHBOARD_THREADS", 4))
+
+# carico l'applicazione (e quindi il dataset e l'indice) una sola volta nel processo principale, prima della fork:
+# i processi figli condividono le stesse pagine di memoria invece di caricare ognuno la propria copia.
+# Le colonne del dataset arrivano dalla cache Feather mappata in memoria, e le somme cumulative dell'indice
+# e i rollup dai file accessori salvati accanto alla cache (vedi carica_accessorio in caricamento_dati.py),
+# quindi restano condivise anche quando un processo viene riavviato. Le righe aggiunte in seguito alla sorgente
+# vengono lette da ogni processo per conto proprio e indicizzate a parte, così il DataFrame iniziale resta quello mappato
+# e in memoria privata finiscono solo le righe nuove (vedi dati_in_diretta.py e IndiceConAggiunte).
+# Con l'avvio rapido (DASHBOARD_AVVIO_RAPIDO=1) ogni processo carica invece i dati in background dopo la fork,
+# così risponde subito (/pronto indica quando i dati sono pronti). Anche in questo caso le somme cumulative e i rollup
+# non restano una copia privata di ogni processo: se i file accessori mancano vengono calcolati e salvati (al primo
+# avvio può farlo più di un processo, il salvataggio è atomico), poi ogni processo mappa gli stessi file
+# e le pagine restano condivise dal sistema operativo
+preload_app = os.environ.get("DASHBOARD_AVVIO_RAPIDO") != "1"
+
+# tempo massimo per una richiesta e riavvio periodico dei processi per limitare la crescita della memoria
+timeout = int(os.environ.get("DASHBOARD_TIMEOUT", 60))
+max_requests = int(os.environ.get("DASHBOARD_MAX_RICHIESTE", 5000))
+max_requests_jitter = 500
+
+# log delle richieste sullo standard output
+accesslog = "-"
+
+
+# metriche di tutti i processi: ogni processo salva le proprie in un file di questa cartella e la pagina /metrics
+# le unisce, così Prometheus vede gli stessi totali qualunque sia il processo che risponde (vedi metriche.py).
+# Di default una cartella temporanea nuova a ogni avvio
+if not os.environ.get("DASHBOARD_METRICHE_CARTELLA"):
+    os.environ["DASHBOARD_METRICHE_CARTELLA"] = tempfile.mkdtemp(prefix="metriche_dashboard_")
+
+
+# all'avvio tolgo i file lasciati da un'esecuzione precedente nella stessa cartella
+def on_starting(server):
+    cartella = os.environ["DASHBOARD_METRICHE_CARTELLA"]
+    os.makedirs(cartella, exist_ok=True)
+    for percorso in glob.glob(os.path.join(cartella, "metriche-*.json")):
+        os.remove(percorso)
+
+
+# prima di terminare un processo salva le sue ultime metriche (durante il funzionamento le salva una volta al secondo)
+def worker_exit(server, worker):
+    from metriche import metriche
+    metriche.salva()
+
+
+# quando un processo termina i suoi valori correnti non valgono più (i suoi totali invece restano)
+def child_exit(server, worker):
+    from metriche import processo_terminato
+    processo_terminato(os.environ["DASHBOARD_METRICHE_CARTELLA"], worker.pid)
+
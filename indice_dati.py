@@ -0,0 +1,221 @@
+# indice del dataset delle miniere: le righe sono ordinate per miniera e per data,
+# così la selezione di una miniera in un intervallo di date diventa una ricerca binaria
+# e una fetta contigua del DataFrame, senza maschere booleane sull'intero dataset.
+# L'indice contiene anche le somme cumulative per miniera, con cui totali, medie
+# e retta di regressione su qualsiasi intervallo si calcolano con due sole letture.
+# Le righe accodate mentre la dashboard è in funzione finiscono in un piccolo indice a parte
+# (IndiceConAggiunte), così l'indice iniziale, con il DataFrame mappato dalla cache, non viene mai ricostruito
+import numpy as np
+import pandas as pd
+
+
+# colonne di cui vengono salvate le somme cumulative
+COLONNE_CUMULATE = [
+    "Costo_Lavoro", "Costo_Macchinari", "Costo_Energia",
+    "Incidenti", "Giorni_senza_incidenti_consecutivi"
+]
+
+
+class IndiceMiniere:
+
+    # versione: numero che identifica il contenuto del dataset, usato per invalidare le cache;
+    # cumulate: somme cumulative già calcolate per queste righe (ad esempio mappate da un file accessorio della cache)
+    def __init__(self, df, versione=0, cumulate=None):
+        self.versione = versione
+        codici = df["Miniera"].cat.codes.to_numpy()
+        date = df["Data"].to_numpy()
+        if not _ordinato(codici, date):                                                            # la cache è già ordinata: in quel caso non serve riordinare
+            df = df.sort_values(["Miniera", "Data"], kind="stable").reset_index(drop=True)
+            codici = df["Miniera"].cat.codes.to_numpy()
+            date = df["Data"].to_numpy()
+            cumulate = None                                                                        # calcolate per un altro ordine delle righe
+
+        self.df = df
+        self.date = date
+
+        # per ogni miniera salvo la posizione della prima riga e quella successiva all'ultima
+        categorie = df["Miniera"].cat.categories
+        inizi = np.searchsorted(codici, np.arange(len(categorie)), side="left")
+        fini = np.searchsorted(codici, np.arange(len(categorie)), side="right")
+        self.confini = {nome: (int(i), int(f)) for nome, i, f in zip(categorie, inizi, fini) if f > i}
+        self.inizi = np.array(sorted(i for i, _ in self.confini.values()), dtype=np.int64)         # posizione della prima riga di ogni miniera
+
+        if cumulate is None or len(cumulate) != len(df):
+            cumulate = somme_cumulate(df)
+        self.cumulate = {nome: cumulate[nome].to_numpy() for nome in cumulate.columns}
+
+    # restituisce le posizioni [inizio, fine) delle righe della miniera comprese tra le due date (incluse)
+    def intervallo(self, miniera, start_date, end_date):
+        inizio, fine = self.confini.get(miniera, (0, 0))
+        date_miniera = self.date[inizio:fine]
+        primo = inizio + np.searchsorted(date_miniera, self._data(start_date), side="left")
+        ultimo = inizio + np.searchsorted(date_miniera, self._data(end_date), side="right")
+        return int(primo), int(max(primo, ultimo))
+
+    # converte una data del selettore (stringa o Timestamp) nella stessa unità della colonna "Data"
+    def _data(self, valore):
+        return pd.Timestamp(valore).to_datetime64().astype(self.date.dtype)
+
+    # restituisce la fetta del DataFrame per la miniera e l'intervallo di date selezionati
+    # (una vista sulle righe contigue, da non modificare), eventualmente solo con alcune colonne
+    def seleziona(self, miniera, start_date, end_date, colonne=None):
+        primo, ultimo = self.intervallo(miniera, start_date, end_date)
+        righe = self.df.iloc[primo:ultimo]
+        return righe if colonne is None else righe[colonne]
+
+    # somma di una colonna sulle righe [primo, ultimo) della stessa miniera, in tempo costante
+    def somma_righe(self, nome, primo, ultimo):
+        if ultimo <= primo:
+            return 0.0
+        cumulata = self.cumulate[nome]
+        totale = cumulata[ultimo - 1]
+        if primo > self.inizi[np.searchsorted(self.inizi, primo, side="right") - 1]:               # tolgo la parte della miniera che precede l'intervallo
+            totale -= cumulata[primo - 1]
+        return float(totale)
+
+    # somme delle colonne indicate per la miniera e l'intervallo di date selezionati
+    def somme(self, miniera, start_date, end_date, colonne):
+        primo, ultimo = self.intervallo(miniera, start_date, end_date)
+        return [self.somma_righe(nome, primo, ultimo) for nome in colonne]
+
+    # media di una colonna per la miniera e l'intervallo di date selezionati (NaN se l'intervallo è vuoto, come DataFrame.mean)
+    def media(self, nome, miniera, start_date, end_date):
+        primo, ultimo = self.intervallo(miniera, start_date, end_date)
+        return self.somma_righe(nome, primo, ultimo) / (ultimo - primo) if ultimo > primo else float("nan")
+
+    # retta dei minimi quadrati del consumo energetico in funzione della temperatura,
+    # calcolata dalle somme cumulative senza rileggere i dati
+    def regressione(self, miniera, start_date, end_date):
+        primo, ultimo = self.intervallo(miniera, start_date, end_date)
+        somme = (self.somma_righe(nome, primo, ultimo) for nome in ("x", "y", "xy", "x2", "y2"))
+        return retta_minimi_quadrati(ultimo - primo, *somme)
+
+    # indice con la versione successiva che comprende anche le righe indicate (giorni successivi
+    # all'ultimo di ogni miniera): questo indice resta com'è e solo le nuove righe vengono indicizzate
+    def con_righe(self, righe):
+        return IndiceConAggiunte(self, IndiceMiniere(righe), self.versione + 1)
+
+    # righe del dataset con le colonne indicate, in blocchi (in memoria c'è un solo blocco)
+    def blocchi(self, colonne):
+        yield self.df[colonne]
+
+    # ultima data presente per ogni miniera
+    def ultime_date(self):
+        return pd.Series({nome: self.date[fine - 1] for nome, (_, fine) in self.confini.items()}, dtype="datetime64[ns]")
+
+    # nomi delle miniere presenti nel dataset, in ordine
+    def miniere(self):
+        return list(self.confini.keys())
+
+    # prima e ultima data del dataset
+    def date_limite(self):
+        return pd.Timestamp(self.date.min()), pd.Timestamp(self.date.max())
+
+    # coordinate di ogni miniera (la prima riga di ogni miniera contiene latitudine e longitudine)
+    def coordinate(self):
+        prime_righe = [inizio for inizio, _ in self.confini.values()]
+        return self.df[["Miniera", "Latitudine", "Longitudine"]].iloc[prime_righe].astype({"Miniera": str})
+
+
+class IndiceConAggiunte:
+
+    # base: l'indice del dataset caricato all'avvio; aggiunte: l'indice delle sole righe accodate dopo
+    # (per ogni miniera, giorni successivi all'ultimo della base). Le letture uniscono le due parti:
+    # le somme della base e quelle delle aggiunte si sommano, le righe si concatenano
+    def __init__(self, base, aggiunte, versione):
+        self.base = base
+        self.aggiunte = aggiunte
+        self.versione = versione
+
+    # a ogni nuovo aggiornamento viene ricostruito solo l'indice delle aggiunte
+    def con_righe(self, righe):
+        return IndiceConAggiunte(self.base, IndiceMiniere(concatena([self.aggiunte.df, righe])), self.versione + 1)
+
+    def seleziona(self, miniera, start_date, end_date, colonne=None):
+        iniziali = self.base.seleziona(miniera, start_date, end_date, colonne)
+        nuove = self.aggiunte.seleziona(miniera, start_date, end_date, colonne)
+        if len(nuove) == 0:
+            return iniziali                                                                        # la selezione è tutta nella base: resta una vista senza copie
+        if len(iniziali) == 0:
+            return nuove
+        return concatena([iniziali, nuove])
+
+    # numero di righe e somme delle colonne indicate, sommando le due parti
+    def _somme(self, nomi, miniera, start_date, end_date):
+        righe, totali = 0, [0.0] * len(nomi)
+        for indice in (self.base, self.aggiunte):
+            primo, ultimo = indice.intervallo(miniera, start_date, end_date)
+            righe += ultimo - primo
+            totali = [totale + indice.somma_righe(nome, primo, ultimo) for totale, nome in zip(totali, nomi)]
+        return righe, totali
+
+    def somme(self, miniera, start_date, end_date, colonne):
+        return self._somme(colonne, miniera, start_date, end_date)[1]
+
+    def media(self, nome, miniera, start_date, end_date):
+        righe, (totale,) = self._somme([nome], miniera, start_date, end_date)
+        return totale / righe if righe else float("nan")
+
+    def regressione(self, miniera, start_date, end_date):
+        righe, somme = self._somme(["x", "y", "xy", "x2", "y2"], miniera, start_date, end_date)
+        return retta_minimi_quadrati(righe, *somme)
+
+    def blocchi(self, colonne):
+        yield from self.base.blocchi(colonne)
+        yield from self.aggiunte.blocchi(colonne)
+
+    def ultime_date(self):
+        return self.aggiunte.ultime_date().combine_first(self.base.ultime_date())
+
+    def miniere(self):
+        return sorted(set(self.base.confini) | set(self.aggiunte.confini))
+
+    def date_limite(self):
+        (inizio_base, fine_base), (inizio, fine) = self.base.date_limite(), self.aggiunte.date_limite()
+        return min(inizio_base, inizio), max(fine_base, fine)
+
+    def coordinate(self):
+        coordinate = pd.concat([self.base.coordinate(), self.aggiunte.coordinate()])
+        return coordinate.drop_duplicates("Miniera").sort_values("Miniera").reset_index(drop=True)
+
+
+# somme cumulative che ripartono da zero per ogni miniera (così i valori restano piccoli e precisi)
+# e statistiche sufficienti per la regressione Temperatura (x) vs Consumo energetico (y),
+# per righe già ordinate per miniera e data
+def somme_cumulate(df):
+    codici = df["Miniera"].cat.codes.to_numpy()
+    x = df["Temperatura_C"].to_numpy(np.float64)
+    y = df["Consumo_Energia_kWh"].to_numpy(np.float64)
+    valori = {colonna: df[colonna].to_numpy(np.float64) for colonna in COLONNE_CUMULATE}
+    valori.update({"x": x, "y": y, "xy": x * y, "x2": x * x, "y2": y * y})
+    return pd.DataFrame({nome: pd.Series(v).groupby(codici).cumsum().to_numpy() for nome, v in valori.items()})
+
+
+# concatena righe del dataset anche se la colonna "Miniera" ha categorie diverse (ad esempio per una miniera nuova)
+def concatena(parti):
+    if "Miniera" in parti[0]:
+        categorie = parti[0]["Miniera"].cat.categories
+        for parte in parti[1:]:
+            categorie = categorie.union(parte["Miniera"].cat.categories)
+        parti = [parte.assign(Miniera=parte["Miniera"].cat.set_categories(categorie)) for parte in parti]
+    return pd.concat(parti, ignore_index=True)
+
+
+# pendenza, intercetta e R² della retta dei minimi quadrati a partire dalle statistiche sufficienti
+# (numero di punti, somme di x, y, x·y, x² e y²); NaN se la retta non è definita
+def retta_minimi_quadrati(n, sx, sy, sxy, sx2, sy2):
+    varianza_x = n * sx2 - sx * sx
+    if n < 2 or varianza_x <= 0:
+        return float("nan"), float("nan"), float("nan")
+    covarianza = n * sxy - sx * sy
+    pendenza = covarianza / varianza_x
+    intercetta = (sy - pendenza * sx) / n
+    varianza_y = n * sy2 - sy * sy
+    r2 = covarianza * covarianza / (varianza_x * varianza_y) if varianza_y > 0 else float("nan")
+    return pendenza, intercetta, r2
+
+
+# controlla se le righe sono già ordinate per miniera (codice della categoria) e poi per data
+def _ordinato(codici, date):
+    salti_miniera = np.diff(codici)
+    return bool(np.all((salti_miniera > 0) | ((salti_miniera == 0) & (np.diff(date) >= np.timedelta64(0)))))
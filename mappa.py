@@ -0,0 +1,145 @@
+# mappa delle miniere: le posizioni vengono lette una sola volta dal dataset (Latitudine e Longitudine)
+# e, quando le miniere sono molte, raggruppate lato server in celle di una griglia
+# la cui dimensione dipende dal livello di zoom (più zoom, celle più piccole, fino alle singole miniere)
+import math
+from functools import lru_cache
+import numpy as np
+import plotly.graph_objects as go
+
+
+# fino a questo numero di miniere la mappa mostra sempre i singoli marker
+SOGLIA_RAGGRUPPAMENTO = 500
+
+# dimensione (in gradi) di una cella della griglia al livello di zoom 0
+CELLA_ZOOM_ZERO = 40.0
+
+# livello di zoom oltre il quale le miniere non vengono più raggruppate
+ZOOM_MASSIMO_RAGGRUPPAMENTO = 9
+
+# livello di zoom e centro iniziali della mappa
+ZOOM_INIZIALE = 3
+CENTRO_INIZIALE = {'lat': 64.0, 'lon': 20.0}                                                       # centro sulla Scandinavia
+
+# il riquadro di miniere inviate al browser viene arrotondato verso l'esterno a multipli di questo numero di celle
+# (e allargato di un passo per lato): i piccoli spostamenti non cambiano il riquadro e non richiedono nuovi punti
+CELLE_PASSO_RIQUADRO = 8
+
+
+class MappaMiniere:
+
+    # dati: l'indice in memoria o il dataset partizionato, entrambi forniscono le coordinate di ogni miniera
+    def __init__(self, dati):
+        coordinate = dati.coordinate()
+        self.nomi = coordinate['Miniera'].to_numpy(dtype=object)
+        self.lat = coordinate['Latitudine'].to_numpy(dtype=np.float64)
+        self.lon = coordinate['Longitudine'].to_numpy(dtype=np.float64)
+        self.punti = lru_cache(maxsize=128)(self._punti)                                           # i punti di ogni livello e riquadro vengono calcolati una sola volta
+
+    # posizioni di tutte le miniere, usate dal browser per spostare il marker della miniera selezionata
+    def posizioni(self):
+        return {nome: [float(lat), float(lon)] for nome, lat, lon in zip(self.nomi, self.lat, self.lon)}
+
+    # livello di raggruppamento per uno zoom della mappa (None = nessun raggruppamento)
+    def livello(self, zoom):
+        if len(self.nomi) <= SOGLIA_RAGGRUPPAMENTO or zoom >= ZOOM_MASSIMO_RAGGRUPPAMENTO:
+            return None
+        return max(0, int(math.floor(zoom)))
+
+    # livello e riquadro (lat_min, lat_max, lon_min, lon_max) da mostrare per una vista della mappa;
+    # relayout: il relayoutData della mappa, con lo zoom, il centro e, dopo uno spostamento dell'utente,
+    # gli angoli visibili in 'mapbox._derived'. None se la vista non indica lo zoom.
+    # Con poche miniere il riquadro è None (vengono inviate tutte)
+    def vista(self, relayout):
+        if 'mapbox.zoom' not in relayout:
+            return None
+        zoom = relayout['mapbox.zoom']
+        livello = self.livello(zoom)
+        if len(self.nomi) <= SOGLIA_RAGGRUPPAMENTO:
+            return livello, None
+        angoli = relayout.get('mapbox._derived', {}).get('coordinates')
+        if angoli:
+            lon, lat = np.array(angoli, dtype=np.float64).T
+        else:                                                                                      # senza gli angoli stimo con larghezza abbondante attorno al centro
+            centro = relayout.get('mapbox.center', CENTRO_INIZIALE)
+            mezzo = 360.0 / 2 ** zoom
+            lat = np.array([centro['lat'] - mezzo, centro['lat'] + mezzo])
+            lon = np.array([centro['lon'] - mezzo, centro['lon'] + mezzo])
+        passo = CELLE_PASSO_RIQUADRO * CELLA_ZOOM_ZERO / 2 ** max(0, int(math.floor(zoom)))        # multiplo della cella del livello: i gruppi restano interi
+        if lon.max() - lon.min() >= 360.0:
+            lon = np.array([-180.0, 180.0])
+        riquadro = (max(-90.0, (math.floor(lat.min() / passo) - 1) * passo),
+                    min(90.0, (math.ceil(lat.max() / passo) + 1) * passo),
+                    max(-180.0, (math.floor(lon.min() / passo) - 1) * passo),
+                    min(180.0, (math.ceil(lon.max() / passo) + 1) * passo))
+        return livello, riquadro
+
+    # punti da disegnare a un dato livello: le singole miniere oppure i centri dei gruppi,
+    # con il numero di miniere di ogni gruppo che ne determina la dimensione;
+    # con un riquadro vengono considerate solo le miniere al suo interno
+    def _punti(self, livello, riquadro=None):
+        nomi, lat, lon = self.nomi, self.lat, self.lon
+        if riquadro is not None:
+            lat_min, lat_max, lon_min, lon_max = riquadro
+            dentro = (lat >= lat_min) & (lat < lat_max) & (lon >= lon_min) & (lon < lon_max)
+            nomi, lat, lon = nomi[dentro], lat[dentro], lon[dentro]
+        if livello is None or len(nomi) == 0:
+            return {
+                'lat': lat.tolist(),
+                'lon': lon.tolist(),
+                'hovertext': nomi.tolist(),
+                'customdata': [[nome] for nome in nomi],
+                'marker': {'size': 15, 'color': '#00BFFF'}
+            }
+        cella = CELLA_ZOOM_ZERO / 2 ** livello
+        celle = np.stack([np.floor(lat / cella), np.floor(lon / cella)], axis=1)
+        _, gruppo, quante = np.unique(celle, axis=0, return_inverse=True, return_counts=True)
+        gruppo = gruppo.ravel()
+        primo_nome = nomi[np.unique(gruppo, return_index=True)[1]]
+        lat = np.bincount(gruppo, weights=lat) / quante                                            # centro di ogni gruppo
+        lon = np.bincount(gruppo, weights=lon) / quante
+        return {
+            'lat': lat.tolist(),
+            'lon': lon.tolist(),
+            'hovertext': [nome if n == 1 else f'{n} miniere' for nome, n in zip(primo_nome, quante)],
+            'customdata': [[nome if n == 1 else None] for nome, n in zip(primo_nome, quante)],
+            'marker': {'size': (12 + 6 * np.log2(quante)).round(1).tolist(), 'color': '#00BFFF'}
+        }
+
+    # vista iniziale della mappa (livello e riquadro attorno al centro iniziale)
+    def vista_iniziale(self):
+        return self.vista({'mapbox.zoom': ZOOM_INIZIALE, 'mapbox.center': CENTRO_INIZIALE})
+
+    # figura di base della mappa nella vista iniziale
+    # (prima traccia: miniere o gruppi, seconda traccia: il marker della miniera selezionata, inizialmente vuoto)
+    def figura(self):
+        punti = self.punti(*self.vista_iniziale())
+        fig = go.Figure(go.Scattermapbox(
+            lat=punti['lat'],
+            lon=punti['lon'],
+            mode='markers',
+            marker=punti['marker'],                                                                # colore blu per i marker delle miniere
+            customdata=punti['customdata'],                                                        # nome della miniera nei dati personalizzati
+            hovertext=punti['hovertext'],
+            hovertemplate='<b>%{hovertext}</b><br><br>lat=%{lat}<br>lon=%{lon}<extra></extra>',   # mostra il nome al passaggio del mouse
+            showlegend=False
+        ))
+        # marker della miniera selezionata, aggiornato dal callback lato client
+        fig.add_trace(go.Scattermapbox(
+            lat=[],
+            lon=[],
+            mode='markers',
+            marker=dict(size=25, color='orange'),
+            hoverinfo='none',
+            showlegend=False
+        ))
+        # imposto lo stile della mappa, centro geografico sulla Scandinavia, e layout scuro coerente col resto
+        fig.update_layout(
+            mapbox_style='carto-darkmatter',
+            mapbox_center=CENTRO_INIZIALE,                                                         # centro sulla Scandinavia
+            mapbox_zoom=ZOOM_INIZIALE,                                                             # livello di zoom iniziale
+            height=400,                                                                            # altezza in pixel della mappa
+            margin=dict(l=0, r=0, t=0, b=0),
+            template='plotly_dark',
+            uirevision='mappa'                                                                     # mantiene zoom e posizione quando i punti vengono aggiornati
+        )
+        return fig
@@ -0,0 +1,221 @@
+# metriche di prestazione della dashboard nel formato testuale di Prometheus:
+# durata delle richieste dei callback e delle singole fasi del calcolo (selezione dei dati,
+# costruzione della figura, regressione, serializzazione...), righe lette e byte delle risposte.
+# I valori vengono raccolti in istogrammi con intervalli fissi, così la raccolta costa
+# solo qualche somma sotto un lock e la pagina /metrics si costruisce in un attimo.
+# Con più processi (gunicorn) ogni processo ha le proprie metriche: se DASHBOARD_METRICHE_CARTELLA indica
+# una cartella condivisa, ogni processo vi salva le sue in un file (come la modalità multiprocess
+# di prometheus_client), da un thread in background una volta al secondo e non durante le richieste,
+# e la pagina /metrics, servita da un processo qualsiasi, le unisce tutte:
+# istogrammi e contatori vengono sommati (anche quelli dei processi già terminati, così non tornano mai
+# indietro), i valori correnti (gauge) restano separati con l'etichetta pid del processo
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# limiti superiori degli intervalli degli istogrammi, per tipo di grandezza
+INTERVALLI_SECONDI = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INTERVALLI_RIGHE = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+INTERVALLI_BYTE = (1000, 10000, 100000, 1000000, 10000000)
+
+# intervallo (in secondi) tra due salvataggi delle metriche di un processo nella cartella condivisa
+INTERVALLO_SALVATAGGIO = float(os.environ.get("DASHBOARD_METRICHE_INTERVALLO", 1))
+
+
+class Metriche:
+
+    # cartella: cartella condivisa dai processi in cui salvare le metriche (None = un solo processo)
+    def __init__(self, cartella=None):
+        self.cartella = cartella
+        self._lock = threading.Lock()
+        self._lock_file = threading.Lock()                                                         # un solo thread alla volta riscrive il file del processo
+        self._istogrammi = {}                                                                     # nome -> (descrizione, intervalli, {etichette: [conteggi, somma, numero]})
+        self._valori = {}                                                                         # nome -> (tipo, descrizione, {etichette: valore})
+        self._modificate = False                                                                  # metriche cambiate dopo l'ultimo salvataggio
+        self._pid_salvataggio = None                                                              # processo in cui è attivo il thread di salvataggio
+
+    # aggiunge un'osservazione a un istogramma (etichette: coppie nome=valore che distinguono le serie)
+    def osserva(self, nome, valore, descrizione, intervalli=INTERVALLI_SECONDI, **etichette):
+        chiave = tuple(sorted(etichette.items()))
+        with self._lock:
+            serie = self._istogrammi.setdefault(nome, (descrizione, intervalli, {}))[2]
+            conteggi, somma, numero = serie.get(chiave) or ([0] * len(intervalli), 0.0, 0)
+            for i, limite in enumerate(intervalli):
+                if valore <= limite:
+                    conteggi[i] += 1
+            serie[chiave] = (conteggi, somma + valore, numero + 1)
+            self._modificate = True
+
+    # imposta il valore corrente di una grandezza (tipo 'gauge') o di un contatore già cumulato (tipo 'counter')
+    def imposta(self, nome, valore, descrizione, tipo="gauge", **etichette):
+        chiave = tuple(sorted(etichette.items()))
+        with self._lock:
+            serie = self._valori.setdefault(nome, (tipo, descrizione, {}))[2]
+            if serie.get(chiave) != valore:
+                serie[chiave] = valore
+                self._modificate = True
+
+    # misura la durata di una fase del calcolo:
+    #     with metriche.fase('produzione', 'selezione'):
+    #         ...
+    @contextmanager
+    def fase(self, calcolo, nome):
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.osserva("dashboard_fase_durata_secondi", time.perf_counter() - inizio,
+                         "Durata delle fasi di calcolo dei callback", calcolo=calcolo, fase=nome)
+
+    # registra il numero di righe su cui ha lavorato un calcolo
+    def righe(self, calcolo, numero):
+        self.osserva("dashboard_righe_selezionate", numero, "Righe del dataset usate da ogni calcolo",
+                     INTERVALLI_RIGHE, calcolo=calcolo)
+
+    # metriche del processo corrente in una forma salvabile in JSON (le etichette come elenchi di coppie)
+    def _stato(self):
+        with self._lock:
+            self._modificate = False
+            return {
+                "istogrammi": {nome: [descrizione, list(intervalli), [[chiave, list(conteggi), somma, numero]
+                                                                      for chiave, (conteggi, somma, numero) in serie.items()]]
+                               for nome, (descrizione, intervalli, serie) in self._istogrammi.items()},
+                "valori": {nome: [tipo, descrizione, [[chiave, valore] for chiave, valore in serie.items()]]
+                           for nome, (tipo, descrizione, serie) in self._valori.items()}
+            }
+
+    # salva le metriche del processo corrente nel suo file della cartella condivisa (in modo atomico)
+    def salva(self):
+        if self.cartella is None:
+            return
+        percorso = _percorso_processo(self.cartella, os.getpid())
+        temporaneo = os.path.join(self.cartella, f".{os.path.basename(percorso)}.tmp")
+        with self._lock_file:
+            with open(temporaneo, "w", encoding="utf-8") as f:
+                json.dump(self._stato(), f)
+            os.replace(temporaneo, percorso)
+
+    # avvia il thread che salva le metriche del processo nella cartella condivisa ogni INTERVALLO_SALVATAGGIO secondi,
+    # se sono cambiate, così le richieste aggiornano solo i valori in memoria. Va chiamata nel processo che serve
+    # le richieste: il thread viene avviato una sola volta per processo (anche nei processi creati con la fork da gunicorn).
+    # prima: funzione chiamata prima di ogni salvataggio (ad esempio per aggiornare i valori correnti)
+    def salva_periodicamente(self, prima=None):
+        if self.cartella is None or self._pid_salvataggio == os.getpid():
+            return
+        with self._lock:
+            if self._pid_salvataggio == os.getpid():
+                return
+            self._pid_salvataggio = os.getpid()
+        threading.Thread(target=self._salvataggio, args=(prima,), name="salvataggio-metriche", daemon=True).start()
+
+    def _salvataggio(self, prima):
+        while True:
+            time.sleep(INTERVALLO_SALVATAGGIO)
+            try:
+                if prima is not None:
+                    prima()
+                if self._modificate:
+                    self.salva()
+            except Exception:                                                                     # un errore (ad esempio la cartella rimossa) non ferma i salvataggi successivi
+                continue
+
+    # testo della pagina /metrics: le metriche di questo processo oppure, con la cartella condivisa,
+    # quelle di tutti i processi
+    def testo(self):
+        if self.cartella is None:
+            return self._testo()
+        self.salva()
+        unite = Metriche()
+        for percorso in sorted(glob.glob(os.path.join(self.cartella, "metriche-*.json"))):
+            try:
+                with open(percorso, encoding="utf-8") as f:
+                    stato = json.load(f)
+            except (OSError, ValueError):                                                          # file illeggibile (ad esempio scritto a metà da un'altra versione)
+                continue
+            unite._aggiungi(stato, os.path.basename(percorso)[len("metriche-"):-len(".json")])
+        return unite._testo()
+
+    # aggiunge le metriche salvate da un processo: somma istogrammi e contatori,
+    # e tiene separati i valori correnti (gauge) con l'etichetta pid
+    def _aggiungi(self, stato, pid):
+        for nome, (descrizione, intervalli, serie) in stato["istogrammi"].items():
+            uniti = self._istogrammi.setdefault(nome, (descrizione, tuple(intervalli), {}))[2]
+            for chiave, conteggi, somma, numero in serie:
+                chiave = tuple(map(tuple, chiave))
+                totali, somma_totale, numero_totale = uniti.get(chiave) or ([0] * len(intervalli), 0.0, 0)
+                uniti[chiave] = ([a + b for a, b in zip(totali, conteggi)], somma_totale + somma, numero_totale + numero)
+        for nome, (tipo, descrizione, serie) in stato["valori"].items():
+            uniti = self._valori.setdefault(nome, (tipo, descrizione, {}))[2]
+            for chiave, valore in serie:
+                chiave = tuple(map(tuple, chiave))
+                if tipo == "counter":
+                    uniti[chiave] = uniti.get(chiave, 0) + valore
+                else:
+                    uniti[tuple(sorted(chiave + (("pid", pid),)))] = valore
+
+    def _testo(self):
+        righe = []
+        with self._lock:
+            for nome, (descrizione, intervalli, serie) in sorted(self._istogrammi.items()):
+                righe += [f"# HELP {nome} {descrizione}", f"# TYPE {nome} histogram"]
+                for chiave, (conteggi, somma, numero) in sorted(serie.items()):
+                    for limite, conteggio in zip(intervalli, conteggi):
+                        righe.append(f"{nome}_bucket{_etichette(chiave + (('le', _numero(limite)),))} {conteggio}")
+                    righe.append(f"{nome}_bucket{_etichette(chiave + (('le', '+Inf'),))} {numero}")
+                    righe.append(f"{nome}_sum{_etichette(chiave)} {_numero(somma)}")
+                    righe.append(f"{nome}_count{_etichette(chiave)} {numero}")
+            for nome, (tipo, descrizione, serie) in sorted(self._valori.items()):
+                righe += [f"# HELP {nome} {descrizione}", f"# TYPE {nome} {tipo}"]
+                righe += [f"{nome}{_etichette(chiave)} {_numero(valore)}" for chiave, valore in sorted(serie.items())]
+        return "\n".join(righe) + "\n"
+
+
+# file delle metriche di un processo nella cartella condivisa
+def _percorso_processo(cartella, pid):
+    return os.path.join(cartella, f"metriche-{pid}.json")
+
+
+# toglie dal file di un processo terminato i valori correnti (gauge), che non valgono più;
+# istogrammi e contatori restano, così i totali non diminuiscono (chiamata dal processo principale di gunicorn)
+def processo_terminato(cartella, pid):
+    percorso = _percorso_processo(cartella, pid)
+    try:
+        with open(percorso, encoding="utf-8") as f:
+            stato = json.load(f)
+    except (OSError, ValueError):
+        return
+    stato["valori"] = {nome: valori for nome, valori in stato["valori"].items() if valori[0] == "counter"}
+    temporaneo = os.path.join(cartella, f".{os.path.basename(percorso)}.tmp")
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump(stato, f)
+    os.replace(temporaneo, percorso)
+
+
+# etichette nel formato {nome="valore",...} (vuoto se non ce ne sono)
+def _etichette(coppie):
+    if not coppie:
+        return ""
+    return "{" + ",".join(f'{nome}="{_testo_etichetta(valore)}"' for nome, valore in coppie) + "}"
+
+
+# valore di un'etichetta con le sequenze di escape richieste (barra rovesciata, virgolette e a capo)
+def _testo_etichetta(valore):
+    return str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# numero nel formato di Prometheus (interi senza decimali, NaN e infiniti con i nomi previsti)
+def _numero(valore):
+    valore = float(valore)
+    if valore != valore:
+        return "NaN"
+    if valore in (float("inf"), float("-inf")):
+        return "+Inf" if valore > 0 else "-Inf"
+    return str(int(valore)) if valore.is_integer() else repr(valore)
+
+
+# metriche del processo corrente, condivise da tutti i moduli della dashboard
+metriche = Metriche(os.environ.get("DASHBOARD_METRICHE_CARTELLA") or None)
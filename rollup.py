@@ -0,0 +1,225 @@
+# aggregati pre-calcolati del dataset (rollup): per ogni miniera e per ogni settimana, mese e anno
+# salvo le somme di produzione, energia, CO2, costi e incidenti e minimo, massimo e media della temperatura,
+# più gli stessi valori per l'intera flotta (anche giorno per giorno). Il confronto tra più miniere legge
+# queste tabelle per i periodi interi, scorrendo le righe giornaliere solo per i periodi tagliati dalle date scelte,
+# e i nuovi giorni aggiunti al dataset aggiornano solo i periodi che toccano. I valori giornalieri di ogni miniera sono già le righe del dataset: il confronto
+# giornaliero li legge dal backend dei dati, invece di tenerne una seconda copia in memoria
+import pandas as pd
+
+
+# periodi di aggregazione: etichetta mostrata nella dashboard
+PERIODI = {
+    'giorno': 'Giornaliero',
+    'settimana': 'Settimanale',
+    'mese': 'Mensile',
+    'anno': 'Annuale'
+}
+
+# periodi per cui salvo gli aggregati di ogni miniera (quelli giornalieri avrebbero una riga per ogni riga del dataset)
+PERIODI_MINIERE = ['settimana', 'mese', 'anno']
+
+# colonne sommate in ogni periodo
+COLONNE_SOMMA = [
+    'Tonnellate_giornaliere', 'Consumo_Energia_kWh', 'Emissioni_CO2_kg',
+    'Costo_Lavoro', 'Costo_Macchinari', 'Costo_Energia', 'Incidenti'
+]
+
+# colonne del dataset lette per costruire i rollup
+COLONNE_ROLLUP = ['Miniera', 'Data', 'Temperatura_C'] + COLONNE_SOMMA
+
+# durata massima di ogni periodo in giorni (sommata al primo giorno di un periodo cade nel periodo successivo)
+DURATA_MASSIMA = {'giorno': 1, 'settimana': 7, 'mese': 31, 'anno': 366}
+
+# come si uniscono due aggregati dello stesso periodo (ad esempio quello salvato e quello dei giorni nuovi)
+UNIONE = {colonna: 'sum' for colonna in COLONNE_SOMMA}
+UNIONE.update({'Temperatura_somma': 'sum', 'Temperatura_min': 'min', 'Temperatura_max': 'max', 'Giorni': 'sum'})
+
+# grandezze confrontabili nella dashboard: etichetta
+METRICHE = {
+    'Tonnellate_giornaliere': 'Produzione (tonnellate)',
+    'Consumo_Energia_kWh': 'Consumo energetico (kWh)',
+    'Emissioni_CO2_kg': 'Emissioni CO2 (kg)',
+    'Costo_Lavoro': 'Costo del lavoro (€)',
+    'Costo_Macchinari': 'Costo dei macchinari (€)',
+    'Costo_Energia': 'Costo dell\'energia (€)',
+    'Incidenti': 'Incidenti',
+    'Temperatura_media': 'Temperatura media (°C)',
+    'Temperatura_min': 'Temperatura minima (°C)',
+    'Temperatura_max': 'Temperatura massima (°C)'
+}
+
+
+# primo giorno del periodo (giorno, settimana da lunedì, mese o anno) a cui appartiene ogni data
+# (calcolato direttamente sui numeri di giorno, senza passare dagli accessori .dt di pandas)
+def inizio_periodo(date, periodo):
+    date = pd.Series(pd.to_datetime(date))
+    giorni = date.to_numpy().astype('datetime64[D]')
+    if periodo == 'settimana':
+        giorni = giorni - (giorni.view('int64') + 3) % 7                                           # il 01/01/1970 era un giovedì
+    elif periodo != 'giorno':
+        giorni = giorni.astype('datetime64[M]' if periodo == 'mese' else 'datetime64[Y]')
+    return pd.Series(giorni.astype('datetime64[ns]'), index=date.index)
+
+
+# divide l'intervallo di date [inizio, fine] in periodi interi, letti dai rollup, e nelle parti del primo e dell'ultimo
+# periodo tagliate dall'intervallo, da ricalcolare sulle righe giornaliere: restituisce il primo e l'ultimo giorno
+# dei periodi interi (da usare per selezionare i periodi nei rollup) e gli intervalli di date delle parti tagliate
+def dividi_intervallo(inizio, fine, periodo):
+    primo = inizio_periodo([inizio], periodo).iloc[0]
+    ultimo = inizio_periodo([fine], periodo).iloc[0]
+    bordi = []
+    if inizio > primo:                                                                             # l'intervallo comincia a periodo iniziato
+        primo = inizio_periodo([primo + pd.Timedelta(days=DURATA_MASSIMA[periodo])], periodo).iloc[0]
+        bordi.append((inizio, min(fine, primo - pd.Timedelta(days=1))))
+    if ultimo >= primo and inizio_periodo([fine + pd.Timedelta(days=1)], periodo).iloc[0] == ultimo:   # e finisce prima della fine del periodo
+        bordi.append((max(inizio, ultimo), fine))
+        ultimo -= pd.Timedelta(days=1)
+    return primo, ultimo, bordi
+
+
+# aggrega righe giornaliere per miniera e periodo (oppure solo per periodo, sommando tutte le miniere)
+def aggrega_righe(righe, periodo, per_miniera=True):
+    gruppi = righe.assign(Periodo=inizio_periodo(righe['Data'], periodo).to_numpy(),
+                          Temperatura_C=righe['Temperatura_C'].astype('float64'),
+                          Incidenti=righe['Incidenti'].astype('int64'))                            # nel dataset è int8: le somme lo supererebbero
+    parziale = gruppi.groupby(['Miniera', 'Periodo'] if per_miniera else 'Periodo', observed=True, sort=True).agg(
+        **{colonna: (colonna, 'sum') for colonna in COLONNE_SOMMA},
+        Temperatura_somma=('Temperatura_C', 'sum'),
+        Temperatura_min=('Temperatura_C', 'min'),
+        Temperatura_max=('Temperatura_C', 'max'),
+        Giorni=('Temperatura_C', 'size')
+    )
+    if not per_miniera:
+        return parziale
+    nomi = parziale.index.levels[0]
+    if not isinstance(nomi, pd.CategoricalIndex):
+        return parziale
+    # uso nomi semplici (non categorie), così aggregati di blocchi con categorie diverse si possono unire
+    return parziale.set_axis(parziale.index.set_levels(nomi.astype(str), level=0))
+
+
+# unisce a una tabella di aggregati quelli dei giorni nuovi: vengono ricalcolate solo le righe dei periodi toccati
+def unisci(tabella, nuova, livelli):
+    if tabella is None or tabella.empty:
+        return nuova.sort_index()
+    toccate = tabella.index.isin(nuova.index)
+    unite = pd.concat([tabella[toccate], nuova]).groupby(level=livelli).agg(UNIONE)
+    return pd.concat([tabella[~toccate], unite]).sort_index()
+
+
+class RollupMiniere:
+
+    # blocchi: DataFrame con le colonne di COLONNE_ROLLUP (l'intero dataset o i suoi blocchi, in qualsiasi ordine);
+    # gli aggregati dei blocchi vengono uniti una sola volta alla fine
+    def __init__(self, blocchi=()):
+        self.miniere = {periodo: None for periodo in PERIODI_MINIERE}                              # indice (Miniera, Periodo)
+        self.flotta = {periodo: None for periodo in PERIODI}                                       # indice Periodo, somma di tutte le miniere
+        parziali = {'giorno': [], 'settimana': [], 'mese': []}                                     # gli anni si ricavano dai mesi, senza rileggere le righe
+        for righe in blocchi:
+            if len(righe):
+                parziali['giorno'].append(aggrega_righe(righe, 'giorno', per_miniera=False))
+                parziali['settimana'].append(aggrega_righe(righe, 'settimana'))
+                parziali['mese'].append(aggrega_righe(righe, 'mese'))
+        if parziali['giorno']:
+            self.flotta['giorno'] = pd.concat(parziali['giorno']).groupby(level='Periodo').agg(UNIONE)
+        for periodo in ('settimana', 'mese'):
+            if parziali[periodo]:
+                self.miniere[periodo] = pd.concat(parziali[periodo]).groupby(level=['Miniera', 'Periodo']).agg(UNIONE)
+        if self.miniere['mese'] is not None:
+            mesi = self.miniere['mese']
+            anni = inizio_periodo(mesi.index.get_level_values('Periodo'), 'anno').to_numpy()
+            self.miniere['anno'] = mesi.groupby([mesi.index.get_level_values('Miniera'), pd.Index(anni, name='Periodo')]).agg(UNIONE)
+        for periodo in PERIODI_MINIERE:
+            if self.miniere[periodo] is not None:
+                self.flotta[periodo] = self.miniere[periodo].groupby(level='Periodo').agg(UNIONE)
+
+    # nuovo rollup con in più le righe giornaliere indicate (ad esempio i giorni appena accodati al dataset):
+    # vengono ricalcolati solo i periodi toccati e questo oggetto non cambia, così chi lo sta leggendo
+    # continua a vedere tutte le tabelle della versione precedente
+    def con_righe(self, righe):
+        nuovo = RollupMiniere()
+        nuovo.miniere, nuovo.flotta = dict(self.miniere), dict(self.flotta)
+        if len(righe) == 0:
+            return nuovo
+        for periodo in PERIODI_MINIERE:
+            parziale = aggrega_righe(righe, periodo)
+            nuovo.miniere[periodo] = unisci(self.miniere[periodo], parziale, ['Miniera', 'Periodo'])
+            nuovo.flotta[periodo] = unisci(self.flotta[periodo], parziale.groupby(level='Periodo').agg(UNIONE), 'Periodo')
+        nuovo.flotta['giorno'] = unisci(self.flotta['giorno'], aggrega_righe(righe, 'giorno', per_miniera=False), 'Periodo')
+        return nuovo
+
+    # tutte le tabelle in un unico DataFrame, con la colonna "Tabella" che indica a quale appartiene ogni riga
+    # (ad esempio 'miniere-mese' o 'flotta-giorno'), per salvarle in un file accessorio della cache
+    def tabella(self):
+        parti = [
+            tabella.reset_index().assign(Tabella=f'{gruppo}-{periodo}')
+            for gruppo, tabelle in (('miniere', self.miniere), ('flotta', self.flotta))
+            for periodo, tabella in tabelle.items() if tabella is not None
+        ]
+        return pd.concat(parti, ignore_index=True) if parti else pd.DataFrame({'Tabella': []})
+
+    # valori della metrica per le miniere indicate (e per l'intera flotta se richiesto), una colonna per serie,
+    # per i periodi che si sovrappongono all'intervallo di date. I periodi interi vengono letti dai rollup,
+    # il primo e l'ultimo, se l'intervallo li taglia, vengono ricalcolati solo sui giorni selezionati
+    # (come negli altri grafici della pagina): per le miniere dalle righe del backend, per la flotta dai totali giornalieri;
+    # dati: backend (indice o dataset) da cui leggere le righe giornaliere delle miniere
+    def confronto(self, miniere, periodo, metrica, start_date, end_date, dati, flotta=False):
+        inizio, fine = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+        primo, ultimo, bordi = dividi_intervallo(inizio, fine, periodo)
+        tabella, totale = self.miniere.get(periodo), self.flotta[periodo]
+        serie = {}
+        if periodo not in self.miniere:
+            serie.update(serie_giornaliere(dati, miniere, metrica, inizio, fine))
+        elif tabella is not None:
+            nomi = [m for m in miniere if m in tabella.index.levels[0]]
+            if nomi:
+                righe = tabella.loc[(nomi, slice(primo, ultimo)), :]
+                valori = _metrica(righe, metrica).unstack('Miniera')
+                for nome in nomi:
+                    parti = [valori[nome].dropna()] if nome in valori else []
+                    for da, a in bordi:
+                        giorni = dati.seleziona(nome, da, a, COLONNE_ROLLUP[1:])
+                        if len(giorni):
+                            parti.append(_metrica(aggrega_righe(giorni, periodo, per_miniera=False), metrica))
+                    if parti:
+                        serie[nome] = pd.concat(parti).sort_index()
+        if flotta and totale is not None:
+            parti = [_metrica(totale.loc[primo:ultimo], metrica)]
+            for da, a in bordi:
+                giorni = self.flotta['giorno'].loc[da:a]
+                if len(giorni):
+                    periodi = pd.Index(inizio_periodo(giorni.index, periodo).to_numpy(), name='Periodo')
+                    parti.append(_metrica(giorni.groupby(periodi).agg(UNIONE), metrica))
+            serie['Intera flotta'] = pd.concat(parti).sort_index()
+        return pd.DataFrame(serie)
+
+
+# rollup ricostruito dal DataFrame di RollupMiniere.tabella() (ad esempio letto da un file mappato in memoria)
+def rollup_da_tabella(tabella):
+    rollup = RollupMiniere()
+    for nome, righe in tabella.groupby('Tabella', sort=False):
+        gruppo, periodo = nome.split('-')
+        livelli = ['Miniera', 'Periodo'] if gruppo == 'miniere' else ['Periodo']
+        colonne = [colonna for colonna in righe.columns if colonna not in ('Tabella', 'Miniera', 'Periodo')]
+        getattr(rollup, gruppo)[periodo] = righe.set_index(livelli)[colonne]
+    return rollup
+
+
+# valori di una metrica da una tabella di aggregati (la temperatura media viene ricavata da somma e numero di giorni)
+def _metrica(tabella, metrica):
+    if metrica == 'Temperatura_media':
+        return tabella['Temperatura_somma'] / tabella['Giorni']
+    return tabella[metrica]
+
+
+# valori giornalieri di una metrica per le miniere indicate, letti direttamente dal backend dei dati
+# (la temperatura minima, massima e media di un giorno è la temperatura del giorno stesso)
+def serie_giornaliere(dati, miniere, metrica, start_date, end_date):
+    colonna = 'Temperatura_C' if metrica.startswith('Temperatura_') else metrica
+    serie = {}
+    for nome in miniere:
+        righe = dati.seleziona(nome, start_date, end_date, ['Data', colonna])
+        if len(righe):
+            periodi = pd.Index(righe['Data'].to_numpy().astype('datetime64[ns]'), name='Periodo')
+            serie[nome] = pd.Series(righe[colonna].to_numpy('float64'), index=periodi, name=nome)
+    return serie
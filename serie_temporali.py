@@ -0,0 +1,84 @@
+# riduzione dei punti delle serie temporali per i grafici della dashboard:
+# sotto la soglia i dati restano giornalieri, sopra vengono aggregati per settimana o per mese
+# (grafici a barre) oppure ridotti con l'algoritmo LTTB, che conserva la forma della curva (grafici a linee)
+import numpy as np
+import pandas as pd
+
+
+# numero massimo di punti per traccia oltre il quale i dati vengono ridotti
+SOGLIA_PUNTI = 1500
+
+# oltre questo numero di punti le linee vengono disegnate con WebGL (Scattergl) invece che in SVG
+SOGLIA_WEBGL = 1000
+
+# risoluzioni di aggregazione disponibili: regola di pandas, giorni medi per periodo ed etichetta
+RISOLUZIONI = [
+    ('D', 1, 'giornaliera'),
+    ('W', 7, 'media settimanale'),
+    ('MS', 30.4, 'media mensile'),
+    ('YS', 365.25, 'media annuale')
+]
+
+
+# sceglie la risoluzione più fine per cui l'intervallo resta sotto la soglia di punti
+def scegli_risoluzione(numero_giorni, soglia=SOGLIA_PUNTI):
+    for regola, giorni, etichetta in RISOLUZIONI:
+        if numero_giorni / giorni <= soglia:
+            return regola, etichetta
+    return RISOLUZIONI[-1][0], RISOLUZIONI[-1][2]
+
+
+# aggrega le colonne indicate alla risoluzione scelta (media dei valori giornalieri di ogni periodo);
+# restituisce un DataFrame con la colonna "Data" e l'etichetta della risoluzione
+def aggrega(dff, colonne, soglia=SOGLIA_PUNTI):
+    regola, etichetta = scegli_risoluzione(len(dff), soglia)
+    if regola == 'D':
+        return dff[['Data'] + colonne], etichetta
+    ridotto = dff[['Data'] + colonne].resample(regola, on='Data').mean().reset_index()
+    return ridotto, etichetta
+
+
+# algoritmo Largest-Triangle-Three-Buckets: sceglie "soglia" punti della serie,
+# per ogni gruppo il punto che forma il triangolo di area massima con il punto scelto prima
+# e con la media del gruppo successivo. Restituisce le posizioni dei punti scelti
+def indici_lttb(x, y, soglia):
+    n = len(x)
+    if soglia >= n or soglia < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    confini = np.linspace(1, n - 1, soglia - 1).astype(np.int64)                                  # soglia - 2 gruppi tra il primo e l'ultimo punto
+    indici = np.empty(soglia, dtype=np.int64)
+    indici[0], indici[-1] = 0, n - 1
+    scelto = 0
+    for i in range(soglia - 2):
+        inizio, fine = confini[i], confini[i + 1]
+        fine_successivo = confini[i + 2] if i + 2 < len(confini) else n
+        media_x = x[fine:fine_successivo].mean()
+        media_y = np.nanmean(y[fine:fine_successivo]) if np.isfinite(y[fine:fine_successivo]).any() else y[scelto]
+        area = np.abs((x[scelto] - media_x) * (y[inizio:fine] - y[scelto])
+                      - (x[scelto] - x[inizio:fine]) * (media_y - y[scelto]))
+        scelto = inizio + (int(np.nanargmax(area)) if np.isfinite(area).any() else 0)
+        indici[i + 1] = scelto
+    return indici
+
+
+# riduce una serie con LTTB (se supera la soglia); le altre colonne seguono i punti scelti sulla prima
+def riduci_lttb(dff, colonne, soglia=SOGLIA_PUNTI):
+    if len(dff) <= soglia:
+        return dff[['Data'] + colonne], 'giornaliera'
+    x = dff['Data'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    indici = indici_lttb(x, dff[colonne[0]].to_numpy(), soglia)
+    return dff[['Data'] + colonne].iloc[indici], 'campionamento LTTB'
+
+
+# intervallo di date visibile dopo uno zoom, letto dal relayoutData del grafico
+# (None se il grafico è tornato alla vista completa o se l'evento non riguarda l'asse x)
+def intervallo_zoom(relayout):
+    if not relayout or relayout.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout:
+        return pd.Timestamp(relayout['xaxis.range[0]']), pd.Timestamp(relayout['xaxis.range[1]'])
+    if 'xaxis.range' in relayout:
+        return pd.Timestamp(relayout['xaxis.range'][0]), pd.Timestamp(relayout['xaxis.range'][1])
+    return None
@@ -0,0 +1,76 @@
+# paginazione, ordinamento e filtro lato server per la tabella della sicurezza:
+# il browser riceve solo le righe della pagina visibile, qualunque sia l'ampiezza dell'intervallo di date
+import math
+import pandas as pd
+
+
+# colonne mostrate nella tabella (nell'ordine del DataTable)
+COLONNE_TABELLA = ['Data', 'Miniera', 'Incidenti', 'Ore_Senza_Incidenti', 'Giorni_senza_incidenti_consecutivi', 'Media_Giorni']
+
+# operatori del linguaggio di filtro del DataTable (filter_query), nell'ordine in cui vanno cercati
+OPERATORI = [
+    ('ge ', '>='), ('le ', '<='), ('lt ', '<'), ('gt ', '>'),
+    ('ne ', '!='), ('eq ', '='), ('contains ',), ('datestartswith ',)
+]
+
+
+# divide una condizione del filtro (ad esempio "{Incidenti} > 0") in colonna, operatore e valore
+def dividi_condizione(condizione):
+    for simboli in OPERATORI:
+        for simbolo in simboli:
+            if simbolo not in condizione:
+                continue
+            nome, valore = condizione.split(simbolo, 1)
+            nome = nome[nome.find('{') + 1: nome.rfind('}')]
+            valore = valore.strip()
+            if valore and valore[0] == valore[-1] and valore[0] in ('"', "'", '`'):
+                valore = valore[1:-1].replace('\\' + valore[0], valore[0])                         # valore tra virgolette: lo tratto come testo
+            else:
+                try:
+                    valore = float(valore)
+                except ValueError:
+                    pass
+            return nome, simboli[0].strip(), valore
+    return None, None, None
+
+
+# applica una condizione a una colonna e restituisce la maschera delle righe da tenere;
+# la colonna "Data" viene confrontata come data (il valore è scritto come giorno/mese/anno)
+def _maschera(colonna, operatore, valore):
+    if operatore in ('contains', 'datestartswith'):
+        testo = colonna.dt.strftime('%d/%m/%Y') if colonna.dtype.kind == 'M' else colonna.astype(str)
+        valore = str(valore).removesuffix('.0') if isinstance(valore, float) else str(valore)
+        return testo.str.contains(valore, regex=False) if operatore == 'contains' else testo.str.startswith(valore)
+    if colonna.dtype.kind == 'M':
+        valore = pd.to_datetime(str(valore), dayfirst=True)
+    elif isinstance(colonna.dtype, pd.CategoricalDtype):
+        colonna = colonna.astype(str)
+        valore = str(valore)
+    return {'ge': colonna >= valore, 'le': colonna <= valore, 'lt': colonna < valore,
+            'gt': colonna > valore, 'ne': colonna != valore, 'eq': colonna == valore}[operatore]
+
+
+# questa funzione prepara una pagina della tabella a partire dalla selezione dell'indice:
+# applica il filtro e l'ordinamento richiesti, poi formatta solo le righe della pagina visibile.
+# Restituisce le righe della pagina, il numero totale di pagine e la pagina effettivamente mostrata
+def pagina_tabella(dff, media_giorni, page_current, page_size, sort_by=None, filter_query=''):
+    righe = dff[COLONNE_TABELLA[:-1]]
+    for condizione in (filter_query or '').split(' && '):
+        nome, operatore, valore = dividi_condizione(condizione)
+        try:
+            if nome == 'Media_Giorni':                                                             # la media è la stessa per tutte le righe
+                righe = righe if _maschera(pd.Series([media_giorni]), operatore, valore).iloc[0] else righe.iloc[:0]
+            elif nome in righe.columns:
+                righe = righe[_maschera(righe[nome], operatore, valore).to_numpy()]
+        except (ValueError, TypeError, OverflowError):                                             # valore non confrontabile con la colonna (ad esempio una data scritta male): ignoro la condizione
+            continue
+
+    if sort_by and sort_by[0]['column_id'] in righe.columns:
+        ordine = sort_by[0]
+        righe = righe.sort_values(ordine['column_id'], ascending=ordine['direction'] == 'asc', kind='stable')
+
+    numero_pagine = max(1, math.ceil(len(righe) / page_size))
+    page_current = min(page_current or 0, numero_pagine - 1)                                       # se la selezione si è ristretta torno all'ultima pagina disponibile
+    pagina = righe.iloc[page_current * page_size:(page_current + 1) * page_size]
+    pagina = pagina.assign(Data=pagina['Data'].dt.strftime('%d/%m/%Y'), Media_Giorni=round(media_giorni, 2))
+    return pagina[COLONNE_TABELLA].to_dict('records'), numero_pagine, page_current
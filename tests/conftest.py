@@ -0,0 +1,17 @@
+# configurazione comune dei test: i moduli della dashboard sono nella cartella principale del progetto
+# e i test usano un piccolo dataset generato con il simulatore, tipizzato come quello letto dalla dashboard
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from caricamento_dati import prepara_dati                                                         # noqa: E402
+from generate_data import crea_flotta, genera_dataset                                              # noqa: E402
+
+
+# quattro miniere per cinque mesi, a cavallo di due anni
+@pytest.fixture(scope="session")
+def dataset():
+    return prepara_dati(genera_dataset(crea_flotta(4, seed=1), pd.date_range("2023-11-01", "2024-03-31"), seed=2))
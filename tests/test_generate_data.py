@@ -0,0 +1,40 @@
+# test del simulatore: il contatore vettoriale dei giorni senza incidenti confrontato con un ciclo giorno per giorno
+import numpy as np
+import pandas as pd
+
+from generate_data import contatore_giorni_senza_incidenti, crea_flotta, genera_dataset
+
+
+# contatore calcolato giorno per giorno: torna a 0 nel giorno di un incidente, altrimenti cresce di 1
+def contatore_ciclo(incidenti, contatori_iniziali=None):
+    risultato = np.zeros(incidenti.shape, dtype=np.int64)
+    for i, riga in enumerate(incidenti):
+        contatore = 0 if contatori_iniziali is None else contatori_iniziali[i]
+        for j, incidente in enumerate(riga):
+            contatore = 0 if incidente else contatore + 1
+            risultato[i, j] = contatore
+    return risultato
+
+
+def test_contatore_come_ciclo():
+    rng = np.random.default_rng(0)
+    for probabilita in (0.0, 0.05, 0.5, 1.0):
+        incidenti = (rng.random((6, 200)) < probabilita).astype(np.int8)
+        np.testing.assert_array_equal(contatore_giorni_senza_incidenti(incidenti), contatore_ciclo(incidenti))
+
+
+def test_contatore_riprende_dai_contatori_iniziali():
+    rng = np.random.default_rng(1)
+    incidenti = (rng.random((5, 60)) < 0.05).astype(np.int8)
+    incidenti[0] = 0                                                                               # una miniera senza incidenti per tutto l'intervallo
+    iniziali = np.array([10, 0, 3, 250, 7])
+    np.testing.assert_array_equal(contatore_giorni_senza_incidenti(incidenti, iniziali), contatore_ciclo(incidenti, iniziali))
+
+
+# il contatore prosegue tra un anno e l'altro (le parti di ogni anno sono simulate separatamente)
+def test_contatore_continuo_tra_gli_anni():
+    df = genera_dataset(crea_flotta(3, seed=4), pd.date_range("2023-10-01", "2024-03-31"), seed=5)
+    for _, righe in df.sort_values(["Miniera", "Data"]).groupby("Miniera"):
+        contatore = righe["Giorni_senza_incidenti_consecutivi"].to_numpy()
+        atteso = contatore_ciclo(righe["Incidenti"].to_numpy()[None, 1:], contatore[:1])[0]             # dal secondo giorno, ripartendo dal primo
+        np.testing.assert_array_equal(contatore[1:], atteso)
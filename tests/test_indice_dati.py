@@ -0,0 +1,91 @@
+# test dell'indice: somme, medie e retta di regressione calcolate dalle somme cumulative
+# confrontate con i calcoli diretti sulle righe selezionate con una maschera (e con np.polyfit)
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_dati import COLONNE_CUMULATE, IndiceMiniere, retta_minimi_quadrati
+
+
+# intervalli di date casuali, anche vuoti, invertiti o fuori dal dataset
+def intervalli(numero, seed=0):
+    rng = np.random.default_rng(seed)
+    giorni = pd.date_range("2023-10-15", "2024-04-15")
+    for _ in range(numero):
+        inizio, fine = rng.choice(giorni, 2)
+        yield pd.Timestamp(inizio), pd.Timestamp(fine)
+
+
+def righe_maschera(df, miniera, inizio, fine):
+    return df[(df["Miniera"] == miniera) & (df["Data"] >= inizio) & (df["Data"] <= fine)]
+
+
+# retta e R² calcolati direttamente sui punti
+def retta_diretta(righe):
+    x, y = righe["Temperatura_C"].to_numpy(), righe["Consumo_Energia_kWh"].to_numpy()
+    pendenza, intercetta = np.polyfit(x, y, 1)
+    return pendenza, intercetta, np.corrcoef(x, y)[0, 1] ** 2
+
+
+def test_somme_e_medie_come_maschera(dataset):
+    indice = IndiceMiniere(dataset.sample(frac=1, random_state=0).reset_index(drop=True))          # righe in disordine: l'indice le riordina
+    for miniera in indice.miniere():
+        for inizio, fine in intervalli(30):
+            righe = righe_maschera(dataset, miniera, inizio, fine)
+            assert indice.somme(miniera, inizio, fine, COLONNE_CUMULATE) == pytest.approx(
+                [float(righe[colonna].sum()) for colonna in COLONNE_CUMULATE], rel=1e-9, abs=1e-6)
+            media = indice.media("Incidenti", miniera, inizio, fine)
+            assert np.isnan(media) if righe.empty else media == pytest.approx(righe["Incidenti"].mean())
+            pd.testing.assert_frame_equal(indice.seleziona(miniera, inizio, fine).reset_index(drop=True),
+                                          righe.reset_index(drop=True))
+
+
+def test_regressione_come_polyfit(dataset):
+    indice = IndiceMiniere(dataset)
+    for miniera in indice.miniere():
+        for inizio, fine in intervalli(20, seed=1):
+            righe = righe_maschera(dataset, miniera, inizio, fine)
+            risultato = indice.regressione(miniera, inizio, fine)
+            if len(righe) < 2:
+                assert all(np.isnan(valore) for valore in risultato)
+            else:
+                assert risultato == pytest.approx(retta_diretta(righe), rel=1e-6)
+
+
+def test_retta_minimi_quadrati_come_polyfit():
+    rng = np.random.default_rng(2)
+    for n in (2, 3, 10, 1000):
+        x = rng.normal(0, 10, n)
+        y = 3000000 - 40000 * x + rng.normal(0, 200000, n)
+        somme = (x.sum(), y.sum(), (x * y).sum(), (x * x).sum(), (y * y).sum())
+        atteso = (*np.polyfit(x, y, 1), np.corrcoef(x, y)[0, 1] ** 2)
+        assert retta_minimi_quadrati(n, *somme) == pytest.approx(atteso, rel=1e-6)
+
+
+def test_retta_minimi_quadrati_non_definita():
+    assert all(np.isnan(valore) for valore in retta_minimi_quadrati(1, 2.0, 3.0, 6.0, 4.0, 9.0))
+    assert all(np.isnan(valore) for valore in retta_minimi_quadrati(3, 6.0, 3.0, 6.0, 12.0, 5.0))   # tre punti con la stessa x
+
+
+# righe accodate in più aggiornamenti (anche con una miniera nuova): le letture devono
+# coincidere con quelle di un indice costruito da zero su tutte le righe
+def test_indice_con_aggiunte_come_indice_completo(dataset):
+    nuova = dataset["Miniera"].cat.categories[-1]
+    base = dataset[(dataset["Data"] <= "2024-01-17") & (dataset["Miniera"] != nuova)]
+    prime = dataset[(dataset["Data"] <= "2024-02-20") & ~dataset.index.isin(base.index)]
+    seconde = dataset[dataset["Data"] > "2024-02-20"]
+    indice = IndiceMiniere(base.reset_index(drop=True)).con_righe(prime.reset_index(drop=True)).con_righe(seconde.reset_index(drop=True))
+    completo = IndiceMiniere(dataset)
+    assert indice.versione == 2
+    assert indice.miniere() == completo.miniere()
+    assert indice.date_limite() == completo.date_limite()
+    for miniera in completo.miniere():
+        for inizio, fine in intervalli(30, seed=3):
+            assert indice.somme(miniera, inizio, fine, COLONNE_CUMULATE) == pytest.approx(
+                completo.somme(miniera, inizio, fine, COLONNE_CUMULATE), rel=1e-9, abs=1e-6)
+            media, attesa = indice.media("Incidenti", miniera, inizio, fine), completo.media("Incidenti", miniera, inizio, fine)
+            assert media == pytest.approx(attesa, nan_ok=True)
+            assert indice.regressione(miniera, inizio, fine) == pytest.approx(completo.regressione(miniera, inizio, fine), rel=1e-6, nan_ok=True)
+            selezione = indice.seleziona(miniera, inizio, fine)
+            pd.testing.assert_frame_equal(selezione.reset_index(drop=True).astype({"Miniera": str}),
+                                          completo.seleziona(miniera, inizio, fine).reset_index(drop=True).astype({"Miniera": str}))
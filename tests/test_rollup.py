@@ -0,0 +1,76 @@
+# test dei rollup: le tabelle per miniera e per flotta confrontate con un groupby diretto
+# sulle righe giornaliere, anche quando sono costruite con più aggiornamenti successivi
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_dati import IndiceMiniere
+from rollup import COLONNE_ROLLUP, COLONNE_SOMMA, PERIODI_MINIERE, RollupMiniere
+
+# regola di pandas per il primo giorno di ogni periodo (le settimane cominciano di lunedì)
+PERIODI_PANDAS = {'giorno': 'D', 'settimana': 'W-SUN', 'mese': 'M', 'anno': 'Y'}
+
+
+# aggregati di un periodo calcolati con un groupby sulle righe giornaliere
+def aggregati_diretti(righe, periodo, per_miniera=True):
+    righe = righe.assign(Periodo=righe['Data'].dt.to_period(PERIODI_PANDAS[periodo]).dt.start_time,
+                         Miniera=righe['Miniera'].astype(str))
+    return righe.groupby(['Miniera', 'Periodo'] if per_miniera else 'Periodo').agg(
+        **{colonna: (colonna, 'sum') for colonna in COLONNE_SOMMA},
+        Temperatura_somma=('Temperatura_C', 'sum'),
+        Temperatura_min=('Temperatura_C', 'min'),
+        Temperatura_max=('Temperatura_C', 'max'),
+        Giorni=('Temperatura_C', 'size')
+    )
+
+
+# valore di una metrica del confronto a partire dagli aggregati
+def valore(aggregati, metrica):
+    return aggregati['Temperatura_somma'] / aggregati['Giorni'] if metrica == 'Temperatura_media' else aggregati[metrica]
+
+
+def confronta(tabella, attesa):
+    pd.testing.assert_frame_equal(tabella, attesa, check_dtype=False, check_like=True, check_index_type=False,
+                                  check_names=False, rtol=1e-9)
+
+
+def controlla_tabelle(rollup, righe):
+    for periodo in PERIODI_MINIERE:
+        confronta(rollup.miniere[periodo], aggregati_diretti(righe, periodo))
+        confronta(rollup.flotta[periodo], aggregati_diretti(righe, periodo, per_miniera=False))
+    confronta(rollup.flotta['giorno'], aggregati_diretti(righe, 'giorno', per_miniera=False))
+
+
+def test_rollup_come_groupby(dataset):
+    righe = dataset[COLONNE_ROLLUP]
+    controlla_tabelle(RollupMiniere([righe.iloc[:200], righe.iloc[200:]]), righe)                 # aggregati di due blocchi uniti
+
+
+# giorni accodati in due aggiornamenti che tagliano settimane, mesi e anni (e una miniera che compare dopo)
+def test_con_righe_come_rollup_completo(dataset):
+    righe = dataset[COLONNE_ROLLUP]
+    nuova = righe['Miniera'].cat.categories[-1]
+    base = righe[(righe['Data'] <= '2023-12-20') & (righe['Miniera'] != nuova)]
+    prime = righe[(righe['Data'] <= '2024-01-10') & ~righe.index.isin(base.index)]
+    seconde = righe[righe['Data'] > '2024-01-10']
+    iniziale = RollupMiniere([base])
+    aggiornato = iniziale.con_righe(prime).con_righe(seconde)
+    controlla_tabelle(aggiornato, righe)
+    controlla_tabelle(iniziale, base)                                                              # il rollup di partenza non cambia
+    assert aggiornato.con_righe(righe.iloc[:0]).miniere['mese'] is aggiornato.miniere['mese']
+
+
+# confronto su date che tagliano il primo e l'ultimo periodo: ogni valore riguarda solo i giorni selezionati
+@pytest.mark.parametrize("periodo", ['settimana', 'mese', 'anno'])
+@pytest.mark.parametrize("start_date, end_date", [('2023-11-15', '2024-02-10'), ('2023-12-03', '2023-12-05'),
+                                                  ('2023-11-01', '2024-03-31'), ('2024-01-01', '2024-01-31')])
+def test_confronto_solo_giorni_selezionati(dataset, periodo, start_date, end_date):
+    rollup = RollupMiniere([dataset[COLONNE_ROLLUP]])
+    miniere = ['Miniera 1', 'Miniera 3']
+    selezione = dataset[(dataset['Data'] >= start_date) & (dataset['Data'] <= end_date)]
+    for metrica in ('Tonnellate_giornaliere', 'Incidenti', 'Temperatura_media', 'Temperatura_max'):
+        valori = rollup.confronto(miniere, periodo, metrica, start_date, end_date, IndiceMiniere(dataset), flotta=True)
+        per_miniera = valore(aggregati_diretti(selezione, periodo), metrica).unstack('Miniera')
+        attesi = per_miniera[miniere].assign(**{'Intera flotta': valore(aggregati_diretti(selezione, periodo, per_miniera=False), metrica)})
+        np.testing.assert_allclose(valori.to_numpy(dtype=float), attesi.to_numpy(dtype=float), rtol=1e-9)
+        assert valori.index.tolist() == attesi.index.tolist()
@@ -0,0 +1,49 @@
+# test della riduzione delle serie: gli indici scelti da LTTB confrontati con l'algoritmo
+# scritto punto per punto come nella descrizione originale (Steinarsson, 2013)
+import numpy as np
+import pytest
+
+from serie_temporali import indici_lttb
+
+
+# LTTB con un ciclo su ogni punto di ogni gruppo
+def lttb_ciclo(x, y, soglia):
+    n = len(x)
+    if soglia >= n or soglia < 3:
+        return list(range(n))
+    passo = (n - 2) / (soglia - 2)
+    scelti, scelto = [0], 0
+    for i in range(soglia - 2):
+        inizio, fine = int(i * passo) + 1, int((i + 1) * passo) + 1
+        fine_successivo = min(int((i + 2) * passo) + 1, n)
+        media_x = sum(x[fine:fine_successivo]) / (fine_successivo - fine)
+        media_y = sum(y[fine:fine_successivo]) / (fine_successivo - fine)
+        area_massima = -1.0
+        for j in range(inizio, fine):
+            area = abs((x[scelto] - media_x) * (y[j] - y[scelto]) - (x[scelto] - x[j]) * (media_y - y[scelto]))
+            if area > area_massima:
+                area_massima, migliore = area, j
+        scelto = migliore
+        scelti.append(scelto)
+    return scelti + [n - 1]
+
+
+@pytest.mark.parametrize("n, soglia", [(10, 3), (100, 7), (1000, 100), (3653, 1500), (5000, 4999)])
+def test_indici_come_ciclo(n, soglia):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.integers(1, 3, n)) * 86400.0                                                 # date con qualche giorno mancante
+    y = np.cumsum(rng.normal(0, 1, n))
+    indici = indici_lttb(x, y, soglia)
+    assert indici.tolist() == lttb_ciclo(x.tolist(), y.tolist(), soglia)
+    assert len(indici) == soglia and np.all(np.diff(indici) > 0)
+
+
+def test_serie_corte_non_ridotte():
+    assert indici_lttb([1, 2, 3], [4, 5, 6], 3).tolist() == [0, 1, 2]
+    assert indici_lttb(list(range(50)), list(range(50)), 2).tolist() == list(range(50))
+
+
+def test_picco_conservato():
+    y = np.zeros(10000)
+    y[4321] = 100.0
+    assert 4321 in indici_lttb(np.arange(10000.0), y, 200)
@@ -0,0 +1,68 @@
+# test della tabella lato server: lettura delle condizioni del filtro e pagine confrontate
+# con filtro, ordinamento e paginazione fatti direttamente sull'intera selezione
+import math
+import operator
+import pandas as pd
+import pytest
+
+from tabella_sicurezza import COLONNE_TABELLA, dividi_condizione, pagina_tabella
+
+
+@pytest.mark.parametrize("condizione, attesa", [
+    ("{Incidenti} > 0", ("Incidenti", "gt", 0.0)),
+    ("{Incidenti} >= 1", ("Incidenti", "ge", 1.0)),
+    ("{Incidenti} <= 2", ("Incidenti", "le", 2.0)),
+    ("{Ore_Senza_Incidenti} < 24", ("Ore_Senza_Incidenti", "lt", 24.0)),
+    ("{Incidenti} != 0", ("Incidenti", "ne", 0.0)),
+    ("{Incidenti} = 1", ("Incidenti", "eq", 1.0)),
+    ("{Incidenti} eq 1", ("Incidenti", "eq", 1.0)),
+    ('{Miniera} = "Miniera 2"', ("Miniera", "eq", "Miniera 2")),
+    ("{Miniera} contains 'Min'", ("Miniera", "contains", "Min")),
+    ("{Data} datestartswith 01/02", ("Data", "datestartswith", "01/02")),
+    ("{Data} > 15/01/2024", ("Data", "gt", "15/01/2024")),
+    ("", (None, None, None))
+])
+def test_dividi_condizione(condizione, attesa):
+    assert dividi_condizione(condizione) == attesa
+
+
+# filtro, ordinamento e pagina calcolati riga per riga sull'intera selezione
+def pagina_diretta(dff, media_giorni, page_current, page_size, condizioni, ordine=None):
+    righe = dff[COLONNE_TABELLA[:-1]]
+    for nome, confronto, valore in condizioni:
+        righe = righe[[confronto(v, valore) for v in righe[nome]]]
+    if ordine:
+        righe = righe.sort_values(ordine[0], ascending=ordine[1], kind="stable")
+    numero_pagine = max(1, math.ceil(len(righe) / page_size))
+    page_current = min(page_current, numero_pagine - 1)
+    pagina = righe.iloc[page_current * page_size:(page_current + 1) * page_size]
+    record = [{**riga, "Data": riga["Data"].strftime("%d/%m/%Y"), "Media_Giorni": round(media_giorni, 2)}
+              for riga in pagina.to_dict("records")]
+    return [{colonna: riga[colonna] for colonna in COLONNE_TABELLA} for riga in record], numero_pagine, page_current
+
+
+@pytest.mark.parametrize("filter_query, condizioni", [
+    ("", []),
+    ("{Incidenti} > 0", [("Incidenti", operator.gt, 0)]),
+    ("{Giorni_senza_incidenti_consecutivi} >= 10 && {Giorni_senza_incidenti_consecutivi} < 40",
+     [("Giorni_senza_incidenti_consecutivi", operator.ge, 10), ("Giorni_senza_incidenti_consecutivi", operator.lt, 40)]),
+    ("{Data} >= 01/02/2024", [("Data", operator.ge, pd.Timestamp("2024-02-01"))]),
+    ("{Data} datestartswith 1", [("Data", lambda data, _: data.strftime("%d/%m/%Y").startswith("1"), None)]),
+    ("{Miniera} = \"Miniera 3\"", [("Miniera", operator.eq, "Miniera 3")]),
+    ("{Data} > 31/31/2024", [])                                                                    # data non valida: la condizione viene ignorata
+])
+@pytest.mark.parametrize("ordine", [None, ("Incidenti", False), ("Giorni_senza_incidenti_consecutivi", True)])
+def test_pagine_come_selezione_diretta(dataset, filter_query, condizioni, ordine):
+    dff = dataset[dataset["Miniera"].isin(["Miniera 2", "Miniera 3"])]
+    media_giorni = dff["Giorni_senza_incidenti_consecutivi"].mean()
+    sort_by = [{"column_id": ordine[0], "direction": "asc" if ordine[1] else "desc"}] if ordine else []
+    numero_pagine = pagina_diretta(dff, media_giorni, 0, 10, condizioni, ordine)[1]
+    for page_current in range(numero_pagine + 2):                                                 # anche oltre l'ultima pagina
+        assert pagina_tabella(dff, media_giorni, page_current, 10, sort_by, filter_query) == \
+            pagina_diretta(dff, media_giorni, page_current, 10, condizioni, ordine)
+
+
+def test_filtro_sulla_media(dataset):
+    dff = dataset[dataset["Miniera"] == "Miniera 1"]
+    assert len(pagina_tabella(dff, 12.5, 0, 10, [], "{Media_Giorni} > 12")[0]) == 10
+    assert pagina_tabella(dff, 12.5, 3, 10, [], "{Media_Giorni} > 13") == ([], 1, 0)